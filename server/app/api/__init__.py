@@ -2,4 +2,7 @@
 """
 from . import journal_entry
 from . import journal_theme_data
-from . import theme
\ No newline at end of file
+from . import theme
+from . import health
+from . import metrics
+from . import stats
\ No newline at end of file
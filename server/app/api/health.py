@@ -0,0 +1,20 @@
+from fastapi import status
+
+from app.connections import database
+from app.helpers.serializer import FastJSONResponse
+
+
+async def ready():
+    is_db_reachable = await database.ping()
+    content = {
+        "database": "ok" if is_db_reachable else "unreachable",
+        "backend": database.DATABASE_BACKEND,
+        "pool": database.POOL_STATS.as_dict(),
+    }
+
+    if not is_db_reachable:
+        return FastJSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=content
+        )
+
+    return FastJSONResponse(status_code=status.HTTP_200_OK, content=content)
@@ -1,58 +1,415 @@
+import json
 import time
-from typing import Dict
+from typing import AsyncIterator, Dict, List
 
-from fastapi import Depends
+from fastapi import Depends, Request
 from fastapi import status
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from fastapi.encoders import jsonable_encoder
 
-from app.constants.error import InvalidResourceID
+from app.constants.error import (
+    InvalidResourceID,
+    InvalidCursor,
+    InvalidFields,
+    UnknownThemeData,
+)
+from app.constants.fields import VIEW_SUMMARY
+from app.constants.error_messages import (
+    EMPTY_PATCH,
+    ENTRY_UPDATE_CONFLICT,
+    INVALID_RESOURCE_ID,
+)
+from app.constants.pagination import MAX_BATCH_GET_IDS, NEXT_CURSOR_HEADER
+from app.constants.export import EXPORT_MEDIA_TYPE
+from app.constants.ingest import IMPORT_BATCH_SIZE
+from app.constants.search import MAX_SEARCH_RESULTS
+from app.constants.http_cache import ENTRY_CACHE_CONTROL, ENTRY_VARY
 import app.models.journal_entry as entry_models
-from schema import CreateJournalEntryInput
-from app.repository import get_journal_entry_repo
+from schema import (
+    CreateJournalEntryInput,
+    ImportJournalEntryInput,
+    ListJournalEntryInput,
+    PatchJournalEntryInput,
+    SearchJournalEntryInput,
+)
+from app.repository import get_journal_entry_repo, get_journal_stats_repo
 from app.helpers.journal_entry import get_journal_entry_helper
+from app.helpers.pagination import (
+    encode_cursor,
+    decode_cursor,
+    encode_offset_cursor,
+    decode_offset_cursor,
+)
+from app.helpers.search import build_snippet, query_terms
+from app.helpers.fields import parse_fields, select, summarize
+from app.helpers.export import ndjson_chunks
+from app.helpers.ingest import ndjson_lines, iterate
+from app.helpers.serializer import FastJSONResponse
+from app.helpers.http_cache import etag_matches, not_modified
+from app.helpers import logs, tracing
+
+logger = logs.queue_logger(__name__)
 
 
 async def create(
     input: CreateJournalEntryInput,
     journal_entry_repo=Depends(get_journal_entry_repo),
     journal_entry_helper=Depends(get_journal_entry_helper),
+    journal_stats_repo=Depends(get_journal_stats_repo),
 ):
     journal: Dict = {}
 
-    print(f"input.theme: {input.theme}, input.content: {input.content}")
+    if not journal_entry_helper.validate_journal_content(input.content):
+        logger.info("rejected journal entry with invalid content")
+        return FastJSONResponse(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE, content=journal
+        )
+
+    with tracing.span("encode"):
+        raw = jsonable_encoder(
+            entry_models.JournalEntry(
+                created_at=time.time(),
+                updated_at=time.time(),
+                content=input.content,
+                theme=input.theme,
+            )
+        )
+    try:
+        journal = await journal_entry_repo.insert_one(raw)
+    except UnknownThemeData as e:
+        return FastJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST, content={"error": str(e)}
+        )
+
+    # the entry is already written, so a failed rollup must not turn into an
+    # error that makes the client retry and create it twice; the drift is
+    # reported by `scripts/rebuild_stats.py --check`
+    try:
+        await journal_stats_repo.increment(
+            journal["created_at"], journal["theme"]["theme"]
+        )
+    except Exception as e:
+        logger.warning("stats rollup of entry %s not updated: %s", journal["_id"], e)
+
+    return FastJSONResponse(status_code=status.HTTP_201_CREATED, content=journal)
+
+
+def _build_import_doc(item, journal_entry_helper) -> Dict:
+    if isinstance(item, (bytes, str)):
+        item = json.loads(item)
 
+    input = ImportJournalEntryInput.parse_obj(item)
     if not journal_entry_helper.validate_journal_content(input.content):
-        print(f"invalid json entry: {input.content}")
-        return JSONResponse(status_code=status.HTTP_406_NOT_ACCEPTABLE, content=journal)
+        raise ValueError("invalid journal content")
 
-    raw = jsonable_encoder(
+    now = int(time.time())
+    return jsonable_encoder(
         entry_models.JournalEntry(
-            created_at=time.time(),
-            updated_at=time.time(),
+            created_at=input.created_at or now,
+            updated_at=input.updated_at or input.created_at or now,
             content=input.content,
             theme=input.theme,
         )
     )
-    journal = await journal_entry_repo.insert_one(raw)
 
-    return JSONResponse(status_code=status.HTTP_201_CREATED, content=journal)
+
+async def _insert_import_batch(
+    batch: List, results: List[Dict], journal_entry_repo, journal_stats_repo
+):
+    errors = await journal_entry_repo.insert_many([doc for _, doc in batch])
+    inserted = []
+
+    for position, (index, doc) in enumerate(batch):
+        if position in errors:
+            results.append({"index": index, "error": errors[position]})
+        else:
+            results.append({"index": index, "id": doc["_id"]})
+            inserted.append((doc["created_at"], doc["theme"]["theme"]))
+
+    if journal_stats_repo is None:
+        return
+
+    # as in `create`, the entries are written whether or not their rollups are
+    try:
+        await journal_stats_repo.increment_many(inserted)
+    except Exception as e:
+        logger.warning("stats rollups of %d entries not updated: %s", len(inserted), e)
+
+
+async def import_entries(
+    items: AsyncIterator,
+    journal_entry_repo,
+    journal_entry_helper,
+    journal_stats_repo=None,
+) -> List[Dict]:
+    """Validates and inserts `items` in batches of `IMPORT_BATCH_SIZE`. Items
+    may be dicts or raw JSON documents. Returns one result per item, in input
+    order, carrying either the new entry's id or the reason it was rejected.
+    """
+    results: List[Dict] = []
+    batch: List = []
+    index = 0
+
+    async for item in items:
+        try:
+            with tracing.span("encode"):
+                doc = _build_import_doc(item, journal_entry_helper)
+            batch.append((index, doc))
+        except ValueError as e:
+            results.append({"index": index, "error": str(e)})
+        index += 1
+
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await _insert_import_batch(
+                batch, results, journal_entry_repo, journal_stats_repo
+            )
+            batch = []
+
+    await _insert_import_batch(batch, results, journal_entry_repo, journal_stats_repo)
+
+    results.sort(key=lambda result: result["index"])
+    return results
+
+
+async def bulk_import(
+    request: Request,
+    journal_entry_repo,
+    journal_entry_helper,
+    journal_stats_repo,
+):
+    if "ndjson" in request.headers.get("content-type", ""):
+        items = ndjson_lines(request.stream())
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+
+        if not isinstance(body, list):
+            return FastJSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"error": "expected a JSON array or an NDJSON stream"},
+            )
+        items = iterate(body)
+
+    results = await import_entries(
+        items, journal_entry_repo, journal_entry_helper, journal_stats_repo
+    )
+    failed = sum(1 for result in results if "error" in result)
+
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "inserted": len(results) - failed,
+            "failed": failed,
+            "results": results,
+        },
+    )
 
 
 async def list_journals(
-    _,
+    input: ListJournalEntryInput,
     journal_entry_repo=Depends(get_journal_entry_repo),
 ):
-    entries = await journal_entry_repo.find()
-    return JSONResponse(status_code=status.HTTP_200_OK, content=entries)
+    after = None
+    requested = None
+    try:
+        if input.cursor:
+            after = decode_cursor(input.cursor)
+        if input.fields:
+            if input.view == VIEW_SUMMARY:
+                raise InvalidFields()
+            requested = parse_fields(input.fields)
+    except (InvalidCursor, InvalidFields) as e:
+        return FastJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST, content={"error": str(e)}
+        )
+
+    projection = None
+    if input.view == VIEW_SUMMARY:
+        projection = journal_entry_repo.summary_projection()
+    elif requested:
+        projection = journal_entry_repo.fields_projection(requested)
+
+    entries, next_key = await journal_entry_repo.find(
+        created_after=input.created_after,
+        created_before=input.created_before,
+        theme=input.theme,
+        after=after,
+        limit=input.limit,
+        projection=projection,
+    )
+
+    if input.view == VIEW_SUMMARY:
+        entries = [summarize(entry) for entry in entries]
+    elif requested:
+        entries = [select(entry, requested) for entry in entries]
+
+    headers = {}
+    if next_key is not None:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(*next_key)
+
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK, content=entries, headers=headers
+    )
+
+
+async def search(
+    input: SearchJournalEntryInput,
+    journal_entry_repo,
+):
+    offset = 0
+    if input.cursor:
+        try:
+            offset = decode_offset_cursor(input.cursor)
+        except InvalidCursor as e:
+            return FastJSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST, content={"error": str(e)}
+            )
+
+    limit = min(input.limit, MAX_SEARCH_RESULTS - offset)
+    if limit <= 0:
+        return FastJSONResponse(status_code=status.HTTP_200_OK, content=[])
+
+    entries, has_more = await journal_entry_repo.search(
+        input.q,
+        created_after=input.created_after,
+        created_before=input.created_before,
+        theme=input.theme,
+        skip=offset,
+        limit=limit,
+    )
+
+    terms = query_terms(input.q)
+    results = [
+        {
+            "_id": entry["_id"],
+            "created_at": entry.get("created_at"),
+            "theme": entry.get("theme", {}).get("theme"),
+            "score": entry.get("score"),
+            "snippet": build_snippet(entry, terms),
+        }
+        for entry in entries
+    ]
+
+    headers = {}
+    if has_more and offset + len(entries) < MAX_SEARCH_RESULTS:
+        headers[NEXT_CURSOR_HEADER] = encode_offset_cursor(offset + len(entries))
+
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK, content=results, headers=headers
+    )
+
+
+async def export(
+    input: ListJournalEntryInput,
+    compress: bool,
+    journal_entry_repo,
+):
+    entries = journal_entry_repo.iter_entries(
+        created_after=input.created_after,
+        created_before=input.created_before,
+        theme=input.theme,
+    )
+
+    headers = {}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        ndjson_chunks(entries, compress=compress),
+        media_type=EXPORT_MEDIA_TYPE,
+        headers=headers,
+    )
+
+
+def _entry_etag(journal_entry: Dict) -> str:
+    return f'"{journal_entry["_id"]}-{journal_entry.get("updated_at")}"'
 
 
 async def get(
     entry_id: str,
     journal_entry_repo,
+    if_none_match: str = None,
 ):
     journal_entry = await journal_entry_repo.find_one_journal_entry(entry_id)
     if journal_entry is None:
         raise InvalidResourceID("Not found")
 
-    return JSONResponse(status_code=status.HTTP_200_OK, content=journal_entry)
+    etag = _entry_etag(journal_entry)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, ENTRY_CACHE_CONTROL, ENTRY_VARY)
+
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=journal_entry,
+        headers={
+            "ETag": etag,
+            "Cache-Control": ENTRY_CACHE_CONTROL,
+            "Vary": ENTRY_VARY,
+        },
+    )
+
+
+async def batch_get(
+    ids: List[str],
+    journal_entry_repo,
+):
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BATCH_GET_IDS:
+        return FastJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": f"at most {MAX_BATCH_GET_IDS} ids can be requested"},
+        )
+
+    found = await journal_entry_repo.find_many_by_id(ids)
+
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "entries": [found[entry_id] for entry_id in ids if entry_id in found],
+            "missing": [entry_id for entry_id in ids if entry_id not in found],
+        },
+        headers={"Cache-Control": ENTRY_CACHE_CONTROL, "Vary": ENTRY_VARY},
+    )
+
+
+async def patch(
+    entry_id: str,
+    input: PatchJournalEntryInput,
+    journal_entry_repo,
+):
+    content = input.content.dict(exclude_none=True)
+    if not content:
+        return FastJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST, content={"error": EMPTY_PATCH}
+        )
+
+    journal_entry = await journal_entry_repo.update_content(
+        entry_id, input.updated_at, content, input.editor
+    )
+
+    if journal_entry is None:
+        current = await journal_entry_repo.find_one_journal_entry(entry_id)
+        if current is None:
+            return FastJSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"error": INVALID_RESOURCE_ID},
+            )
+        return FastJSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={
+                "error": ENTRY_UPDATE_CONFLICT,
+                "updated_at": current.get("updated_at"),
+            },
+        )
+
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=journal_entry,
+        headers={
+            "ETag": _entry_etag(journal_entry),
+            "Cache-Control": ENTRY_CACHE_CONTROL,
+            "Vary": ENTRY_VARY,
+        },
+    )
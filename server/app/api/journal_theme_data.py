@@ -1,13 +1,14 @@
 from fastapi import status
-from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
 
 from app.models import journal_theme_data
+from app.helpers.serializer import FastJSONResponse
 
 
 async def get(
     input: journal_theme_data.GetJournalThemeDataInput,
     journal_theme_data_repo,
+    theme_data_pool,
 ):
     if input.id is None and input.theme is None and (input.get_random is None or not input.get_random):
         return Exception("invalid resource id")
@@ -15,12 +16,10 @@ async def get(
     theme_data = None
 
     if input.get_random:
-        res = await journal_theme_data_repo.get_n_random(theme=input.theme, sample_size=1)
-        if len(res) < 1:
+        theme_data = await theme_data_pool.sample(theme=input.theme)
+        if theme_data is None:
             raise Exception("no records found!")
-
-        theme_data = res[0]
     else:
         theme_data = await journal_theme_data_repo.get()
 
-    return theme_data
\ No newline at end of file
+    return FastJSONResponse(status_code=status.HTTP_200_OK, content=theme_data)
\ No newline at end of file
@@ -0,0 +1,24 @@
+from fastapi import status
+from fastapi.responses import PlainTextResponse
+
+from app.helpers.db_metrics import COMMAND_METRICS
+from app.helpers.loop_monitor import LOOP_MONITOR
+from app.middleware import ADMISSION_CONTROLLER
+from app.repository import read_cache
+
+PROMETHEUS_CONTENT_TYPE: str = "text/plain; version=0.0.4"
+
+
+async def render():
+    lines = (
+        COMMAND_METRICS.render()
+        + ADMISSION_CONTROLLER.render()
+        + read_cache.render()
+        + LOOP_MONITOR.render()
+    )
+
+    return PlainTextResponse(
+        status_code=status.HTTP_200_OK,
+        content="\n".join(lines) + "\n",
+        media_type=PROMETHEUS_CONTENT_TYPE,
+    )
@@ -0,0 +1,10 @@
+from fastapi import status
+
+from app.helpers.serializer import FastJSONResponse
+from app.helpers.stats import summarize
+
+
+async def get(journal_stats_repo):
+    rollups = await journal_stats_repo.find_all()
+
+    return FastJSONResponse(status_code=status.HTTP_200_OK, content=summarize(rollups))
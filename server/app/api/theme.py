@@ -1,59 +1,54 @@
 import asyncio
 
-from fastapi import status
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
-
-from app.models.base import JournalThemeType
-from app.models.journal_theme import JournalTheme
-from app.models.journal_theme_data import JournalThemeData
-
-THEMES = [
-    {
-        "theme": JournalThemeType.amor_fati,
-        "name": "Amor Fati",
-        "short_description": "A Love of Fate",
-        "detailed_description": "Treating each and every moment—no matter how challenging—as something to be embraced, not avoided.",
-        "accent_color": "#008fb3",
-    },
-    {
-        "theme": JournalThemeType.premeditatio_malorum,
-        "name": "Premeditatio Malorum",
-        "short_description": "Premeditation of Evils",
-        "detailed_description": "This is a Stoic exercise of imagining things that could go wrong or be taken away from us",
-        "accent_color": "#7575a3",
-    },
-]
-
-
-async def list_themes(journal_theme_data_repo):
+from fastapi import Response, status
+
+from app.constants.http_cache import THEMES_CACHE_CONTROL
+from app.constants.theme import THEMES
+from app.helpers.http_cache import content_etag, etag_matches, not_modified
+from app.helpers.serializer import dumps
+
+# the themes payload rendered for the current theme data pool version
+_rendered = {"version": None, "etag": None, "body": None}
+
+
+async def _render_themes(theme_data_pool) -> bytes:
     themes = []
 
     for t in THEMES:
-        # TODO: perform the random selection per group in the db to speed up call
-        _td = await journal_theme_data_repo.get_n_random(
-            theme=t["theme"], sample_size=1
-        )
-        theme_data = jsonable_encoder(
-            JournalThemeData(
-                theme=t["theme"],
-                quote=_td[0]["quote"],
-                idea_nudge=_td[0]["idea_nudge"],
-                thought_nudge=_td[0]["thought_nudge"],
-            )
-        )
-        theme = jsonable_encoder(
-            JournalTheme(
-                id=_td[0]["_id"],
-                theme=t["theme"],
-                name=t["name"],
-                short_description=t["short_description"],
-                detailed_description=t["detailed_description"],
-                accent_color=t["accent_color"],
-                data=theme_data,
-            )
-        )
-
-        themes.append(theme)
-
-    return JSONResponse(status_code=status.HTTP_200_OK, content=themes)
+        _td = await theme_data_pool.sample(theme=t["theme"])
+        if _td is None:
+            continue
+
+        themes.append({**t, "data": _td})
+
+    return dumps(themes)
+
+
+async def list_themes(theme_data_pool, if_none_match: str = None):
+    """Builds the themes payload straight from the static catalog above and
+    the pooled theme data documents. Both are trusted, so they are not
+    validated into models before serialization.
+
+    The payload is rendered once per pool version, so the random theme data
+    shown only changes when the pool refreshes. Its ETag is a hash of the
+    rendered bytes rather than the version, which is only a per-process
+    counter and would let two workers tag different payloads alike.
+    """
+    if not theme_data_pool.refreshed_at:
+        await theme_data_pool.refresh()
+
+    if _rendered["version"] != theme_data_pool.version:
+        version = theme_data_pool.version
+        body = await _render_themes(theme_data_pool)
+        _rendered.update(version=version, etag=content_etag(body), body=body)
+
+    etag = _rendered["etag"]
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, THEMES_CACHE_CONTROL)
+
+    return Response(
+        status_code=status.HTTP_200_OK,
+        content=_rendered["body"],
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": THEMES_CACHE_CONTROL},
+    )
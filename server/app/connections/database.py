@@ -1,34 +1,237 @@
+import asyncio
 import os
 import urllib
-from typing import Any
+from typing import Any, Dict, List
 
 from motor import motor_asyncio
+from pymongo import monitoring
+from pymongo.errors import OperationFailure
 
+from app.connections.memory import MemoryClient
+from app.connections.sqlite import SqliteClient
 from app.constants import collection
-from app.helpers.db_logger import CommandLogger
+from app.constants.index import INDEXES
+from app.helpers import logs
+from app.helpers.db_metrics import COMMAND_METRICS
+from app.helpers.tracing import COMMAND_TRACER
 
+DATABASE_NAME: str = "journal_entries"
 
-def _get_client() -> Any:
+# "mongo", or "memory" or "sqlite" to run without a Mongo server; see
+# app.connections.memory and app.connections.sqlite
+BACKENDS = ("mongo", "memory", "sqlite")
+DATABASE_BACKEND: str = os.environ.get("DATABASE_BACKEND", "mongo").lower()
+SQLITE_PATH: str = os.environ.get("SQLITE_PATH", "journal_entries.db")
+
+MAX_POOL_SIZE: int = int(os.environ.get("MONGO_MAX_POOL_SIZE", 100))
+MIN_POOL_SIZE: int = int(os.environ.get("MONGO_MIN_POOL_SIZE", 10))
+MAX_IDLE_TIME_MS: int = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", 300000))
+WAIT_QUEUE_TIMEOUT_MS: int = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000))
+SERVER_SELECTION_TIMEOUT_MS: int = int(
+    os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)
+)
+ENSURE_INDEXES_ON_STARTUP: bool = (
+    os.environ.get("MONGO_ENSURE_INDEXES_ON_STARTUP", "true").lower() == "true"
+)
+
+# IndexOptionsConflict, IndexKeySpecsConflict: an index with the same name or
+# keys, or another text index, already exists with a different spec
+_INDEX_CONFLICT_CODES = (85, 86)
+
+_client = None
+
+logger = logs.queue_logger(__name__)
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Keeps running counters of the connection pool events emitted by pymongo
+    so that the readiness check can report pool health without touching the
+    driver internals.
+    """
+
+    def __init__(self):
+        self.ready: bool = False
+        self.open: int = 0
+        self.checked_out: int = 0
+        self.checkout_failures: int = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        self.ready = True
+
+    def pool_cleared(self, event):
+        self.ready = False
+
+    def pool_closed(self, event):
+        self.ready = False
+
+    def connection_created(self, event):
+        self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    def as_dict(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "open_connections": self.open,
+            "checked_out": self.checked_out,
+            "checkout_failures": self.checkout_failures,
+            "max_pool_size": MAX_POOL_SIZE,
+            "min_pool_size": MIN_POOL_SIZE,
+            "max_idle_time_ms": MAX_IDLE_TIME_MS,
+        }
+
+
+POOL_STATS = PoolStats()
+
+
+def _get_conn_str() -> str:
     uname: str = urllib.parse.quote_plus(os.environ.get("MONGO_INITDB_ROOT_USERNAME"))
     passwd: str = urllib.parse.quote_plus(os.environ.get("MONGO_INITDB_ROOT_PASSWORD"))
     url: str = os.environ.get("MONGO_DB_URL")
 
-    conn_str: str = (
-        f"mongodb://{uname}:{passwd}@{url}:27017/?retryWrites=true&w=majority"
+    return f"mongodb://{uname}:{passwd}@{url}:27017/?retryWrites=true&w=majority"
+
+
+def create_client(backend: str = DATABASE_BACKEND, sqlite_path: str = SQLITE_PATH):
+    """Returns a new client for `backend`. The local backends' clients offer
+    the part of the Motor API the repositories use, described by
+    `app.connections.documents.DocumentCollection`.
+    """
+    if backend == "memory":
+        return MemoryClient()
+    if backend == "sqlite":
+        return SqliteClient(sqlite_path)
+    if backend != "mongo":
+        raise ValueError(
+            f"unknown database backend {backend}, expected one of {BACKENDS}"
+        )
+
+    return motor_asyncio.AsyncIOMotorClient(
+        _get_conn_str(),
+        maxPoolSize=MAX_POOL_SIZE,
+        minPoolSize=MIN_POOL_SIZE,
+        maxIdleTimeMS=MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
+        event_listeners=[COMMAND_METRICS, POOL_STATS, COMMAND_TRACER],
     )
 
-    client = motor_asyncio.AsyncIOMotorClient(
-        conn_str, event_listeners=[CommandLogger()]
+
+def _get_client() -> Any:
+    """Returns the client shared by every request served by this worker. The
+    client is created lazily so that scripts which never go through the app
+    lifespan can still use it.
+    """
+    global _client
+
+    if _client is None:
+        _client = create_client()
+
+    return _client
+
+
+def get_database():
+    return _get_client()[DATABASE_NAME]
+
+
+async def connect():
+    """Creates the shared client and opens `MIN_POOL_SIZE` connections up
+    front by issuing that many concurrent pings, so the first requests after a
+    deploy don't pay for the TCP and auth handshakes.
+    """
+    client = _get_client()
+    await asyncio.gather(
+        *[client.admin.command("ping") for _ in range(max(MIN_POOL_SIZE, 1))]
     )
 
-    return client
+
+async def close():
+    global _client
+
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+async def ensure_indexes(db=None) -> Dict[str, List[str]]:
+    """Creates every index declared in `app.constants.index`. Mongo treats
+    creating an index that already exists with the same spec as a no-op, so
+    this is safe to run on every startup.
+
+    An index that conflicts with one already there, such as a superseded index
+    not yet dropped by its migration, is logged and skipped so the rest are
+    still created.
+    """
+    if db is None:
+        db = get_database()
+
+    created: Dict[str, List[str]] = {}
+    for collection_name, indexes in INDEXES.items():
+        try:
+            created[collection_name] = await db[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            if e.code not in _INDEX_CONFLICT_CODES:
+                raise
+            created[collection_name] = await _create_indexes_one_by_one(
+                db[collection_name], indexes
+            )
+
+    return created
+
+
+async def _create_indexes_one_by_one(collection, indexes) -> List[str]:
+    created = []
+    for index in indexes:
+        try:
+            created += await collection.create_indexes([index])
+        except OperationFailure as e:
+            if e.code not in _INDEX_CONFLICT_CODES:
+                raise
+            logger.warning(
+                "index %s on %s not created: %s",
+                index.document["name"],
+                collection.name,
+                e,
+            )
+    return created
+
+
+async def ping() -> bool:
+    try:
+        await _get_client().admin.command("ping")
+    except Exception as e:
+        logger.warning("database ping failed: %s", e)
+        return False
+
+    return True
 
 
 def get_journal_entries_collection():
-    client = _get_client()
-    yield getattr(client, "journal_entries")[collection.JOURNAL_ENTRIES_COLLECTION]
+    yield get_database()[collection.JOURNAL_ENTRIES_COLLECTION]
 
 
 def get_journal_themes_data_collection():
-    client = _get_client()
-    yield getattr(client, "journal_entries")[collection.JOURNAL_THEME_DATA_COLLECTION]
+    yield get_database()[collection.JOURNAL_THEME_DATA_COLLECTION]
+
+
+def get_journal_stats_collection():
+    yield get_database()[collection.JOURNAL_STATS_COLLECTION]
@@ -0,0 +1,806 @@
+"""The document collection interface the repositories are written against,
+and a pure Python implementation of the query language they use, shared by
+the local backends in `app.connections.memory` and `app.connections.sqlite`.
+
+The repositories only use a small part of the Motor collection API; this is
+what another backend has to provide. Queries support equality, `$gt`,
+`$gte`, `$lt`, `$lte`, `$ne`, `$in`, `$nin`, `$exists`, `$or` and `$and` on
+dotted paths, and `$text`. Updates support `$set`, `$inc` and
+`$setOnInsert`. Projections support inclusion and exclusion of dotted paths,
+`{"$meta": "textScore"}`, and the `$ifNull`, `$cond`, `$eq`, `$ne`,
+`$substrCP` and `$strLenCP` expressions.
+"""
+
+import abc
+import copy
+import functools
+import heapq
+import random
+import re
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+)
+
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+from app.helpers.tracing import span
+
+_MISSING = object()
+DUPLICATE_KEY_ERROR_CODE: int = 11000
+
+
+class DocumentCursor(Protocol):
+    def sort(self, key_or_list, direction=None) -> "DocumentCursor": ...
+
+    def skip(self, skip: int) -> "DocumentCursor": ...
+
+    def limit(self, limit: int) -> "DocumentCursor": ...
+
+    def batch_size(self, batch_size: int) -> "DocumentCursor": ...
+
+    async def to_list(self, length: Optional[int]) -> List[Dict]: ...
+
+    def __aiter__(self) -> AsyncIterator[Dict]: ...
+
+
+class DocumentCollection(Protocol):
+    name: str
+    full_name: str
+    database: Any
+
+    def find(self, filter: Dict = None, projection: Dict = None) -> DocumentCursor: ...
+
+    async def find_one(self, filter: Dict = None, projection: Dict = None): ...
+
+    def aggregate(self, pipeline: List[Dict]) -> DocumentCursor: ...
+
+    async def distinct(self, key: str, filter: Dict = None) -> List: ...
+
+    async def count_documents(self, filter: Dict) -> int: ...
+
+    async def insert_one(self, document: Dict): ...
+
+    async def insert_many(self, documents: List[Dict], ordered: bool = True): ...
+
+    async def find_one_and_update(
+        self, filter: Dict, update: Dict, return_document: bool = False
+    ): ...
+
+    async def bulk_write(self, requests: List, ordered: bool = True): ...
+
+    async def delete_one(self, filter: Dict): ...
+
+    async def delete_many(self, filter: Dict): ...
+
+    async def create_indexes(self, indexes: List) -> List[str]: ...
+
+    async def drop_index(self, name: str): ...
+
+
+class Result:
+    """Stands in for the pymongo result classes."""
+
+    def __init__(self, **fields):
+        self.acknowledged = True
+        self.inserted_id = None
+        self.inserted_ids: List = []
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.deleted_count = 0
+        self.upserted_count = 0
+        self.__dict__.update(fields)
+
+
+def get_path(doc: Any, path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return _MISSING
+        doc = doc[part]
+    return doc
+
+
+def set_path(doc: Dict, path: str, value: Any):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        child = doc.get(part)
+        if not isinstance(child, dict):
+            child = doc[part] = {}
+        doc = child
+    doc[parts[-1]] = value
+
+
+def _compare(a: Any, b: Any) -> Optional[int]:
+    """Orders values like Mongo for the types entries hold: null before
+    numbers before strings. Returns None for values that are not comparable.
+    """
+
+    def rank(v):
+        if v is None or v is _MISSING:
+            return 0
+        if isinstance(v, bool):
+            return 3
+        if isinstance(v, (int, float)):
+            return 1
+        if isinstance(v, str):
+            return 2
+        return 4
+
+    ra, rb = rank(a), rank(b)
+    if ra != rb:
+        return (ra > rb) - (ra < rb)
+    if ra == 0:
+        return 0
+    try:
+        return (a > b) - (a < b)
+    except TypeError:
+        return None
+
+
+def _eq(value: Any, expected: Any) -> bool:
+    if value is _MISSING:
+        return expected is None
+    if isinstance(value, list) and not isinstance(expected, list):
+        return expected in value
+    return value == expected
+
+
+def _match_operators(value: Any, conditions: Dict) -> bool:
+    for op, arg in conditions.items():
+        if op == "$eq":
+            ok = _eq(value, arg)
+        elif op == "$ne":
+            ok = not _eq(value, arg)
+        elif op == "$in":
+            ok = any(_eq(value, a) for a in arg)
+        elif op == "$nin":
+            ok = not any(_eq(value, a) for a in arg)
+        elif op == "$exists":
+            ok = (value is not _MISSING) == bool(arg)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is _MISSING or value is None:
+                return False
+            cmp = _compare(value, arg)
+            if cmp is None or _compare(value, None) != _compare(arg, None):
+                return False
+            ok = {
+                "$gt": cmp > 0,
+                "$gte": cmp >= 0,
+                "$lt": cmp < 0,
+                "$lte": cmp <= 0,
+            }[op]
+        else:
+            raise OperationFailure(f"unsupported query operator {op}")
+        if not ok:
+            return False
+    return True
+
+
+def matches(doc: Dict, filter: Optional[Dict]) -> bool:
+    """Whether `doc` matches `filter`. `$text` has to be resolved by the
+    caller, which knows the text index, and is ignored here.
+    """
+    for key, condition in (filter or {}).items():
+        if key == "$text":
+            continue
+        if key == "$or":
+            if not any(matches(doc, f) for f in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, f) for f in condition):
+                return False
+        elif isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+            if not _match_operators(get_path(doc, key), condition):
+                return False
+        elif not _eq(get_path(doc, key), condition):
+            return False
+    return True
+
+
+def _evaluate(expression: Any, doc: Dict) -> Any:
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = get_path(doc, expression[1:])
+        return None if value is _MISSING else value
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) != 1:
+        return {k: _evaluate(v, doc) for k, v in expression.items()}
+
+    op, args = next(iter(expression.items()))
+    if op == "$ifNull":
+        value = _evaluate(args[0], doc)
+        return _evaluate(args[1], doc) if value is None else value
+    if op == "$cond":
+        return _evaluate(args[1] if _evaluate(args[0], doc) else args[2], doc)
+    if op == "$eq":
+        return _evaluate(args[0], doc) == _evaluate(args[1], doc)
+    if op == "$ne":
+        return _evaluate(args[0], doc) != _evaluate(args[1], doc)
+    if op == "$strLenCP":
+        return len(_evaluate(args, doc) or "")
+    if op == "$substrCP":
+        text = _evaluate(args[0], doc) or ""
+        start, length = _evaluate(args[1], doc), _evaluate(args[2], doc)
+        return text[start : start + length]
+    if not op.startswith("$"):
+        return {op: _evaluate(args, doc)}
+    raise OperationFailure(f"unsupported expression operator {op}")
+
+
+def project(doc: Dict, projection: Optional[Dict], score: float = None) -> Dict:
+    """Returns a copy of `doc` with `projection` applied."""
+    if not projection:
+        return copy.deepcopy(doc)
+
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    exclusion = fields and all(v in (0, False) for v in fields.values())
+
+    if exclusion:
+        projected = copy.deepcopy(doc)
+        for path in fields:
+            parts = path.split(".")
+            parent = (
+                get_path(projected, ".".join(parts[:-1]))
+                if len(parts) > 1
+                else projected
+            )
+            if isinstance(parent, dict):
+                parent.pop(parts[-1], None)
+        if projection.get("_id", 1) in (0, False):
+            projected.pop("_id", None)
+        return projected
+
+    projected: Dict = {}
+    if projection.get("_id", 1) not in (0, False) and "_id" in doc:
+        projected["_id"] = copy.deepcopy(doc["_id"])
+
+    for path, spec in fields.items():
+        if isinstance(spec, dict) and spec.get("$meta") == "textScore":
+            projected[path] = score
+        elif isinstance(spec, dict) or (isinstance(spec, str) and spec.startswith("$")):
+            set_path(projected, path, _evaluate(spec, doc))
+        elif spec not in (0, False):
+            value = get_path(doc, path)
+            if value is not _MISSING:
+                set_path(projected, path, copy.deepcopy(value))
+
+    return projected
+
+
+def normalize_sort(key_or_list, direction=None) -> List[Tuple[str, Any]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, 1 if direction is None else direction)]
+    return list(key_or_list)
+
+
+def sort_key(sort: Sequence[Tuple[str, Any]]) -> Callable:
+    """Returns a key that orders (document, text score) pairs by a Mongo sort
+    specification.
+    """
+
+    def compare(a, b):
+        for key, direction in sort:
+            if isinstance(direction, dict):
+                va, vb, direction = a[1] or 0, b[1] or 0, -1
+            else:
+                va, vb = get_path(a[0], key), get_path(b[0], key)
+            cmp = _compare(va, vb) or 0
+            if cmp:
+                return cmp if direction in (1, "asc", "ascending") else -cmp
+        return 0
+
+    return functools.cmp_to_key(compare)
+
+
+def sort_documents(
+    docs: List[Tuple[Dict, Optional[float]]], sort: Sequence[Tuple[str, Any]]
+) -> List[Tuple[Dict, Optional[float]]]:
+    return sorted(docs, key=sort_key(sort))
+
+
+def apply_update(doc: Dict, update: Dict, inserting: bool = False):
+    for op, fields in update.items():
+        if op == "$set" or (op == "$setOnInsert" and inserting):
+            for path, value in fields.items():
+                set_path(doc, path, copy.deepcopy(value))
+        elif op == "$inc":
+            for path, by in fields.items():
+                current = get_path(doc, path)
+                set_path(
+                    doc, path, (0 if current in (_MISSING, None) else current) + by
+                )
+        elif op != "$setOnInsert":
+            raise OperationFailure(f"unsupported update operator {op}")
+
+
+def upserted_document(filter: Dict, update: Dict) -> Dict:
+    """The document an upsert inserts: the equality conditions of `filter`
+    with `update` applied on top.
+    """
+    doc: Dict = {}
+    for key, condition in filter.items():
+        if key.startswith("$") or (
+            isinstance(condition, dict) and any(k.startswith("$") for k in condition)
+        ):
+            continue
+        set_path(doc, key, copy.deepcopy(condition))
+    apply_update(doc, update, inserting=True)
+    return doc
+
+
+def write_request(request) -> Tuple[str, Dict, Any, bool]:
+    """Unpacks a pymongo bulk write request into (kind, filter, document or
+    update, upsert).
+    """
+    if isinstance(request, InsertOne):
+        return "insert", {}, request._doc, False
+    if isinstance(request, UpdateOne):
+        return "update", request._filter, request._doc, bool(request._upsert)
+    if isinstance(request, ReplaceOne):
+        return "replace", request._filter, request._doc, bool(request._upsert)
+    if isinstance(request, DeleteOne):
+        return "delete", request._filter, None, False
+    raise OperationFailure(f"unsupported bulk write request {type(request).__name__}")
+
+
+_WORD = re.compile(r"\w+")
+_SUFFIXES = ("ingly", "edly", "ing", "ies", "ied", "ly", "es", "ed", "s")
+
+
+def stem(word: str) -> str:
+    """A crude English stemmer, so `walks`, `walked` and `walking` index
+    together as Mongo's text index does.
+    """
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def words(text: Any) -> List[str]:
+    if not isinstance(text, str):
+        return []
+    return _WORD.findall(text.lower())
+
+
+def tokenize(text: Any) -> List[str]:
+    return [stem(word) for word in words(text)]
+
+
+def contains_phrase(tokens: List[str], phrase: List[str]) -> bool:
+    n = len(phrase)
+    return any(tokens[i : i + n] == phrase for i in range(len(tokens) - n + 1))
+
+
+def parse_text_search(
+    search: str, split: Callable[[str], List[str]] = tokenize
+) -> Tuple[List[str], List[str], List[List[str]]]:
+    """Splits a `$text` search string into (terms, negated terms, phrases),
+    each broken into tokens with `split`.
+    """
+    phrases = [split(p) for p in re.findall(r'"([^"]*)"', search)]
+    rest = re.sub(r'"[^"]*"', " ", search)
+
+    terms, negated = [], []
+    for word in rest.split():
+        target = negated if word.startswith("-") else terms
+        target.extend(split(word.lstrip("-")))
+
+    terms.extend(term for phrase in phrases for term in phrase)
+    return terms, negated, [p for p in phrases if p]
+
+
+def text_index_fields(indexes: Iterable) -> List[Tuple[str, float]]:
+    """Returns the (field, weight) pairs of the text index among `indexes`."""
+    for index in indexes:
+        document = index.document if hasattr(index, "document") else index
+        keys = list(document["key"].items())
+        if any(kind == "text" for _, kind in keys):
+            weights = document.get("weights", {})
+            return [
+                (field, float(weights.get(field, 1)))
+                for field, kind in keys
+                if kind == "text"
+            ]
+    return []
+
+
+class LocalCursor:
+    """Cursor over a query run by a local backend. `run` is called with the
+    sort, skip and limit once the cursor is first read, and returns the
+    matching documents.
+    """
+
+    def __init__(self, run: Callable):
+        self._run = run
+        self._sort: List[Tuple[str, Any]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[List[Dict]] = None
+        self._position = 0
+
+    def sort(self, key_or_list, direction=None) -> "LocalCursor":
+        self._sort = normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int) -> "LocalCursor":
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> "LocalCursor":
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int) -> "LocalCursor":
+        return self
+
+    async def _load(self) -> List[Dict]:
+        if self._results is None:
+            self._results = await self._run(self._sort, self._skip, self._limit)
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        results = await self._load()
+        end = len(results) if length is None else self._position + length
+        batch = results[self._position : end]
+        self._position += len(batch)
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict:
+        results = await self._load()
+        if self._position >= len(results):
+            raise StopAsyncIteration
+        self._position += 1
+        return results[self._position - 1]
+
+
+class LocalAdmin:
+    async def command(self, name: str, *args, **kwargs) -> Dict:
+        if name != "ping":
+            raise OperationFailure(f"unsupported command {name}")
+        return {"ok": 1}
+
+
+class LocalCollection(abc.ABC):
+    """The `DocumentCollection` operations, written once on top of a handful
+    of storage primitives that each local backend implements: `_select`,
+    `_insert`, `_replace`, `_delete`, `_create_indexes`, `_drop_index`,
+    `_write` and `_run`.
+    """
+
+    def __init__(self, database: "LocalDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.full_name = f"{database.name}.{name}"
+
+    @abc.abstractmethod
+    def _select(
+        self, filter: Dict, sort: Sequence = (), skip: int = 0, limit: int = 0
+    ) -> List[Tuple[Dict, Optional[float]]]:
+        """Returns the (document, text score) pairs matching `filter`. The
+        documents may be the stored ones and must not be modified.
+        """
+
+    @abc.abstractmethod
+    def _insert(self, doc: Dict): ...
+
+    @abc.abstractmethod
+    def _replace(self, doc: Dict): ...
+
+    @abc.abstractmethod
+    def _delete(self, _id): ...
+
+    @abc.abstractmethod
+    def _create_indexes(self, indexes: List) -> List[str]: ...
+
+    @abc.abstractmethod
+    def _drop_index(self, name: str): ...
+
+    @abc.abstractmethod
+    def _write(self):
+        """Context manager grouping the writes of one operation."""
+
+    @abc.abstractmethod
+    async def _run(self, fn: Callable, *args): ...
+
+    async def _call(self, command: str, fn: Callable, *args):
+        # timed like the commands the Mongo backend reports to the tracer
+        with span(f"db.{command}"):
+            return await self._run(fn, *args)
+
+    @staticmethod
+    def _page(pairs: List, sort: Sequence, skip: int, limit: int) -> List:
+        if sort and limit:
+            # a page is usually a small part of the matches
+            return heapq.nsmallest(skip + limit, pairs, key=sort_key(sort))[skip:]
+        if sort:
+            pairs = sort_documents(pairs, sort)
+        return pairs[skip : skip + limit if limit else None]
+
+    def _duplicate_key(self, _id) -> DuplicateKeyError:
+        message = (
+            f"E11000 duplicate key error collection: {self.full_name} "
+            f"index: _id_ dup key: {{ _id: {_id!r} }}"
+        )
+        return DuplicateKeyError(
+            message,
+            DUPLICATE_KEY_ERROR_CODE,
+            {
+                "code": DUPLICATE_KEY_ERROR_CODE,
+                "errmsg": message,
+                "keyValue": {"_id": _id},
+            },
+        )
+
+    def _insert_one(self, doc: Dict):
+        with self._write():
+            self._insert(copy.deepcopy(doc))
+
+    def _find(self, filter, projection, sort, skip, limit) -> List[Dict]:
+        return [
+            project(doc, projection, score)
+            for doc, score in self._select(filter or {}, sort, skip, limit)
+        ]
+
+    def _aggregate(self, pipeline: List[Dict]) -> List[Dict]:
+        stages = list(pipeline)
+        first = stages.pop(0)["$match"] if stages and "$match" in stages[0] else {}
+        docs = [doc for doc, _ in self._select(first)]
+
+        for stage in stages:
+            ((op, arg),) = stage.items()
+            if op == "$match":
+                docs = [doc for doc in docs if matches(doc, arg)]
+            elif op == "$sample":
+                docs = random.sample(docs, min(arg["size"], len(docs)))
+            elif op == "$sort":
+                pairs = sort_documents([(doc, None) for doc in docs], list(arg.items()))
+                docs = [doc for doc, _ in pairs]
+            elif op == "$skip":
+                docs = docs[arg:]
+            elif op == "$limit":
+                docs = docs[:arg]
+            elif op == "$project":
+                docs = [project(doc, arg) for doc in docs]
+            else:
+                raise OperationFailure(f"unsupported pipeline stage {op}")
+
+        return [copy.deepcopy(doc) for doc in docs]
+
+    def _apply(self, index: int, request: Tuple, counts: Dict):
+        kind, filter, doc, upsert = request
+
+        if kind == "insert":
+            doc.setdefault("_id", ObjectId())
+            self._insert(copy.deepcopy(doc))
+            counts["nInserted"] += 1
+            return
+
+        found = self._select(filter, limit=1)
+        current = found[0][0] if found else None
+
+        if kind == "delete":
+            if current is not None:
+                self._delete(current["_id"])
+                counts["nRemoved"] += 1
+            return
+
+        if current is None:
+            if not upsert:
+                return
+            if kind == "update":
+                new = upserted_document(filter, doc)
+            else:
+                new = copy.deepcopy(doc)
+                if "_id" in filter and not isinstance(filter["_id"], dict):
+                    new.setdefault("_id", filter["_id"])
+            new.setdefault("_id", ObjectId())
+            self._insert(new)
+            counts["nUpserted"] += 1
+            counts["upserted"].append({"index": index, "_id": new["_id"]})
+            return
+
+        if kind == "update":
+            new = copy.deepcopy(current)
+            apply_update(new, doc)
+        else:
+            new = {**copy.deepcopy(doc), "_id": current["_id"]}
+
+        counts["nMatched"] += 1
+        if new != current:
+            self._replace(new)
+            counts["nModified"] += 1
+
+    def _bulk_write(self, requests: List[Tuple], ordered: bool) -> Result:
+        counts: Dict[str, Any] = {
+            "writeErrors": [],
+            "writeConcernErrors": [],
+            "nInserted": 0,
+            "nUpserted": 0,
+            "nMatched": 0,
+            "nModified": 0,
+            "nRemoved": 0,
+            "upserted": [],
+        }
+
+        with self._write():
+            for index, request in enumerate(requests):
+                try:
+                    self._apply(index, request, counts)
+                except DuplicateKeyError as e:
+                    counts["writeErrors"].append(
+                        {
+                            "index": index,
+                            "code": e.code,
+                            "errmsg": str(e),
+                            "keyValue": e.details.get("keyValue"),
+                        }
+                    )
+                    if ordered:
+                        break
+
+        if counts["writeErrors"]:
+            raise BulkWriteError(counts)
+
+        return Result(
+            inserted_count=counts["nInserted"],
+            matched_count=counts["nMatched"],
+            modified_count=counts["nModified"],
+            deleted_count=counts["nRemoved"],
+            upserted_count=counts["nUpserted"],
+            upserted_ids={u["index"]: u["_id"] for u in counts["upserted"]},
+        )
+
+    def _find_one_and_update(self, filter, update, projection, upsert, after):
+        with self._write():
+            found = self._select(filter, limit=1)
+            if not found:
+                if not upsert:
+                    return None
+                new = upserted_document(filter, update)
+                new.setdefault("_id", ObjectId())
+                self._insert(new)
+                return project(new, projection) if after else None
+
+            current = found[0][0]
+            new = copy.deepcopy(current)
+            apply_update(new, update)
+            returned = project(new if after else current, projection)
+            if new != current:
+                self._replace(new)
+            return returned
+
+    def _delete_matching(self, filter: Dict, limit: int) -> int:
+        with self._write():
+            found = self._select(filter, limit=limit)
+            for doc, _ in found:
+                self._delete(doc["_id"])
+        return len(found)
+
+    def _distinct(self, key: str, filter: Dict) -> List:
+        values: List = []
+        for doc, _ in self._select(filter or {}):
+            value = get_path(doc, key)
+            for v in value if isinstance(value, list) else [value]:
+                if v is not _MISSING and v not in values:
+                    values.append(v)
+        return values
+
+    def find(self, filter: Dict = None, projection: Dict = None) -> LocalCursor:
+        return LocalCursor(
+            lambda sort, skip, limit: self._call(
+                "find", self._find, filter, projection, sort, skip, limit
+            )
+        )
+
+    async def find_one(self, filter: Dict = None, projection: Dict = None):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        found = await self._call("find", self._find, filter, projection, (), 0, 1)
+        return found[0] if found else None
+
+    def aggregate(self, pipeline: List[Dict]) -> LocalCursor:
+        return LocalCursor(
+            lambda sort, skip, limit: self._call("aggregate", self._aggregate, pipeline)
+        )
+
+    async def distinct(self, key: str, filter: Dict = None) -> List:
+        return await self._call("distinct", self._distinct, key, filter)
+
+    async def count_documents(self, filter: Dict) -> int:
+        found = await self._call("count", self._select, filter)
+        return len(found)
+
+    async def insert_one(self, document: Dict) -> Result:
+        document.setdefault("_id", ObjectId())
+        await self._call("insert", self._insert_one, document)
+        return Result(inserted_id=document["_id"])
+
+    async def insert_many(self, documents: List[Dict], ordered: bool = True) -> Result:
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+        await self._call(
+            "insert",
+            self._bulk_write,
+            [("insert", {}, document, False) for document in documents],
+            ordered,
+        )
+        return Result(inserted_ids=[document["_id"] for document in documents])
+
+    async def bulk_write(self, requests: List, ordered: bool = True) -> Result:
+        requests = [write_request(request) for request in requests]
+        return await self._call("bulkWrite", self._bulk_write, requests, ordered)
+
+    async def find_one_and_update(
+        self,
+        filter: Dict,
+        update: Dict,
+        projection: Dict = None,
+        upsert: bool = False,
+        return_document: bool = False,
+    ):
+        return await self._call(
+            "findAndModify",
+            self._find_one_and_update,
+            filter,
+            update,
+            projection,
+            upsert,
+            bool(return_document),
+        )
+
+    async def delete_one(self, filter: Dict) -> Result:
+        deleted = await self._call("delete", self._delete_matching, filter, 1)
+        return Result(deleted_count=deleted)
+
+    async def delete_many(self, filter: Dict) -> Result:
+        deleted = await self._call("delete", self._delete_matching, filter, 0)
+        return Result(deleted_count=deleted)
+
+    async def create_indexes(self, indexes: List) -> List[str]:
+        return await self._call("createIndexes", self._create_indexes, indexes)
+
+    async def drop_index(self, name: str):
+        await self._call("dropIndexes", self._drop_index, name)
+
+
+class LocalDatabase:
+    def __init__(self, client: "LocalClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: Dict[str, LocalCollection] = {}
+
+    def __getitem__(self, name: str) -> LocalCollection:
+        if name not in self._collections:
+            self._collections[name] = self.client.collection_class(self, name)
+        return self._collections[name]
+
+
+class LocalClient:
+    collection_class = LocalCollection
+
+    def __init__(self):
+        self.admin = LocalAdmin()
+        self._databases: Dict[str, LocalDatabase] = {}
+
+    def __getitem__(self, name: str) -> LocalDatabase:
+        if name not in self._databases:
+            self._databases[name] = LocalDatabase(self, name)
+        return self._databases[name]
+
+    def close(self):
+        pass
@@ -0,0 +1,150 @@
+"""In-memory database backend, selected with `DATABASE_BACKEND=memory`.
+
+Documents live in a dict per collection keyed by `_id`, so nothing survives a
+restart and every worker process has its own data. It is meant for tests and
+for trying the API out without a database server. `$text` queries are
+answered from an inverted index built when the text index is created.
+"""
+
+import contextlib
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo.errors import OperationFailure
+
+from app.connections.documents import (
+    LocalClient,
+    LocalCollection,
+    contains_phrase,
+    get_path,
+    matches,
+    parse_text_search,
+    text_index_fields,
+    tokenize,
+)
+
+TEXT_INDEX_REQUIRED_ERROR_CODE: int = 27
+
+
+class MemoryCollection(LocalCollection):
+    def __init__(self, database, name: str):
+        super().__init__(database, name)
+        self._docs: Dict = {}
+        self._text_fields: List[Tuple[str, float]] = []
+        # term -> {_id: weighted term score}
+        self._postings: Dict[str, Dict] = {}
+
+    async def _run(self, fn: Callable, *args):
+        return fn(*args)
+
+    def _write(self):
+        # operations run to completion without yielding to the event loop,
+        # so they are atomic already
+        return contextlib.nullcontext()
+
+    def _term_scores(self, doc: Dict) -> Dict[str, float]:
+        scores: Dict[str, float] = {}
+        for field, weight in self._text_fields:
+            tokens = tokenize(get_path(doc, field))
+            for term, count in Counter(tokens).items():
+                # repeats raise the score, less so in longer text
+                score = weight * (0.5 + 0.5 * count / len(tokens))
+                scores[term] = scores.get(term, 0) + score
+        return scores
+
+    def _index(self, doc: Dict):
+        for term, score in self._term_scores(doc).items():
+            self._postings.setdefault(term, {})[doc["_id"]] = score
+
+    def _unindex(self, doc: Dict):
+        for term in self._term_scores(doc):
+            postings = self._postings.get(term, {})
+            postings.pop(doc["_id"], None)
+            if not postings:
+                self._postings.pop(term, None)
+
+    def _text_scores(self, search: str) -> Dict:
+        if not self._text_fields:
+            raise OperationFailure(
+                "text index required for $text query", TEXT_INDEX_REQUIRED_ERROR_CODE
+            )
+
+        terms, negated, phrases = parse_text_search(search)
+        scores: Dict = {}
+        for term in set(terms):
+            for _id, score in self._postings.get(term, {}).items():
+                scores[_id] = scores.get(_id, 0) + score
+
+        for term in negated:
+            for _id in self._postings.get(term, {}):
+                scores.pop(_id, None)
+
+        if phrases:
+            scores = {
+                _id: score
+                for _id, score in scores.items()
+                if all(self._has_phrase(self._docs[_id], p) for p in phrases)
+            }
+
+        return scores
+
+    def _has_phrase(self, doc: Dict, phrase: List[str]) -> bool:
+        return any(
+            contains_phrase(tokenize(get_path(doc, field)), phrase)
+            for field, _ in self._text_fields
+        )
+
+    def _candidates(self, filter: Dict) -> List[Dict]:
+        _id = filter.get("_id")
+        if _id is None or isinstance(_id, list):
+            return list(self._docs.values())
+        if not isinstance(_id, dict):
+            return [self._docs[_id]] if _id in self._docs else []
+        if list(_id) == ["$in"]:
+            return [self._docs[i] for i in dict.fromkeys(_id["$in"]) if i in self._docs]
+        return list(self._docs.values())
+
+    def _select(
+        self, filter: Dict, sort: Sequence = (), skip: int = 0, limit: int = 0
+    ) -> List[Tuple[Dict, Optional[float]]]:
+        if "$text" in filter:
+            scores = self._text_scores(filter["$text"]["$search"])
+            pairs = [(self._docs[_id], score) for _id, score in scores.items()]
+        else:
+            pairs = [(doc, None) for doc in self._candidates(filter)]
+
+        pairs = [(doc, score) for doc, score in pairs if matches(doc, filter)]
+        return self._page(pairs, sort, skip, limit)
+
+    def _insert(self, doc: Dict):
+        if doc["_id"] in self._docs:
+            raise self._duplicate_key(doc["_id"])
+        self._docs[doc["_id"]] = doc
+        self._index(doc)
+
+    def _replace(self, doc: Dict):
+        self._unindex(self._docs[doc["_id"]])
+        self._docs[doc["_id"]] = doc
+        self._index(doc)
+
+    def _delete(self, _id):
+        self._unindex(self._docs.pop(_id))
+
+    def _create_indexes(self, indexes: List) -> List[str]:
+        fields = text_index_fields(indexes)
+        if fields and fields != self._text_fields:
+            self._text_fields = fields
+            self._postings = {}
+            for doc in self._docs.values():
+                self._index(doc)
+
+        return [index.document["name"] for index in indexes]
+
+    def _drop_index(self, name: str):
+        # the only index kept is the text index, which is replaced when
+        # another one is created
+        pass
+
+
+class MemoryClient(LocalClient):
+    collection_class = MemoryCollection
@@ -0,0 +1,449 @@
+"""SQLite database backend, selected with `DATABASE_BACKEND=sqlite`, for
+single-node deployments that don't want to run a Mongo server.
+
+Each collection is a table of JSON documents keyed by `_id`:
+
+    CREATE TABLE "journal_entries.journal_entries" (
+        _id TEXT PRIMARY KEY, ext INTEGER NOT NULL, doc TEXT NOT NULL
+    )
+
+The indexes declared in `app.constants.index` become expression indexes over
+`json_extract(doc, ...)`, and the text index becomes an FTS5 table kept in
+sync by triggers and ranked with bm25. Filters and sorts are translated to
+SQL where they can be, so listing and keyset pagination are served from the
+indexes, and anything left over is matched in Python.
+
+The database runs in WAL mode, so readers don't block the writer, and all
+statements of a worker go through one connection on one thread, which keeps
+the event loop free while SQLite works.
+"""
+
+import asyncio
+import base64
+import contextlib
+import datetime
+import functools
+import json
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import orjson
+from bson import ObjectId, json_util
+from pymongo.errors import OperationFailure
+
+from app.connections.documents import (
+    LocalClient,
+    LocalCollection,
+    matches,
+    parse_text_search,
+    text_index_fields,
+    words,
+)
+
+TEXT_INDEX_REQUIRED_ERROR_CODE: int = 27
+BUSY_TIMEOUT_MS: int = 5000
+CACHE_SIZE_KIB: int = 65536
+
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _json_path(field: str) -> str:
+    parts = [p if _IDENTIFIER.fullmatch(p) else _quote(p) for p in field.split(".")]
+    return "'$." + ".".join(parts).replace("'", "''") + "'"
+
+
+def _column(field: str) -> str:
+    # the same text has to be used in the indexes and the queries for SQLite
+    # to match them up
+    return "_id" if field == "_id" else f"json_extract(doc, {_json_path(field)})"
+
+
+def _key(_id) -> str:
+    # string ids are stored as they are; anything else is prefixed so that it
+    # can't collide with one
+    return _id if isinstance(_id, str) else "\x00" + json_util.dumps(_id)
+
+
+def _is_scalar(value: Any) -> bool:
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def _encode(doc: Dict) -> Tuple[str, int]:
+    """Serializes `doc` with orjson. Values JSON has no type for are written
+    as extended JSON and the row is flagged, so only those rows pay for
+    decoding through `json_util`.
+    """
+    extended = False
+
+    def default(value):
+        nonlocal extended
+        extended = True
+        if isinstance(value, ObjectId):
+            return {"$oid": str(value)}
+        if isinstance(value, (bytes, bytearray)):
+            encoded = base64.b64encode(value).decode()
+            return {"$binary": {"base64": encoded, "subType": "00"}}
+        if isinstance(value, datetime.datetime):
+            return {"$date": {"$numberLong": str(int(value.timestamp() * 1000))}}
+        raise TypeError(f"cannot store {type(value).__name__}")
+
+    text = orjson.dumps(doc, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return text.decode(), int(extended)
+
+
+def _decode(text: str, extended: int) -> Dict:
+    return json_util.loads(text) if extended else orjson.loads(text)
+
+
+class SqliteCollection(LocalCollection):
+    def __init__(self, database, name: str):
+        super().__init__(database, name)
+        self._table = _quote(self.full_name)
+        self._text_table = _quote(f"{self.full_name}.text")
+        self._text_fields: Optional[List[Tuple[str, float]]] = None
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        return self.database.client.connection
+
+    async def _run(self, fn: Callable, *args):
+        return await self.database.client.run(self._prepared, fn, *args)
+
+    def _prepared(self, fn: Callable, *args):
+        if self._text_fields is None:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table} ("
+                "_id TEXT PRIMARY KEY, ext INTEGER NOT NULL, doc TEXT NOT NULL)"
+            )
+            row = self._connection.execute(
+                "SELECT fields FROM _text_indexes WHERE collection = ?",
+                (self.full_name,),
+            ).fetchone()
+            self._text_fields = [tuple(f) for f in json.loads(row[0])] if row else []
+        return fn(*args)
+
+    @contextlib.contextmanager
+    def _write(self):
+        if self._connection.in_transaction:
+            yield
+            return
+
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def _condition(self, field: str, op: str, arg: Any, params: List) -> Optional[str]:
+        """Returns the SQL for one operator on one field, adding its
+        parameters to `params`, or None if it has to be matched in Python.
+        """
+        column = _column(field)
+        if op == "$exists":
+            null = "IS NOT NULL" if arg else "IS NULL"
+            return f"json_type(doc, {_json_path(field)}) {null}"
+
+        values = arg if op in ("$in", "$nin") else [arg]
+        if field == "_id":
+            # ids compare as stored keys, which only order like the ids
+            # themselves for strings
+            if op not in ("$eq", "$ne", "$in", "$nin") and not isinstance(arg, str):
+                return None
+            if any(isinstance(v, (dict, list)) or v is None for v in values):
+                return None
+            values = [_key(v) for v in values]
+        elif not all(v is None or _is_scalar(v) for v in values):
+            return None
+
+        present = [v for v in values if v is not None]
+        if op in ("$eq", "$ne"):
+            if not present:
+                return f"{column} IS {'NOT ' if op == '$ne' else ''}NULL"
+            params.extend(present)
+            if op == "$eq":
+                return f"{column} = ?"
+            return f"({column} IS NULL OR {column} != ?)"
+        if op in ("$gt", "$gte", "$lt", "$lte"):
+            if not present:
+                return None
+            params.extend(present)
+            sign = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}[op]
+            return f"{column} {sign} ?"
+        if op in ("$in", "$nin"):
+            params.extend(present)
+            listed = f"{column} IN ({', '.join('?' * len(present))})"
+            if op == "$in":
+                parts = [listed] if present else []
+                if len(present) < len(values):
+                    parts.append(f"{column} IS NULL")
+                return "(" + " OR ".join(parts) + ")" if parts else "0"
+            # $nin matches missing fields unless null is one of the values
+            parts = [f"NOT {listed}"] if present else []
+            if len(present) < len(values):
+                return "(" + " AND ".join(parts + [f"{column} IS NOT NULL"]) + ")"
+            return f"({column} IS NULL OR {' AND '.join(parts) or '1'})"
+        return None
+
+    def _translate(self, filter: Dict) -> Tuple[List[str], List, bool]:
+        """Translates `filter` into SQL conditions and their parameters, and
+        whether they express all of it.
+        """
+        clauses: List[str] = []
+        params: List = []
+        exact = True
+
+        for key, condition in filter.items():
+            if key == "$text":
+                continue
+            if key in ("$or", "$and"):
+                parts = [self._translate(f) for f in condition]
+                if not all(part_exact for _, _, part_exact in parts):
+                    exact = False
+                    continue
+                joiner = " OR " if key == "$or" else " AND "
+                clauses.append(
+                    "("
+                    + joiner.join(
+                        "(" + (" AND ".join(c) or "1") + ")" for c, _, _ in parts
+                    )
+                    + ")"
+                )
+                params.extend(p for _, ps, _ in parts for p in ps)
+                continue
+
+            if isinstance(condition, dict) and any(
+                k.startswith("$") for k in condition
+            ):
+                operators = condition
+            else:
+                operators = {"$eq": condition}
+
+            for op, arg in operators.items():
+                clause = self._condition(key, op, arg, params)
+                if clause is None:
+                    exact = False
+                else:
+                    clauses.append(clause)
+
+        return clauses, params, exact
+
+    def _text_query(self, search: str) -> Optional[str]:
+        """The FTS5 query for a `$text` search, or None if it can't match.
+        FTS5 stems with the porter tokenizer, so the words go in unstemmed.
+        """
+        terms, negated, phrases = parse_text_search(search, split=words)
+
+        def quote(tokens):
+            return '"' + " ".join(tokens) + '"'
+
+        if phrases:
+            query = " AND ".join(quote(p) for p in phrases)
+        elif terms:
+            query = " OR ".join(quote([t]) for t in terms)
+        else:
+            return None
+
+        if negated:
+            query = f"({query}) NOT ({' OR '.join(quote([t]) for t in negated)})"
+        return query
+
+    def _select(
+        self, filter: Dict, sort: Sequence = (), skip: int = 0, limit: int = 0
+    ) -> List[Tuple[Dict, Optional[float]]]:
+        clauses, params, exact = self._translate(filter)
+        columns = "doc, ext, NULL"
+        source = self._table
+
+        if "$text" in filter:
+            if not self._text_fields:
+                raise OperationFailure(
+                    "text index required for $text query",
+                    TEXT_INDEX_REQUIRED_ERROR_CODE,
+                )
+            query = self._text_query(filter["$text"]["$search"])
+            if query is None:
+                return []
+            weights = ", ".join(str(weight) for _, weight in self._text_fields)
+            columns = f"doc, ext, -bm25({self._text_table}, {weights}) AS score"
+            source += (
+                f" JOIN {self._text_table}"
+                f" ON {self._text_table}.rowid = {self._table}.rowid"
+            )
+            clauses.insert(0, f"{self._text_table} MATCH ?")
+            params.insert(0, query)
+
+        sql = f"SELECT {columns} FROM {source}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if sort:
+            order = []
+            for field, direction in sort:
+                if isinstance(direction, dict):
+                    order.append("score DESC")
+                else:
+                    order.append(
+                        f"{_column(field)} {'ASC' if direction == 1 else 'DESC'}"
+                    )
+            sql += " ORDER BY " + ", ".join(order)
+        if exact and (limit or skip):
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit or -1, skip])
+
+        rows = self._connection.execute(sql, params).fetchall()
+        pairs = [(_decode(doc, ext), score) for doc, ext, score in rows]
+        if exact:
+            return pairs
+
+        pairs = [(doc, score) for doc, score in pairs if matches(doc, filter)]
+        return pairs[skip : skip + limit if limit else None]
+
+    def _insert(self, doc: Dict):
+        text, extended = _encode(doc)
+        try:
+            self._connection.execute(
+                f"INSERT INTO {self._table} (_id, ext, doc) VALUES (?, ?, ?)",
+                (_key(doc["_id"]), extended, text),
+            )
+        except sqlite3.IntegrityError:
+            raise self._duplicate_key(doc["_id"]) from None
+
+    def _replace(self, doc: Dict):
+        text, extended = _encode(doc)
+        self._connection.execute(
+            f"UPDATE {self._table} SET ext = ?, doc = ? WHERE _id = ?",
+            (extended, text, _key(doc["_id"])),
+        )
+
+    def _delete(self, _id):
+        self._connection.execute(
+            f"DELETE FROM {self._table} WHERE _id = ?", (_key(_id),)
+        )
+
+    def _create_text_index(self, fields: List[Tuple[str, float]]):
+        columns = [f"c{i}" for i in range(len(fields))]
+        values = [f"json_extract(new.doc, {_json_path(f)})" for f, _ in fields]
+        trigger = f"{self.full_name}.text"
+
+        for event in ("insert", "update", "delete"):
+            self._connection.execute(
+                f"DROP TRIGGER IF EXISTS {_quote(f'{trigger}_{event}')}"
+            )
+        self._connection.execute(f"DROP TABLE IF EXISTS {self._text_table}")
+        self._connection.execute(
+            f"CREATE VIRTUAL TABLE {self._text_table} USING fts5("
+            f"{', '.join(columns)}, tokenize='porter unicode61')"
+        )
+        self._connection.execute(
+            f"CREATE TRIGGER {_quote(f'{trigger}_insert')} AFTER INSERT ON "
+            f"{self._table} BEGIN INSERT INTO {self._text_table} "
+            f"(rowid, {', '.join(columns)}) VALUES (new.rowid, {', '.join(values)}); "
+            "END"
+        )
+        self._connection.execute(
+            f"CREATE TRIGGER {_quote(f'{trigger}_update')} AFTER UPDATE ON "
+            f"{self._table} BEGIN UPDATE {self._text_table} SET "
+            + ", ".join(f"{c} = {v}" for c, v in zip(columns, values))
+            + " WHERE rowid = old.rowid; END"
+        )
+        self._connection.execute(
+            f"CREATE TRIGGER {_quote(f'{trigger}_delete')} AFTER DELETE ON "
+            f"{self._table} BEGIN DELETE FROM {self._text_table} "
+            "WHERE rowid = old.rowid; END"
+        )
+        self._connection.execute(
+            f"INSERT INTO {self._text_table} (rowid, {', '.join(columns)}) "
+            f"SELECT rowid, {', '.join(v.replace('new.', '') for v in values)} "
+            f"FROM {self._table}"
+        )
+        self._connection.execute(
+            "INSERT OR REPLACE INTO _text_indexes (collection, fields) VALUES (?, ?)",
+            (self.full_name, json.dumps(fields)),
+        )
+        self._text_fields = fields
+
+    def _create_indexes(self, indexes: List) -> List[str]:
+        names = []
+        with self._write():
+            for index in indexes:
+                document = index.document
+                name = f"{self.full_name}.{document['name']}"
+                names.append(document["name"])
+                keys = list(document["key"].items())
+
+                if any(kind == "text" for _, kind in keys):
+                    fields = text_index_fields([index])
+                    if fields != self._text_fields:
+                        self._create_text_index(fields)
+                    continue
+
+                expressions = ", ".join(
+                    f"{_column(field)} {'ASC' if direction == 1 else 'DESC'}"
+                    for field, direction in keys
+                )
+                self._connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS {_quote(name)} "
+                    f"ON {self._table} ({expressions})"
+                )
+
+        return names
+
+    def _drop_index(self, name: str):
+        # the text index is kept until another one replaces it, as there is
+        # only ever one
+        with self._write():
+            self._connection.execute(
+                f"DROP INDEX IF EXISTS {_quote(f'{self.full_name}.{name}')}"
+            )
+
+
+class SqliteClient(LocalClient):
+    collection_class = SqliteCollection
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The connection, opened on first use. Only used from the executor
+        thread.
+        """
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.path, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode = WAL")
+            # with WAL, a crash can lose the last commits but can't corrupt
+            # the database
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            connection.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+            connection.execute("PRAGMA temp_store = MEMORY")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS _text_indexes ("
+                "collection TEXT PRIMARY KEY, fields TEXT NOT NULL)"
+            )
+            self._connection = connection
+        return self._connection
+
+    async def run(self, fn: Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+
+    def close(self):
+        def _close():
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+        self._executor.submit(_close).result()
@@ -0,0 +1,8 @@
+import os
+
+# entries created longer ago than this are moved to the archive collection
+ARCHIVE_AFTER_DAYS: int = int(os.environ.get("ARCHIVE_AFTER_DAYS", 90))
+ARCHIVE_BATCH_SIZE: int = 500
+ARCHIVE_COMPRESSION_LEVEL: int = 6
+# field of an archived entry holding its compressed content
+ARCHIVE_BLOB_FIELD: str = "blob"
@@ -1,3 +1,5 @@
 JOURNAL_ENTRIES_COLLECTION = "journal_entries"
 JOURNAL_THEMES_COLLECTION = "journal_themes"
-JOURNAL_THEME_DATA_COLLECTION = "journal_theme_data"
\ No newline at end of file
+JOURNAL_THEME_DATA_COLLECTION = "journal_theme_data"
+JOURNAL_STATS_COLLECTION = "journal_stats"
+JOURNAL_ENTRIES_ARCHIVE_COLLECTION = "journal_entries_archive"
@@ -1,6 +1,32 @@
-from app.constants.error_messages import INVALID_RESOURCE_ID
+from app.constants.error_messages import (
+    INVALID_RESOURCE_ID,
+    INVALID_CURSOR,
+    INVALID_FIELDS,
+    MISSING_USER_ID,
+    UNKNOWN_THEME_DATA,
+)
 
 
 class InvalidResourceID(Exception):
     def __init__(self, errors):
         super().__init__(INVALID_RESOURCE_ID)
+
+
+class InvalidCursor(Exception):
+    def __init__(self):
+        super().__init__(INVALID_CURSOR)
+
+
+class InvalidFields(Exception):
+    def __init__(self):
+        super().__init__(INVALID_FIELDS)
+
+
+class UnknownThemeData(Exception):
+    def __init__(self):
+        super().__init__(UNKNOWN_THEME_DATA)
+
+
+class MissingUserID(Exception):
+    def __init__(self):
+        super().__init__(MISSING_USER_ID)
@@ -1 +1,8 @@
 INVALID_RESOURCE_ID = "The resource ID supplied is invalid"
+INVALID_CURSOR = "The pagination cursor supplied is invalid"
+INVALID_FIELDS = "The fields requested are not valid"
+SERVICE_OVERLOADED = "The service is overloaded, retry later"
+ENTRY_UPDATE_CONFLICT = "The entry was changed since it was read"
+EMPTY_PATCH = "The patch does not change any field"
+UNKNOWN_THEME_DATA = "The theme data supplied does not exist"
+MISSING_USER_ID = "The request does not name the user it acts for"
@@ -0,0 +1,4 @@
+EXPORT_BATCH_SIZE: int = 1000
+# lines are buffered up to this many bytes before being written to the response
+EXPORT_CHUNK_BYTES: int = 64 * 1024
+EXPORT_MEDIA_TYPE: str = "application/x-ndjson"
@@ -0,0 +1,28 @@
+VIEW_FULL: str = "full"
+VIEW_SUMMARY: str = "summary"
+
+# fields of an entry, as the API exposes it, that can be asked for with `fields=`
+ENTRY_FIELDS = (
+    "_id",
+    "created_at",
+    "updated_at",
+    "theme",
+    "theme.theme",
+    "theme.name",
+    "theme.short_description",
+    "theme.detailed_description",
+    "theme.accent_color",
+    "theme.data",
+    "content",
+    "content.quote",
+    "content.idea_nudge",
+    "content.idea",
+    "content.thought_nudge",
+    "content.thought",
+)
+
+# code points of idea or thought text sent in the summary view
+SUMMARY_TEXT_LENGTH: int = 120
+
+# longest editing session token a PATCH can carry
+MAX_EDITOR_LENGTH: int = 64
@@ -0,0 +1,11 @@
+import os
+
+from app.constants.user import USER_ID_HEADER
+
+THEMES_MAX_AGE_SECONDS: int = int(os.environ.get("THEMES_MAX_AGE_SECONDS", 60))
+THEMES_CACHE_CONTROL: str = f"public, max-age={THEMES_MAX_AGE_SECONDS}"
+# entries are personal and may be edited, so they are always revalidated
+ENTRY_CACHE_CONTROL: str = "private, no-cache"
+# entries are returned for the user the request names, so a cache has to key
+# them on it
+ENTRY_VARY: str = USER_ID_HEADER
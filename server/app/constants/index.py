@@ -0,0 +1,86 @@
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from app.constants import collection
+
+# Entries and rollups are owned by one user, and every query of them has an
+# equality on `user_id`, so each collection can be sharded on this key with
+# reads and writes going to a single shard. Every index on them leads with
+# `user_id` for the same reason: a user's reads cost the same however many
+# other users there are.
+SHARD_KEY = [("user_id", ASCENDING), ("_id", ASCENDING)]
+
+INDEXES = {
+    collection.JOURNAL_ENTRIES_COLLECTION: [
+        # newest-first listing and keyset pagination
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_created_at_id",
+        ),
+        # theme filtered listing
+        IndexModel(
+            [
+                ("user_id", ASCENDING),
+                ("theme.theme", ASCENDING),
+                ("created_at", DESCENDING),
+                ("_id", DESCENDING),
+            ],
+            name="user_theme_created_at_id",
+        ),
+        # full text search over what the user wrote; the prefix makes every
+        # $text query name the user, and only that user's postings are read
+        IndexModel(
+            [("user_id", ASCENDING), ("content.idea", TEXT), ("content.thought", TEXT)],
+            weights={"content.idea": 2, "content.thought": 1},
+            name="user_content_text",
+        ),
+        # the archival job, which walks old entries across every user
+        IndexModel(
+            [("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="created_at_id",
+        ),
+    ],
+    # the archive is listed and exported alongside the entries but not searched
+    collection.JOURNAL_ENTRIES_ARCHIVE_COLLECTION: [
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="user_created_at_id",
+        ),
+        IndexModel(
+            [
+                ("user_id", ASCENDING),
+                ("theme.theme", ASCENDING),
+                ("created_at", DESCENDING),
+                ("_id", DESCENDING),
+            ],
+            name="user_theme_created_at_id",
+        ),
+    ],
+    collection.JOURNAL_STATS_COLLECTION: [
+        IndexModel([("user_id", ASCENDING), ("day", ASCENDING)], name="user_day"),
+    ],
+    collection.JOURNAL_THEME_DATA_COLLECTION: [
+        # $match on theme before $sample in get_n_random
+        IndexModel([("theme", ASCENDING)], name="theme"),
+        # resolving the theme data a new entry was written against when it
+        # is not in the pool
+        IndexModel(
+            [
+                ("theme", ASCENDING),
+                ("quote", ASCENDING),
+                ("idea_nudge", ASCENDING),
+                ("thought_nudge", ASCENDING),
+            ],
+            name="theme_content",
+        ),
+    ],
+}
+
+# indexes replaced by the ones above when entries got an owner; dropped by
+# scripts/migrate_user_partition.py
+SUPERSEDED_INDEXES = {
+    collection.JOURNAL_ENTRIES_COLLECTION: ["theme_created_at_id", "content_text"],
+    collection.JOURNAL_ENTRIES_ARCHIVE_COLLECTION: [
+        "created_at_id",
+        "theme_created_at_id",
+    ],
+}
@@ -0,0 +1 @@
+IMPORT_BATCH_SIZE: int = 1000
@@ -0,0 +1,7 @@
+# the Elm list page sends no limit and does not follow the next cursor, so
+# the default covers as many entries as it always showed
+DEFAULT_PAGE_SIZE: int = 100
+MAX_PAGE_SIZE: int = 100
+NEXT_CURSOR_HEADER: str = "X-Next-Cursor"
+# ids accepted by one batch get
+MAX_BATCH_GET_IDS: int = 100
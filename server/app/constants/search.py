@@ -0,0 +1,4 @@
+# text search ranks every match, so results are only paged this deep
+MAX_SEARCH_RESULTS: int = 500
+MAX_QUERY_LENGTH: int = 256
+SNIPPET_LENGTH: int = 160
@@ -0,0 +1,20 @@
+from app.models.base import JournalThemeType
+
+THEMES = [
+    {
+        "theme": JournalThemeType.amor_fati,
+        "name": "Amor Fati",
+        "short_description": "A Love of Fate",
+        "detailed_description": "Treating each and every moment—no matter how challenging—as something to be embraced, not avoided.",
+        "accent_color": "#008fb3",
+    },
+    {
+        "theme": JournalThemeType.premeditatio_malorum,
+        "name": "Premeditatio Malorum",
+        "short_description": "Premeditation of Evils",
+        "detailed_description": "This is a Stoic exercise of imagining things that could go wrong or be taken away from us",
+        "accent_color": "#7575a3",
+    },
+]
+
+THEMES_BY_KEY = {t["theme"].value: t for t in THEMES}
@@ -0,0 +1,14 @@
+import os
+
+# Set by the gateway in front of the API to the id of the signed in user. It
+# is only trusted with TRUST_USER_ID_HEADER, which must only be turned on
+# behind a proxy that authenticates the caller and overwrites any value the
+# client sent; without it every request acts for DEFAULT_USER_ID.
+USER_ID_HEADER: str = "X-User-Id"
+TRUST_USER_ID_HEADER: bool = (
+    os.environ.get("TRUST_USER_ID_HEADER", "false").lower() == "true"
+)
+MAX_USER_ID_LENGTH: int = 128
+# owner of every request when the header is not trusted, and of entries
+# written before entries had an owner
+DEFAULT_USER_ID: str = os.environ.get("DEFAULT_USER_ID", "default")
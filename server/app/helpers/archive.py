@@ -0,0 +1,57 @@
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from pymongo import ASCENDING
+
+from app.constants.archive import ARCHIVE_BLOB_FIELD, ARCHIVE_COMPRESSION_LEVEL
+from app.helpers.serializer import dumps
+
+
+def compress(entry: Dict, level: int = ARCHIVE_COMPRESSION_LEVEL) -> Dict:
+    """Returns the archived form of a stored entry: the same document with its
+    content replaced by one zlib compressed JSON blob. The fields entries are
+    listed and filtered by stay as they are so the archive can be indexed.
+    """
+    archived = {k: v for k, v in entry.items() if k != "content"}
+    archived[ARCHIVE_BLOB_FIELD] = zlib.compress(dumps(entry.get("content")), level)
+    archived["archived_at"] = int(time.time())
+    return archived
+
+
+def expand(archived: Dict) -> Dict:
+    """Reverses `compress`. Archived entries read with a projection that left
+    out the blob are returned without content.
+    """
+    entry = {
+        k: v
+        for k, v in archived.items()
+        if k not in (ARCHIVE_BLOB_FIELD, "archived_at")
+    }
+    blob = archived.get(ARCHIVE_BLOB_FIELD)
+    if blob is not None:
+        entry["content"] = orjson.loads(zlib.decompress(blob))
+    return entry
+
+
+async def archivable(
+    entries, cutoff: int, after: Optional[Tuple[int, str]], limit: int
+) -> List[Dict]:
+    """Returns the next `limit` entries, across every user, that were created
+    and last updated before `cutoff`, oldest first, after the (created_at, _id)
+    keyset `after`.
+    """
+    query = {"created_at": {"$lt": cutoff}, "updated_at": {"$lt": cutoff}}
+    if after is not None:
+        query["$or"] = [
+            {"created_at": {"$gt": after[0]}},
+            {"created_at": after[0], "_id": {"$gt": after[1]}},
+        ]
+
+    return (
+        await entries.find(query)
+        .sort([("created_at", ASCENDING), ("_id", ASCENDING)])
+        .limit(limit)
+        .to_list(length=limit)
+    )
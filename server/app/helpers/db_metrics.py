@@ -0,0 +1,147 @@
+import bisect
+import os
+import random
+import threading
+from typing import Dict, List
+
+from pymongo import monitoring
+
+from app.helpers import logs, prometheus
+
+SLOW_COMMAND_MS: float = float(os.environ.get("DB_SLOW_COMMAND_MS", 100))
+LOG_SAMPLE_RATE: float = float(os.environ.get("DB_LOG_SAMPLE_RATE", 0))
+
+# upper bounds, in seconds, of the command latency histogram buckets
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+logger = logs.queue_logger("app.db")
+
+
+class _CommandStats:
+    __slots__ = ("buckets", "total", "errors")
+
+    def __init__(self):
+        self.buckets: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total: float = 0
+        self.errors: int = 0
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Aggregates the latency and error count of every command by command name.
+
+    Motor runs pymongo, and with it this listener, on its executor threads.
+    Each thread records into its own shard, so the hot path takes no lock and
+    readers merge the shards when the metrics are scraped. Only slow commands,
+    and a `LOG_SAMPLE_RATE` fraction of the rest, are logged, through a queue
+    so that writing to stderr happens off the calling thread.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Dict[str, _CommandStats]] = []
+
+    def _shard(self) -> Dict[str, _CommandStats]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            self._shards.append(shard)
+        return shard
+
+    def _record(self, event, failed: bool):
+        shard = self._shard()
+        stats = shard.get(event.command_name)
+        if stats is None:
+            stats = shard[event.command_name] = _CommandStats()
+
+        seconds = event.duration_micros / 1e6
+        stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        stats.total += seconds
+        if failed:
+            stats.errors += 1
+
+        millis = event.duration_micros / 1000
+        if failed or millis >= SLOW_COMMAND_MS or random.random() < LOG_SAMPLE_RATE:
+            logger.info(
+                "command %s with request id %s on server %s %s in %.1fms",
+                event.command_name,
+                event.request_id,
+                event.connection_id,
+                "failed" if failed else "succeeded",
+                millis,
+            )
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, failed=False)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+    def snapshot(self) -> Dict[str, _CommandStats]:
+        merged: Dict[str, _CommandStats] = {}
+
+        for shard in list(self._shards):
+            for command_name, stats in list(shard.items()):
+                total = merged.get(command_name)
+                if total is None:
+                    total = merged[command_name] = _CommandStats()
+                total.buckets = [a + b for a, b in zip(total.buckets, stats.buckets)]
+                total.total += stats.total
+                total.errors += stats.errors
+
+        return merged
+
+    def render(self) -> List[str]:
+        snapshot = self.snapshot()
+        lines = prometheus.header(
+            "mongo_command_duration_seconds",
+            "histogram",
+            "Latency of MongoDB commands by command name.",
+        )
+        for command_name, stats in sorted(snapshot.items()):
+            lines.extend(
+                prometheus.histogram(
+                    "mongo_command_duration_seconds",
+                    LATENCY_BUCKETS,
+                    stats.buckets,
+                    stats.total,
+                    {"command": command_name},
+                )
+            )
+
+        lines.extend(
+            prometheus.header(
+                "mongo_command_errors_total",
+                "counter",
+                "Failed MongoDB commands by command name.",
+            )
+        )
+        for command_name, stats in sorted(snapshot.items()):
+            lines.append(
+                prometheus.sample(
+                    "mongo_command_errors_total",
+                    stats.errors,
+                    {"command": command_name},
+                )
+            )
+
+        return lines
+
+
+COMMAND_METRICS = CommandMetrics()
@@ -0,0 +1,34 @@
+import zlib
+from typing import AsyncIterator, Dict
+
+from app.constants.export import EXPORT_CHUNK_BYTES
+from app.helpers import serializer
+
+
+async def ndjson_chunks(
+    entries: AsyncIterator[Dict], compress: bool = False
+) -> AsyncIterator[bytes]:
+    """Encodes `entries` as newline delimited JSON, yielding a chunk whenever
+    `EXPORT_CHUNK_BYTES` have been buffered. With `compress` the chunks form a
+    single gzip stream.
+    """
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    buffer = bytearray()
+
+    async for entry in entries:
+        buffer += serializer.dumps(entry)
+        buffer += b"\n"
+
+        if len(buffer) >= EXPORT_CHUNK_BYTES:
+            chunk = bytes(buffer)
+            buffer.clear()
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = bytes(buffer)
+    if compressor is not None:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,57 @@
+from typing import Dict, List
+
+from app.constants.error import InvalidFields
+from app.constants.fields import ENTRY_FIELDS, SUMMARY_TEXT_LENGTH
+from app.constants.theme import THEMES_BY_KEY
+
+
+def parse_fields(fields: str) -> List[str]:
+    """Splits a comma separated `fields=` value, rejecting unknown fields."""
+    parsed = [field.strip() for field in fields.split(",") if field.strip()]
+    if not parsed or any(field not in ENTRY_FIELDS for field in parsed):
+        raise InvalidFields()
+
+    return parsed
+
+
+def select(entry: Dict, fields: List[str]) -> Dict:
+    """Returns only `fields` of `entry`, plus the `_id` and `created_at` that
+    page cursors are built from.
+    """
+    selected: Dict = {"_id": entry["_id"], "created_at": entry.get("created_at")}
+
+    for field in fields:
+        parent, _, child = field.partition(".")
+        if parent not in entry:
+            continue
+        if not child:
+            selected[parent] = entry[parent]
+        elif isinstance(entry[parent], dict) and child in entry[parent]:
+            selected.setdefault(parent, {})[child] = entry[parent][child]
+
+    return selected
+
+
+def summarize(entry: Dict, length: int = SUMMARY_TEXT_LENGTH) -> Dict:
+    """Builds the summary view of an entry read with the summary projection,
+    whose `snippet` is at most one code point longer than `length`. Archived
+    entries come with their content instead, which the snippet is cut from.
+    """
+    key = entry.get("theme", {}).get("theme")
+    static = THEMES_BY_KEY.get(key, {})
+    snippet = entry.get("snippet")
+    if snippet is None:
+        content = entry.get("content") or {}
+        snippet = content.get("idea") or content.get("thought")
+    snippet = snippet or ""
+
+    return {
+        "_id": entry["_id"],
+        "created_at": entry.get("created_at"),
+        "theme": {
+            "theme": key,
+            "name": static.get("name", ""),
+            "accent_color": static.get("accent_color", ""),
+        },
+        "snippet": snippet[:length] + ("…" if len(snippet) > length else ""),
+    }
@@ -0,0 +1,34 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Response, status
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Checks `etag` against an If-None-Match header, which may be `*` or a
+    comma separated list of, possibly weak, entity tags.
+    """
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+
+    return False
+
+
+def content_etag(body: bytes) -> str:
+    """A strong entity tag derived from the representation itself, so every
+    worker, and every restart of one, hands out the same tag for the same bytes.
+    """
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def not_modified(etag: str, cache_control: str, vary: str = None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if vary is not None:
+        headers["Vary"] = vary
+
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
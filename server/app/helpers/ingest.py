@@ -0,0 +1,23 @@
+from typing import AsyncIterator, Iterable
+
+
+async def ndjson_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Splits a byte stream into its non-empty lines without buffering more
+    than one partial line.
+    """
+    pending = b""
+
+    async for chunk in stream:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+
+    if pending.strip():
+        yield pending
+
+
+async def iterate(items: Iterable) -> AsyncIterator:
+    for item in items:
+        yield item
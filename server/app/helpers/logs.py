@@ -0,0 +1,25 @@
+"""Loggers that are safe to call on the event loop: records are put on a queue
+and written to stderr by a listener thread, so a slow stderr never stalls the
+requests in flight. Logs, trace summaries included, stay off stdout so that
+scripts can print their results there.
+"""
+
+import logging
+import logging.handlers
+import queue
+import sys
+
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(
+    _log_queue, logging.StreamHandler(sys.stderr)
+)
+_log_listener.start()
+
+
+def queue_logger(name: str, level: int = logging.INFO) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    logger.propagate = False
+    if not logger.handlers:
+        logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+    return logger
@@ -0,0 +1,199 @@
+"""Watchdog for work that blocks the event loop.
+
+A task on the loop wakes up every `interval_ms` and records how late it was
+woken, which is how long everything else on the loop was kept waiting, into a
+lag histogram. A thread watches for the task falling behind: once the loop
+has not come back for `threshold_ms` it captures the loop thread's stack,
+which is the code blocking it, and the stall is logged with that stack when
+the loop resumes.
+
+With a `budget_ms`, stalls longer than the budget are also kept, and `check`
+raises `LoopStallError` for them, so a benchmark or test run can fail on any
+handler that blocks the loop.
+"""
+
+import asyncio
+import bisect
+import collections
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Deque, List, Optional
+
+from app.helpers import logs, prometheus
+
+LOOP_MONITOR_ENABLED: bool = (
+    os.environ.get("LOOP_MONITOR_ENABLED", "false").lower() == "true"
+)
+LOOP_MONITOR_INTERVAL_MS: float = float(os.environ.get("LOOP_MONITOR_INTERVAL_MS", 20))
+LOOP_STALL_THRESHOLD_MS: float = float(os.environ.get("LOOP_STALL_THRESHOLD_MS", 100))
+# fail when the loop is blocked for longer than this; 0 disables the check
+LOOP_STALL_BUDGET_MS: float = float(os.environ.get("LOOP_STALL_BUDGET_MS", 0))
+
+# upper bounds, in seconds, of the loop lag histogram buckets
+LAG_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+MAX_KEPT_STALLS: int = 100
+# innermost frames of the blocked stack that are kept
+STACK_DEPTH: int = 20
+
+logger = logs.queue_logger("app.loop")
+
+
+class Stall:
+    __slots__ = ("at", "lag_ms", "stack")
+
+    def __init__(self, lag_ms: float, stack: Optional[str]):
+        self.at = time.time()
+        self.lag_ms = lag_ms
+        self.stack = stack
+
+
+class LoopStallError(AssertionError):
+    def __init__(self, stalls: List[Stall], budget_ms: float):
+        self.stalls = stalls
+        details = "\n".join(
+            f"blocked for {s.lag_ms:.1f}ms in:\n{s.stack or '  (no stack captured)'}"
+            for s in stalls
+        )
+        super().__init__(
+            f"the event loop was blocked longer than {budget_ms:.0f}ms "
+            f"{len(stalls)} time(s)\n{details}"
+        )
+
+
+class LoopMonitor:
+    def __init__(
+        self,
+        interval_ms: float = LOOP_MONITOR_INTERVAL_MS,
+        threshold_ms: float = LOOP_STALL_THRESHOLD_MS,
+        budget_ms: float = LOOP_STALL_BUDGET_MS,
+    ):
+        self.interval_ms = interval_ms
+        self.threshold_ms = threshold_ms
+        self.budget_ms = budget_ms
+        self.buckets: List[int] = [0] * (len(LAG_BUCKETS) + 1)
+        self.total: float = 0
+        self.stalls: int = 0
+        self.over_budget: Deque[Stall] = collections.deque(maxlen=MAX_KEPT_STALLS)
+        self._beat: float = 0
+        self._loop_thread: Optional[int] = None
+        # stack of the loop thread captured during the current stall
+        self._stack: Optional[str] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def _heartbeat(self):
+        interval = self.interval_ms / 1000
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            self._beat = time.monotonic()
+            self._observe(max(0.0, self._beat - expected))
+
+    def _observe(self, lag: float):
+        self.buckets[bisect.bisect_left(LAG_BUCKETS, lag)] += 1
+        self.total += lag
+
+        with self._lock:
+            stack, self._stack = self._stack, None
+
+        lag_ms = lag * 1000
+        if self.budget_ms and lag_ms > self.budget_ms:
+            self.over_budget.append(Stall(lag_ms, stack))
+
+        if lag_ms >= self.threshold_ms:
+            self.stalls += 1
+            logger.warning(
+                "event loop blocked for %.1fms in:\n%s",
+                lag_ms,
+                stack or "  (no stack captured)",
+            )
+
+    def _watch(self):
+        capture_ms = min(self.threshold_ms, self.budget_ms or self.threshold_ms)
+        # checked often enough to catch the blocker while it still blocks
+        period = min(self.interval_ms, capture_ms) / 2000
+        while not self._stopped.wait(period):
+            behind_ms = (time.monotonic() - self._beat) * 1000 - self.interval_ms
+            if behind_ms < capture_ms or self._stack is not None:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                stack = "".join(traceback.format_stack(frame, STACK_DEPTH))
+                with self._lock:
+                    self._stack = stack
+
+    async def start(self):
+        if self.running:
+            return
+
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-monitor", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self):
+        if not self.running:
+            return
+
+        self._task.cancel()
+        self._task = None
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def check(self):
+        """Raises `LoopStallError` if the loop was blocked for longer than
+        `budget_ms` since the last check.
+        """
+        stalls = list(self.over_budget)
+        self.over_budget.clear()
+        if stalls:
+            raise LoopStallError(stalls, self.budget_ms)
+
+    def render(self) -> List[str]:
+        lines = prometheus.header(
+            "event_loop_lag_seconds",
+            "histogram",
+            "How late the event loop ran a task scheduled to wake up on time.",
+        )
+        lines.extend(
+            prometheus.histogram(
+                "event_loop_lag_seconds", LAG_BUCKETS, self.buckets, self.total
+            )
+        )
+        lines += prometheus.header(
+            "event_loop_stalls_total",
+            "counter",
+            f"Times the event loop was blocked for {self.threshold_ms:.0f}ms or more.",
+        )
+        lines.append(prometheus.sample("event_loop_stalls_total", self.stalls))
+        return lines
+
+
+LOOP_MONITOR = LoopMonitor()
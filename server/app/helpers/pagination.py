@@ -0,0 +1,43 @@
+import base64
+import json
+from typing import Any, Tuple
+
+from app.constants.error import InvalidCursor
+
+
+def encode_cursor(created_at: int, entry_id: Any) -> str:
+    """Packs the keyset of the last entry on a page into an opaque, url safe
+    token. Clients are expected to hand it back unchanged to fetch the next page.
+    """
+    raw = json.dumps([created_at, str(entry_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, entry_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise InvalidCursor()
+
+    if not isinstance(created_at, int) or not isinstance(entry_id, str):
+        raise InvalidCursor()
+
+    return created_at, entry_id
+
+
+def encode_offset_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode()).decode().rstrip("=")
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise InvalidCursor()
+
+    if offset < 0:
+        raise InvalidCursor()
+
+    return offset
@@ -0,0 +1,44 @@
+"""Minimal helpers for rendering metrics in the Prometheus text exposition
+format.
+"""
+
+from typing import Dict, Iterable, List, Sequence
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    pairs = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    return "{" + pairs + "}"
+
+
+def header(name: str, metric_type: str, help_text: str) -> List[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+
+
+def sample(name: str, value: float, labels: Dict[str, str] = None) -> str:
+    return f"{name}{_labels(labels or {})} {value}"
+
+
+def histogram(
+    name: str,
+    bounds: Sequence[float],
+    bucket_counts: Sequence[int],
+    total: float,
+    labels: Dict[str, str] = None,
+) -> Iterable[str]:
+    """Renders a histogram from non-cumulative `bucket_counts`, which hold one
+    more element than `bounds` for observations above the last bound.
+    """
+    labels = labels or {}
+    cumulative = 0
+
+    for bound, count in zip(bounds, bucket_counts):
+        cumulative += count
+        yield sample(f"{name}_bucket", cumulative, {**labels, "le": str(bound)})
+
+    cumulative += bucket_counts[-1]
+    yield sample(f"{name}_bucket", cumulative, {**labels, "le": "+Inf"})
+    yield sample(f"{name}_sum", total, labels)
+    yield sample(f"{name}_count", cumulative, labels)
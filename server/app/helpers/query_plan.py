@@ -0,0 +1,111 @@
+"""Helpers for checking, at test time, that every query the repositories issue
+is served by an index.
+
+Usage:
+    recorder = QueryRecorder()
+    monitoring.register(recorder)  # before the client is created
+    ... exercise the repositories ...
+    await assert_no_collscan(client, recorder.commands)
+"""
+
+from typing import Dict, Iterator, List, Tuple
+
+from pymongo import monitoring
+
+EXPLAINABLE_COMMANDS = {
+    "find",
+    "aggregate",
+    "count",
+    "distinct",
+    "delete",
+    "update",
+    "findAndModify",
+}
+
+# fields the driver adds to every command which explain does not accept
+_DRIVER_FIELDS = {
+    "lsid",
+    "$db",
+    "$clusterTime",
+    "$readPreference",
+    "txnNumber",
+    "autocommit",
+    "startTransaction",
+    "readConcern",
+    "writeConcern",
+}
+
+
+class CollectionScanError(AssertionError):
+    pass
+
+
+class QueryRecorder(monitoring.CommandListener):
+    def __init__(self):
+        self.commands: List[Tuple[str, Dict]] = []
+
+    def started(self, event):
+        if event.command_name not in EXPLAINABLE_COMMANDS:
+            return
+
+        command = {k: v for k, v in event.command.items() if k not in _DRIVER_FIELDS}
+        self.commands.append((event.database_name, command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def clear(self):
+        self.commands = []
+
+
+def _stages(plan) -> Iterator[str]:
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+def _walk(doc) -> Iterator[Tuple[str, object]]:
+    if isinstance(doc, dict):
+        for key, value in doc.items():
+            yield key, value
+            yield from _walk(value)
+    elif isinstance(doc, list):
+        for value in doc:
+            yield from _walk(value)
+
+
+async def explain(client, database_name: str, command: Dict) -> Dict:
+    return await client[database_name].command(
+        {"explain": command, "verbosity": "queryPlanner"}
+    )
+
+
+async def assert_no_collscan(client, commands: List[Tuple[str, Dict]]):
+    """Runs explain on each recorded command and raises `CollectionScanError`
+    listing every command whose winning plan contains a COLLSCAN stage.
+    """
+    offenders = []
+
+    for database_name, command in commands:
+        result = await explain(client, database_name, command)
+        query_planners = [
+            v for k, v in _walk(result) if k == "queryPlanner" and isinstance(v, dict)
+        ]
+        for planner in query_planners:
+            if "COLLSCAN" in _stages(planner.get("winningPlan", {})):
+                offenders.append(command)
+                break
+
+    if offenders:
+        raise CollectionScanError(
+            "queries planned as collection scans: "
+            + "; ".join(str(command) for command in offenders)
+        )
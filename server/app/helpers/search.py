@@ -0,0 +1,36 @@
+import re
+from typing import Dict, List
+
+from app.constants.search import SNIPPET_LENGTH
+
+_WORD = re.compile(r"\w+")
+
+
+def query_terms(text: str) -> List[str]:
+    return [term.lower() for term in _WORD.findall(text)]
+
+
+def _matches(word: str, term: str) -> bool:
+    return word.startswith(term) or (len(word) >= 3 and term.startswith(word))
+
+
+def build_snippet(entry: Dict, terms: List[str], length: int = SNIPPET_LENGTH) -> str:
+    """Returns up to `length` characters of the entry's idea or thought,
+    centred on the first word that starts with one of `terms`. Words are
+    matched by prefix since the text index matches on stems.
+    """
+    content = entry.get("content", {})
+    fields = [content.get("idea") or "", content.get("thought") or ""]
+
+    for text in fields:
+        for match in _WORD.finditer(text):
+            word = match.group().lower()
+            if any(_matches(word, term) for term in terms):
+                start = max(0, match.start() - length // 3)
+                end = min(len(text), start + length)
+                prefix = "…" if start > 0 else ""
+                suffix = "…" if end < len(text) else ""
+                return prefix + text[start:end].strip() + suffix
+
+    text = next((text for text in fields if text), "")
+    return text[:length] + ("…" if len(text) > length else "")
@@ -0,0 +1,33 @@
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.helpers import tracing
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+
+    if isinstance(obj, BaseModel):
+        return obj.dict(by_alias=True)
+
+    raise TypeError(f"type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serializes `content` with orjson. ObjectIds (and so PyObjectIds) are
+    written as strings, which is how the pydantic models encode them, so
+    documents read from Mongo can be written out as-is without first being
+    validated into a model and run through `jsonable_encoder`.
+    """
+    return orjson.dumps(content, default=_default)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        with tracing.span("serialize"):
+            return dumps(content)
@@ -0,0 +1,51 @@
+import datetime
+from typing import Dict, Iterable, List, Tuple
+
+
+def day_key(created_at: int) -> str:
+    return datetime.datetime.utcfromtimestamp(created_at).date().isoformat()
+
+
+def rollup_id(user_id: str, day: str, theme: str) -> str:
+    return f"{user_id}:{day}:{theme}"
+
+
+def streaks(days: Iterable[str], today: datetime.date = None) -> Tuple[int, int]:
+    """Returns the (current, longest) run of consecutive days in `days`. The
+    current streak is still alive if the last entry was made yesterday.
+    """
+    if today is None:
+        today = datetime.datetime.utcnow().date()
+
+    ordered = sorted({datetime.date.fromisoformat(day) for day in days})
+    longest = run = 0
+    previous = None
+
+    for day in ordered:
+        run = run + 1 if previous and (day - previous).days == 1 else 1
+        longest = max(longest, run)
+        previous = day
+
+    current = run if previous and (today - previous).days <= 1 else 0
+    return current, longest
+
+
+def summarize(rollups: List[Dict]) -> Dict:
+    by_theme: Dict[str, int] = {}
+    by_day: Dict[str, int] = {}
+
+    for rollup in rollups:
+        if rollup["count"] <= 0:
+            continue
+        by_theme[rollup["theme"]] = by_theme.get(rollup["theme"], 0) + rollup["count"]
+        by_day[rollup["day"]] = by_day.get(rollup["day"], 0) + rollup["count"]
+
+    current_streak, longest_streak = streaks(by_day.keys())
+
+    return {
+        "total": sum(by_theme.values()),
+        "by_theme": by_theme,
+        "by_day": [{"day": day, "count": by_day[day]} for day in sorted(by_day)],
+        "current_streak": current_streak,
+        "longest_streak": longest_streak,
+    }
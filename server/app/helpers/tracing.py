@@ -0,0 +1,137 @@
+"""Request scoped timing of the work done on behalf of a request.
+
+The trace of the request being handled lives in a context variable. Motor
+runs pymongo on its executor threads inside a copy of the caller's context,
+so `CommandTracer` can attribute each command to the request that issued it.
+Work done for several requests at once, such as a coalesced insert, is
+attributed to the request that started it.
+"""
+
+import contextlib
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from pymongo import monitoring
+
+from app.helpers import logs
+
+TRACE_SAMPLE_RATE: float = float(os.environ.get("TRACE_SAMPLE_RATE", 0.01))
+# requests carrying this header are always traced
+TRACE_HEADER: str = "X-Request-Trace"
+
+logger = logs.queue_logger("app.trace")
+
+
+class RequestTrace:
+    __slots__ = ("method", "path", "started", "spans", "_lock")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started: float = time.perf_counter()
+        # span name -> [count, seconds]
+        self.spans: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [1, seconds]
+            else:
+                span[0] += 1
+                span[1] += seconds
+
+    def total(self, prefix: str) -> float:
+        return sum(s for name, (_, s) in self.spans.items() if name.startswith(prefix))
+
+    def server_timing(self) -> str:
+        """Renders the trace so far as a Server-Timing header, with the time
+        not accounted for by any span reported as `app`.
+        """
+        elapsed = time.perf_counter() - self.started
+        db_commands = sum(
+            n for name, (n, _) in self.spans.items() if name.startswith("db.")
+        )
+        metrics = {"db": self.total("db.")}
+        metrics.update(
+            (name, seconds)
+            for name, (_, seconds) in self.spans.items()
+            if not name.startswith("db.")
+        )
+        metrics["app"] = max(0.0, elapsed - sum(metrics.values()))
+        metrics["total"] = elapsed
+
+        parts = []
+        for name, seconds in metrics.items():
+            part = f"{name};dur={seconds * 1000:.2f}"
+            if name == "db":
+                part += f';desc="{db_commands} commands"'
+            parts.append(part)
+        return ", ".join(parts)
+
+    def summary(self, status_code: int) -> Dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": status_code,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "spans": {
+                name: {"count": int(n), "ms": round(seconds * 1000, 3)}
+                for name, (n, seconds) in sorted(self.spans.items())
+            },
+        }
+
+
+_CURRENT: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def start(method: str, path: str):
+    """Starts tracing the current request and returns the token to `stop` it."""
+    return _CURRENT.set(RequestTrace(method, path))
+
+
+def stop(token):
+    _CURRENT.reset(token)
+
+
+def current() -> Optional[RequestTrace]:
+    return _CURRENT.get()
+
+
+def record(name: str, seconds: float):
+    trace = _CURRENT.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+@contextlib.contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times the enclosed block as `name` when the request is traced."""
+    trace = _CURRENT.get()
+    if trace is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - started)
+
+
+class CommandTracer(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record(f"db.{event.command_name}", event.duration_micros / 1e6)
+
+    def failed(self, event):
+        record(f"db.{event.command_name}", event.duration_micros / 1e6)
+
+
+COMMAND_TRACER = CommandTracer()
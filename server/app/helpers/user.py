@@ -0,0 +1,28 @@
+from typing import Optional
+
+from fastapi import Header
+
+from app.constants.error import MissingUserID
+from app.constants.user import (
+    DEFAULT_USER_ID,
+    MAX_USER_ID_LENGTH,
+    TRUST_USER_ID_HEADER,
+    USER_ID_HEADER,
+)
+
+
+def get_user_id(
+    user_id: Optional[str] = Header(
+        None, alias=USER_ID_HEADER, min_length=1, max_length=MAX_USER_ID_LENGTH
+    )
+) -> str:
+    """The user the request acts for. Every read and write of entries and
+    stats is scoped to it. The header is ignored unless it is trusted, and
+    required when it is.
+    """
+    if not TRUST_USER_ID_HEADER:
+        return DEFAULT_USER_ID
+
+    if user_id is None:
+        raise MissingUserID()
+    return user_id
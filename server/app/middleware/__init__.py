@@ -0,0 +1,4 @@
+"""Module with ASGI middleware wrapped around the whole app"""
+
+from .admission import AdmissionControlMiddleware, ADMISSION_CONTROLLER
+from .tracing import TracingMiddleware
@@ -0,0 +1,215 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from fastapi import status
+
+from app.constants.error_messages import SERVICE_OVERLOADED
+from app.helpers import prometheus, tracing
+from app.helpers.serializer import FastJSONResponse
+
+THEMES_GROUP: str = "themes"
+LIST_GROUP: str = "list"
+WRITE_GROUP: str = "write"
+# content patches spend most of their time waiting out the autosave debounce
+# window rather than on the database, so they get their own, larger group
+# instead of holding write slots while they wait
+PATCH_GROUP: str = "patch"
+
+# a limit of 0 turns admission control off for that group
+GROUP_LIMITS: Dict[str, int] = {
+    THEMES_GROUP: int(os.environ.get("ADMISSION_THEMES_CONCURRENCY", 64)),
+    LIST_GROUP: int(os.environ.get("ADMISSION_LIST_CONCURRENCY", 32)),
+    WRITE_GROUP: int(os.environ.get("ADMISSION_WRITE_CONCURRENCY", 32)),
+    PATCH_GROUP: int(os.environ.get("ADMISSION_PATCH_CONCURRENCY", 256)),
+}
+GROUP_QUEUE_SIZES: Dict[str, int] = {
+    THEMES_GROUP: int(os.environ.get("ADMISSION_THEMES_QUEUE_SIZE", 128)),
+    LIST_GROUP: int(os.environ.get("ADMISSION_LIST_QUEUE_SIZE", 64)),
+    WRITE_GROUP: int(os.environ.get("ADMISSION_WRITE_QUEUE_SIZE", 64)),
+    PATCH_GROUP: int(os.environ.get("ADMISSION_PATCH_QUEUE_SIZE", 256)),
+}
+QUEUE_TIMEOUT_MS: float = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_MS", 2000))
+RETRY_AFTER_SECONDS: int = int(os.environ.get("ADMISSION_RETRY_AFTER_SECONDS", 1))
+
+_THEME_PREFIXES = ("/v1/themes", "/v1/theme_data")
+_READ_PREFIXES = ("/v1/journals", "/v1/stats")
+_READ_METHODS = ("GET", "HEAD")
+
+
+def route_group(method: str, path: str) -> Optional[str]:
+    """Returns the group a request is admitted under, or None for requests
+    that do not touch the database, such as health checks and metrics.
+    """
+    if path.startswith(_THEME_PREFIXES):
+        return THEMES_GROUP
+    if path.startswith(_READ_PREFIXES):
+        if method in _READ_METHODS:
+            return LIST_GROUP
+        return PATCH_GROUP if method == "PATCH" else WRITE_GROUP
+    return None
+
+
+class AdmissionGate:
+    """Lets at most `limit` requests run at once and up to `queue_size` more
+    wait, first come first served, for at most `queue_timeout_ms`. Requests
+    beyond that are shed straight away instead of adding to the backlog of
+    work waiting on the database.
+    """
+
+    def __init__(self, limit: int, queue_size: int, queue_timeout_ms: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout_ms = queue_timeout_ms
+        self.in_flight: int = 0
+        self.admitted: int = 0
+        self.shed: int = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+        if len(self._waiters) >= self.queue_size:
+            self.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait([waiter], timeout=self.queue_timeout_ms / 1000)
+        except asyncio.CancelledError:
+            # a slot handed over as the waiting request went away is passed on
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._drop(waiter)
+            raise
+
+        if not waiter.done():
+            self._drop(waiter)
+            self.shed += 1
+            return False
+
+        self.admitted += 1
+        return True
+
+    def _drop(self, waiter: asyncio.Future):
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self):
+        # the slot moves straight to the oldest waiter, so in_flight is only
+        # decremented when nobody is queued
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        limits: Dict[str, int] = GROUP_LIMITS,
+        queue_sizes: Dict[str, int] = GROUP_QUEUE_SIZES,
+        queue_timeout_ms: float = QUEUE_TIMEOUT_MS,
+    ):
+        self.gates: Dict[str, AdmissionGate] = {
+            group: AdmissionGate(limit, queue_sizes.get(group, 0), queue_timeout_ms)
+            for group, limit in limits.items()
+            if limit > 0
+        }
+
+    def gate(self, method: str, path: str) -> Optional[AdmissionGate]:
+        group = route_group(method, path)
+        return self.gates.get(group) if group is not None else None
+
+    def render(self) -> List[str]:
+        gauges = (
+            ("admission_in_flight", "in_flight", "Requests running by route group."),
+            (
+                "admission_queue_depth",
+                "queue_depth",
+                "Requests waiting by route group.",
+            ),
+        )
+        counters = (
+            (
+                "admission_admitted_total",
+                "admitted",
+                "Requests admitted by route group.",
+            ),
+            (
+                "admission_shed_total",
+                "shed",
+                "Requests shed with a 503 by route group.",
+            ),
+        )
+
+        lines = []
+        for metric_type, metrics in (("gauge", gauges), ("counter", counters)):
+            for name, attribute, help_text in metrics:
+                lines.extend(prometheus.header(name, metric_type, help_text))
+                for group, gate in sorted(self.gates.items()):
+                    lines.append(
+                        prometheus.sample(
+                            name, getattr(gate, attribute), {"group": group}
+                        )
+                    )
+
+        return lines
+
+
+ADMISSION_CONTROLLER = AdmissionController()
+
+
+class AdmissionControlMiddleware:
+    """Per-worker admission control for the routes that are bound by the
+    database. A plain ASGI middleware, so a streamed response such as the
+    export holds its slot until the last chunk is sent.
+    """
+
+    def __init__(self, app, controller: AdmissionController = ADMISSION_CONTROLLER):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        gate = self.controller.gate(scope["method"], scope["path"])
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        admitted = await gate.acquire()
+        tracing.record("queue", time.perf_counter() - started)
+
+        if not admitted:
+            response = FastJSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"error": SERVICE_OVERLOADED},
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
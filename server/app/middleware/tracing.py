@@ -0,0 +1,48 @@
+import random
+
+from app.helpers import serializer, tracing
+
+_TRACE_HEADER = tracing.TRACE_HEADER.lower().encode()
+
+
+class TracingMiddleware:
+    """Traces a `TRACE_SAMPLE_RATE` fraction of requests, and every request
+    carrying the `X-Request-Trace` header. Traced responses get a
+    Server-Timing header, and a JSON summary of each traced request is
+    logged once it has been sent. Untraced requests cost one random draw.
+    """
+
+    def __init__(self, app, sample_rate: float = tracing.TRACE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    def _sampled(self, scope) -> bool:
+        if random.random() < self.sample_rate:
+            return True
+        return any(name == _TRACE_HEADER for name, _ in scope["headers"])
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._sampled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        token = tracing.start(scope["method"], scope["path"])
+        trace = tracing.current()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"server-timing", trace.server_timing().encode()),
+                    (b"timing-allow-origin", b"*"),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            tracing.logger.info(serializer.dumps(trace.summary(status_code)).decode())
+            tracing.stop(token)
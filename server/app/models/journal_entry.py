@@ -15,6 +15,14 @@ class JournalEntryContent(BaseModel):
     thought: str
 
 
+class JournalEntryContentPatch(BaseModel):
+    quote: Union[str, None] = None
+    idea_nudge: Union[str, None] = None
+    idea: Union[str, None] = None
+    thought_nudge: Union[str, None] = None
+    thought: Union[str, None] = None
+
+
 class JournalEntry(BaseModel):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     theme: JournalTheme
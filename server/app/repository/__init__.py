@@ -1,2 +1,4 @@
 from .journal_entry import get_journal_entry_repo
 from .journal_theme_data import get_journal_theme_data_repo
+from .theme_data_pool import get_theme_data_pool
+from .journal_stats import get_journal_stats_repo
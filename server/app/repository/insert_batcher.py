@@ -0,0 +1,112 @@
+import asyncio
+import os
+from typing import Dict, List, Set, Tuple
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+
+COALESCE_WINDOW_MS: float = float(os.environ.get("WRITE_COALESCE_WINDOW_MS", 2))
+COALESCE_MAX_BATCH: int = int(os.environ.get("WRITE_COALESCE_MAX_BATCH", 500))
+
+_DUPLICATE_KEY_ERROR_CODE: int = 11000
+
+
+def _write_error(err: Dict) -> WriteError:
+    if err.get("code") == _DUPLICATE_KEY_ERROR_CODE:
+        return DuplicateKeyError(err["errmsg"], err["code"], err)
+    return WriteError(err["errmsg"], err.get("code"), err)
+
+
+class InsertBatcher:
+    """Groups inserts into one collection that arrive within `window_ms` of
+    each other into a single unordered insert_many.
+
+    Each caller awaits a future that resolves to the document it submitted,
+    with its `_id`, or raises the write error for that document alone.
+    """
+
+    def __init__(
+        self,
+        collection,
+        window_ms: float = COALESCE_WINDOW_MS,
+        max_batch: int = COALESCE_MAX_BATCH,
+    ):
+        self.collection = collection
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self._pending: List[Tuple[Dict, asyncio.Future]] = []
+        self._flush_handle = None
+        # the loop only keeps weak references to tasks, so the flushes in
+        # flight are held here until they are done
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def submit(self, doc: Dict) -> Dict:
+        if self.window_ms <= 0:
+            await self.collection.insert_one(doc)
+            return doc
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((doc, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._schedule_flush(0)
+        elif self._flush_handle is None:
+            self._schedule_flush(self.window_ms / 1000)
+
+        return await future
+
+    def _schedule_flush(self, delay: float):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+
+        loop = asyncio.get_running_loop()
+        self._flush_handle = loop.call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        task = asyncio.ensure_future(self._flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self):
+        self._flush_handle = None
+        batch, self._pending = (
+            self._pending[: self.max_batch],
+            self._pending[self.max_batch :],
+        )
+
+        if self._pending:
+            self._schedule_flush(0)
+
+        if not batch:
+            return
+
+        errors: Dict[int, Exception] = {}
+        try:
+            await self.collection.insert_many([doc for doc, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            errors = {
+                err["index"]: _write_error(err) for err in e.details["writeErrors"]
+            }
+        except Exception as e:
+            errors = {index: e for index in range(len(batch))}
+
+        for index, (doc, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in errors:
+                future.set_exception(errors[index])
+            else:
+                future.set_result(doc)
+
+
+_BATCHERS: Dict[str, InsertBatcher] = {}
+
+
+def get_insert_batcher(collection) -> InsertBatcher:
+    """Returns the batcher shared by every repository writing to `collection`."""
+    batcher = _BATCHERS.get(collection.full_name)
+    if batcher is None:
+        batcher = _BATCHERS[collection.full_name] = InsertBatcher(collection)
+
+    batcher.collection = collection
+    return batcher
@@ -1,37 +1,448 @@
+import asyncio
+import heapq
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
 from fastapi import Depends
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
-from app.constants import error
+from app.constants import collection, error, export, fields, pagination
+from app.constants.archive import ARCHIVE_BLOB_FIELD
+from app.constants.user import DEFAULT_USER_ID
+from app.helpers import archive as archive_helpers
 from app.models import journal_entry as entry_models
 from app.connections.database import get_journal_entries_collection
+from app.helpers.user import get_user_id
+from app.repository.insert_batcher import get_insert_batcher
+from app.repository.patch_debouncer import get_patch_debouncer
+from app.repository.read_cache import get_read_cache
+from app.repository.theme_catalog import THEME_CATALOG, THEME_DATA_FIELDS
+
+
+def _entry_key(entry: Dict) -> Tuple:
+    return (entry["created_at"], entry["_id"])
+
+
+async def _next(entries: AsyncIterator[Dict]) -> Optional[Dict]:
+    try:
+        return await entries.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def _merge(
+    hot: AsyncIterator[Dict], cold: AsyncIterator[Dict], key: Callable = _entry_key
+) -> AsyncIterator[Dict]:
+    """Merges two streams of entries sorted ascending on `key`. An entry found
+    in both, which only happens while the archival job is moving it, is
+    yielded once, from `hot`.
+    """
+    a, b = await _next(hot), await _next(cold)
+
+    while a is not None or b is not None:
+        if b is None or (a is not None and key(a) <= key(b)):
+            if b is not None and key(a) == key(b):
+                b = await _next(cold)
+            yield a
+            a = await _next(hot)
+        else:
+            yield b
+            b = await _next(cold)
 
 
 class JournalEntryRepo:
-    def __init__(self, db):
+    """Entries are stored with a reference to their theme data rather than an
+    embedded copy of the theme; see `app.repository.theme_catalog`. Methods
+    take and return entries in the embedded shape the API exposes.
+
+    Old entries are moved by `scripts/archive_entries.py` to an archive
+    collection in the same database, with their content compressed; see
+    `app.helpers.archive`. Reads span both collections and writes move an
+    archived entry back first. Only search is limited to entries that are not
+    archived.
+
+    A repository acts for one user: entries are stored with its `user_id`,
+    and every query, cache key and conditional write names it, so the entries
+    of other users behave as if they did not exist.
+    """
+
+    def __init__(
+        self, db, theme_catalog=THEME_CATALOG, archive=None, user_id=DEFAULT_USER_ID
+    ):
         self.db = db
+        self.user_id = user_id
+        self.theme_catalog = theme_catalog
+        self.archive = (
+            archive
+            if archive is not None
+            else db.database[collection.JOURNAL_ENTRIES_ARCHIVE_COLLECTION]
+        )
+
+    @staticmethod
+    def _archive_projection(projection: Optional[Dict]) -> Optional[Dict]:
+        """Maps a projection on entries to one on archived entries, where the
+        content, and so anything computed from it, is only in the blob.
+        """
+        if projection is None:
+            return None
+
+        archived = {
+            field: value
+            for field, value in projection.items()
+            if not field.startswith("content") and not isinstance(value, dict)
+        }
+        if len(archived) < len(projection):
+            archived[ARCHIVE_BLOB_FIELD] = 1
+
+        return archived
+
+    def _cache_key(self, entry_id: str) -> Tuple[str, str]:
+        return (self.user_id, entry_id)
+
+    async def _find_stored(self, entry_id: str) -> Optional[Dict]:
+        query = {"user_id": self.user_id, "_id": entry_id}
+        entry = await self.db.find_one(query)
+        if entry is not None:
+            return entry
+
+        archived = await self.archive.find_one(query)
+        return archive_helpers.expand(archived) if archived is not None else None
+
+    async def _find_stored_many(self, keys: List[Tuple[str, str]]) -> Dict:
+        ids = [entry_id for _, entry_id in keys]
+        cursor = self.db.find({"user_id": self.user_id, "_id": {"$in": ids}})
+        found = {
+            self._cache_key(entry["_id"]): entry
+            for entry in await cursor.to_list(length=None)
+        }
+
+        archived_ids = [
+            entry_id for entry_id in ids if self._cache_key(entry_id) not in found
+        ]
+        if archived_ids:
+            cursor = self.archive.find(
+                {"user_id": self.user_id, "_id": {"$in": archived_ids}}
+            )
+            async for archived in cursor:
+                found[self._cache_key(archived["_id"])] = archive_helpers.expand(
+                    archived
+                )
+
+        return found
+
+    async def _restore(self, entry_id: str) -> bool:
+        """Moves an archived entry back so that it can be updated."""
+        query = {"user_id": self.user_id, "_id": entry_id}
+        archived = await self.archive.find_one(query)
+        if archived is None:
+            return False
+
+        try:
+            await self.db.insert_one(archive_helpers.expand(archived))
+        except DuplicateKeyError:
+            pass
+        await self.archive.delete_one(query)
+        get_read_cache(self.db).invalidate(self._cache_key(entry_id))
+        return True
 
     async def find_one_journal_entry(self, entry_id: str):
         if entry_id == "" or entry_id is None:
             raise error.InvalidResourceID()
 
-        journal_entry = await self.db.find_one({"_id": entry_id})
+        journal_entry = await get_read_cache(self.db).get(
+            self._cache_key(entry_id), lambda: self._find_stored(entry_id)
+        )
+        if journal_entry is None:
+            return None
+
+        hydrated = await self.theme_catalog.hydrate([journal_entry])
+        return hydrated[0]
+
+    async def find_many_by_id(self, ids: List[str]) -> Dict[str, Dict]:
+        """Returns the entries with the given ids, by id, leaving out the ids
+        that do not exist. Ids not in the read cache are fetched with one
+        `$in` query, and only those not found there are looked up in the
+        archive.
+        """
+        stored = await get_read_cache(self.db).get_many(
+            [self._cache_key(entry_id) for entry_id in ids], self._find_stored_many
+        )
+        hydrated = await self.theme_catalog.hydrate(list(stored.values()))
+        return {entry["_id"]: entry for entry in hydrated}
+
+    def _build_query(self, created_after: int, created_before: int, theme: str) -> Dict:
+        query: Dict = {"user_id": self.user_id}
+        created_at: Dict = {}
+
+        if created_after:
+            created_at["$gt"] = created_after
+
+        if created_before:
+            created_at["$lt"] = created_before
 
-        return journal_entry
+        if created_at:
+            query["created_at"] = created_at
 
-    async def find(self):
-        entries = list()
-        cursor = self.db.find({})
+        if theme is not None and theme != "":
+            query["theme.theme"] = theme
 
-        for doc in await cursor.to_list(length=100):  # use pagination
-            entries.append(doc)
+        return query
 
-        return entries
+    @staticmethod
+    def fields_projection(requested: List[str]) -> Dict:
+        """Maps fields of the API shape to the stored fields they are built
+        from. The whole stored `theme` is read for any theme field or theme
+        data field of the content, since those are resolved from it.
+        """
+        projection: Dict = {"created_at": 1}
+
+        for field in requested:
+            parent, _, child = field.partition(".")
+            if parent == "theme" or (
+                parent == "content" and (not child or child in THEME_DATA_FIELDS)
+            ):
+                projection["theme"] = 1
+            if parent != "theme":
+                projection[field] = 1
+
+        if "content" in projection:
+            projection = {
+                field: 1 for field in projection if not field.startswith("content.")
+            }
+
+        return projection
+
+    @staticmethod
+    def summary_projection(length: int = fields.SUMMARY_TEXT_LENGTH) -> Dict:
+        """Reads the theme key and the first `length` + 1 code points of the
+        idea, or of the thought when there is no idea, so the rest of the text
+        never leaves the database.
+        """
+        idea = {"$ifNull": ["$content.idea", ""]}
+        text = {
+            "$cond": [
+                {"$ne": [idea, ""]},
+                idea,
+                {"$ifNull": ["$content.thought", ""]},
+            ]
+        }
+        return {
+            "created_at": 1,
+            "theme.theme": 1,
+            "snippet": {"$substrCP": [text, 0, length + 1]},
+        }
+
+    async def find(
+        self,
+        created_after: int = 0,
+        created_before: int = 0,
+        theme: str = None,
+        after: Tuple[int, str] = None,
+        limit: int = pagination.DEFAULT_PAGE_SIZE,
+        projection: Dict = None,
+    ) -> Tuple[List[Dict], Optional[Tuple[int, str]]]:
+        """Returns one page of entries, newest first, together with the keyset
+        of the last entry when there is a further page.
+
+        Pages are addressed by the (created_at, _id) of the last entry seen
+        rather than by an offset, so the cost of fetching a page does not grow
+        with how deep into the journal it is. With a `projection`, which must
+        include `created_at`, entries are hydrated from whatever it reads.
+        A page is read from both tiers and merged.
+        """
+        limit = max(1, min(limit, pagination.MAX_PAGE_SIZE))
+
+        query = self._build_query(created_after, created_before, theme)
+
+        if after is not None:
+            last_created_at, last_id = after
+            query["$or"] = [
+                {"created_at": {"$lt": last_created_at}},
+                {"created_at": last_created_at, "_id": {"$lt": last_id}},
+            ]
+
+        order = [("created_at", DESCENDING), ("_id", DESCENDING)]
+        hot, cold = await asyncio.gather(
+            self.db.find(query, projection)
+            .sort(order)
+            .limit(limit + 1)
+            .to_list(length=limit + 1),
+            self.archive.find(query, self._archive_projection(projection))
+            .sort(order)
+            .limit(limit + 1)
+            .to_list(length=limit + 1),
+        )
+
+        entries = []
+        merged = heapq.merge(
+            hot, map(archive_helpers.expand, cold), key=_entry_key, reverse=True
+        )
+        for entry in merged:
+            if entries and entries[-1]["_id"] == entry["_id"]:
+                continue
+            entries.append(entry)
+            if len(entries) > limit:
+                break
+
+        next_key = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_key = (entries[-1]["created_at"], entries[-1]["_id"])
+
+        return await self.theme_catalog.hydrate(entries), next_key
+
+    async def search(
+        self,
+        text: str,
+        created_after: int = 0,
+        created_before: int = 0,
+        theme: str = None,
+        skip: int = 0,
+        limit: int = pagination.DEFAULT_PAGE_SIZE,
+    ) -> Tuple[List[Dict], bool]:
+        """Returns one page of entries matching `text` on the content text
+        index, best match first, and whether there are more matches. Only the
+        fields needed to render a result are read. Archived entries are not
+        searched, since their text is compressed.
+        """
+        limit = max(1, min(limit, pagination.MAX_PAGE_SIZE))
+
+        query = self._build_query(created_after, created_before, theme)
+        query["$text"] = {"$search": text}
+        projection = {
+            "score": {"$meta": "textScore"},
+            "created_at": 1,
+            "theme.theme": 1,
+            "content.idea": 1,
+            "content.thought": 1,
+        }
+
+        cursor = (
+            self.db.find(query, projection)
+            .sort([("score", {"$meta": "textScore"}), ("created_at", DESCENDING)])
+            .skip(skip)
+            .limit(limit + 1)
+        )
+        entries = await cursor.to_list(length=limit + 1)
+
+        return entries[:limit], len(entries) > limit
+
+    async def iter_entries(
+        self,
+        created_after: int = 0,
+        created_before: int = 0,
+        theme: str = None,
+        batch_size: int = export.EXPORT_BATCH_SIZE,
+        projection: Dict = None,
+    ) -> AsyncIterator[Dict]:
+        """Yields every matching entry from both tiers, oldest first, without
+        holding more than one cursor batch of each in memory. Entries are
+        yielded as stored when a `projection` is given, and hydrated a batch
+        at a time otherwise.
+        """
+        query = self._build_query(created_after, created_before, theme)
+        order = [("created_at", ASCENDING), ("_id", ASCENDING)]
+        hot = self.db.find(query, projection).sort(order).batch_size(batch_size)
+        cold = (
+            self.archive.find(query, self._archive_projection(projection))
+            .sort(order)
+            .batch_size(batch_size)
+        )
+        entries = _merge(
+            (entry async for entry in hot),
+            (archive_helpers.expand(entry) async for entry in cold),
+        )
+
+        if projection is not None:
+            async for entry in entries:
+                yield entry
+            return
+
+        batch = []
+        async for entry in entries:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                for hydrated in await self.theme_catalog.hydrate(batch):
+                    yield hydrated
+                batch = []
+
+        for hydrated in await self.theme_catalog.hydrate(batch):
+            yield hydrated
 
     async def insert_one(self, data: entry_models.JournalEntry):
-        new = await self.db.insert_one(data)
-        journal = await self.find_one_journal_entry(new.inserted_id)
+        """Returns the inserted document instead of reading it back.
+        Concurrent inserts are coalesced into one insert_many. Raises
+        `UnknownThemeData` when the entry's theme data does not exist.
+        """
+        stored = {**await self.theme_catalog.normalize(data), "user_id": self.user_id}
+        await get_insert_batcher(self.db).submit(stored)
+        get_read_cache(self.db).invalidate(self._cache_key(stored["_id"]))
+
+        hydrated = await self.theme_catalog.hydrate([stored])
+        return hydrated[0]
+
+    async def update_content(
+        self,
+        entry_id: str,
+        expected_updated_at: int,
+        content: Dict[str, str],
+        editor: str = None,
+    ) -> Optional[Dict]:
+        """Sets only the given content fields, if the entry's `updated_at` is
+        still `expected_updated_at`. Patches of one `editor` to one entry that
+        arrive in quick succession are written together. Returns the updated
+        entry, or None when it does not exist, was changed since, or another
+        editor has a patch against the same version pending.
+        """
+        debouncer = get_patch_debouncer(self.db)
+        entry = await debouncer.submit(
+            self.user_id, entry_id, expected_updated_at, content, editor
+        )
+        if entry is None and await self._restore(entry_id):
+            entry = await debouncer.submit(
+                self.user_id, entry_id, expected_updated_at, content, editor
+            )
+        if entry is None:
+            return None
+
+        hydrated = await self.theme_catalog.hydrate([entry])
+        return hydrated[0]
+
+    async def insert_many(self, data: List[Dict]) -> Dict[int, str]:
+        """Inserts `data` with a single unordered insert_many so one bad
+        document does not stop the rest of the batch. Returns the error
+        message for every document that failed, keyed by its index in `data`.
+        Documents written against theme data that does not exist fail
+        without being sent.
+        """
+        errors: Dict[int, str] = {}
+        stored, indexes = [], []
+        for index, entry in enumerate(data):
+            try:
+                normalized = await self.theme_catalog.normalize(entry)
+            except error.UnknownThemeData as e:
+                errors[index] = str(e)
+                continue
+            stored.append({**normalized, "user_id": self.user_id})
+            indexes.append(index)
+
+        if not stored:
+            return errors
+
+        cache = get_read_cache(self.db)
+        try:
+            await self.db.insert_many(stored, ordered=False)
+        except BulkWriteError as e:
+            for err in e.details["writeErrors"]:
+                errors[indexes[err["index"]]] = err["errmsg"]
+        finally:
+            for entry in stored:
+                cache.invalidate(self._cache_key(entry.get("_id")))
 
-        return journal
+        return errors
 
 
-async def get_journal_entry_repo(db=Depends(get_journal_entries_collection)):
-    return JournalEntryRepo(db)
+async def get_journal_entry_repo(
+    db=Depends(get_journal_entries_collection), user_id=Depends(get_user_id)
+):
+    return JournalEntryRepo(db, user_id=user_id)
@@ -0,0 +1,70 @@
+from typing import Dict, List, Tuple
+
+from fastapi import Depends
+from pymongo import UpdateOne
+
+from app.connections.database import get_journal_stats_collection
+from app.constants.user import DEFAULT_USER_ID
+from app.helpers.stats import day_key, rollup_id
+from app.helpers.user import get_user_id
+
+
+class JournalStatsRepo:
+    """Entry counts rolled up per day and theme, one document per pair, kept
+    current with `$inc` as entries are written so that reading the stats never
+    touches `journal_entries`. Like the entries, rollups belong to one user,
+    the one the repository acts for.
+    """
+
+    def __init__(self, db, user_id=DEFAULT_USER_ID):
+        self.db = db
+        self.user_id = user_id
+
+    def _increment(self, day: str, theme: str, by: int) -> UpdateOne:
+        return UpdateOne(
+            {"user_id": self.user_id, "_id": rollup_id(self.user_id, day, theme)},
+            {"$inc": {"count": by}, "$setOnInsert": {"day": day, "theme": theme}},
+            upsert=True,
+        )
+
+    async def increment(self, created_at: int, theme: str, by: int = 1):
+        await self.increment_many([(created_at, theme)], by=by)
+
+    async def increment_many(self, entries: List[Tuple[int, str]], by: int = 1):
+        counts: Dict[Tuple[str, str], int] = {}
+        for created_at, theme in entries:
+            key = (day_key(created_at), theme)
+            counts[key] = counts.get(key, 0) + by
+
+        if counts:
+            await self.db.bulk_write(
+                [self._increment(day, theme, n) for (day, theme), n in counts.items()],
+                ordered=False,
+            )
+
+    async def find_all(self) -> List[Dict]:
+        return await self.db.find({"user_id": self.user_id}).to_list(length=None)
+
+    async def replace_all(self, counts: Dict[Tuple[str, str], int]):
+        """Overwrites the rollups with `counts` and removes any rollup that is
+        not in it.
+        """
+        keys = [rollup_id(self.user_id, day, theme) for day, theme in counts]
+        requests = [
+            UpdateOne(
+                {"user_id": self.user_id, "_id": key},
+                {"$set": {"day": day, "theme": theme, "count": n}},
+                upsert=True,
+            )
+            for key, ((day, theme), n) in zip(keys, counts.items())
+        ]
+
+        if requests:
+            await self.db.bulk_write(requests, ordered=False)
+        await self.db.delete_many({"user_id": self.user_id, "_id": {"$nin": keys}})
+
+
+async def get_journal_stats_repo(
+    db=Depends(get_journal_stats_collection), user_id=Depends(get_user_id)
+):
+    return JournalStatsRepo(db, user_id=user_id)
@@ -1,8 +1,16 @@
+from typing import Dict, List, Optional
+
 from fastapi import Depends
+from pymongo.errors import BulkWriteError
 
 from app.connections.database import get_journal_themes_data_collection
+from app.repository.insert_batcher import get_insert_batcher
+from app.repository.read_cache import get_read_cache
 from app.models.journal_theme_data import JournalThemeData
 from app.constants.error import InvalidResourceID
+from app.helpers import logs
+
+logger = logs.queue_logger(__name__)
 
 
 class JournalThemeDataRepo:
@@ -23,7 +31,7 @@ class JournalThemeDataRepo:
         if sample_size is None or (sample_size is not None and sample_size < 1):
             raise Exception("invalid sample_size")
 
-        queries.append({"$sample": {"size": 1}})
+        queries.append({"$sample": {"size": sample_size}})
 
         try:
             cursor = self.db.aggregate(queries)
@@ -31,20 +39,54 @@ class JournalThemeDataRepo:
                 entries.append(entry)
 
         except Exception as e:
-            print(f"an error occurred when fetching a random record: {e}")
+            logger.warning("an error occurred when fetching a random record: %s", e)
 
         return entries
 
     async def find_one(self, entry_id: str):
         if entry_id == "" or entry_id is None:
             raise InvalidResourceID()
-        theme_data = await self.db.find_one({"_id": entry_id})
+        theme_data = await get_read_cache(self.db).get(
+            entry_id, lambda: self.db.find_one({"_id": entry_id})
+        )
         return theme_data
 
+    async def find_many(self, ids: List) -> List[Dict]:
+        if not ids:
+            return []
+        return await self.db.find({"_id": {"$in": ids}}).to_list(length=None)
+
+    async def find_by_content(
+        self, theme: str, quote: str, idea_nudge: str, thought_nudge: str
+    ) -> Optional[Dict]:
+        return await self.db.find_one(
+            {
+                "theme": theme,
+                "quote": quote,
+                "idea_nudge": idea_nudge,
+                "thought_nudge": thought_nudge,
+            }
+        )
+
     async def insert_one(self, data: JournalThemeData):
-        new = await self.db.insert_one(data)
-        theme_data = await self.find_one(new.inserted_id)
-        return theme_data
+        inserted = await get_insert_batcher(self.db).submit(data)
+        get_read_cache(self.db).invalidate(inserted["_id"])
+        return inserted
+
+    async def insert_many(self, data: List[Dict]) -> Dict[int, str]:
+        if not data:
+            return {}
+
+        cache = get_read_cache(self.db)
+        try:
+            await self.db.insert_many(data, ordered=False)
+        except BulkWriteError as e:
+            return {err["index"]: err["errmsg"] for err in e.details["writeErrors"]}
+        finally:
+            for theme_data in data:
+                cache.invalidate(theme_data.get("_id"))
+
+        return {}
 
 
 async def get_journal_theme_data_repo(db=Depends(get_journal_themes_data_collection)):
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from pymongo import ReturnDocument
+
+from app.repository.read_cache import get_read_cache
+
+DEBOUNCE_WINDOW_MS: float = float(os.environ.get("AUTOSAVE_DEBOUNCE_MS", 750))
+DEBOUNCE_MAX_DELAY_MS: float = float(os.environ.get("AUTOSAVE_MAX_DELAY_MS", 3000))
+
+
+class _PendingPatch:
+    __slots__ = ("expected", "editor", "fields", "futures", "first_at", "handle")
+
+    def __init__(self, expected: int, editor: Optional[str]):
+        self.expected = expected
+        self.editor = editor
+        self.fields: Dict[str, str] = {}
+        self.futures: List[asyncio.Future] = []
+        self.first_at: float = time.monotonic()
+        self.handle = None
+
+
+class PatchDebouncer:
+    """Collapses content patches to one entry that arrive within `window_ms`
+    of each other into a single `$set`, written at most `max_delay_ms` after
+    the first of them. Later patches win on fields set more than once.
+
+    Every write is conditional on the entry's `updated_at` still being the
+    version the patches were based on, and moves `updated_at` forward by at
+    least one. Only patches of one editor based on the same version are
+    collapsed. The first writer to patch a version owns it until the write:
+    a patch from anyone else against that version, including one that names
+    no editor, is refused straight away, and a patch based on a version that
+    was already replaced fails like any other conflicting write. So
+    concurrent editors never overwrite each other.
+
+    Each caller awaits a future that resolves to the entry as stored after
+    the write, or to None when the entry does not exist, was changed through
+    another path, or was refused.
+    """
+
+    def __init__(
+        self,
+        collection,
+        window_ms: float = DEBOUNCE_WINDOW_MS,
+        max_delay_ms: float = DEBOUNCE_MAX_DELAY_MS,
+    ):
+        self.collection = collection
+        self.window_ms = window_ms
+        self.max_delay_ms = max_delay_ms
+        # keyed by (user id, entry id), so patches are only ever collapsed
+        # with patches of the same owner
+        self._pending: Dict[Tuple[str, str], _PendingPatch] = {}
+        # the loop only keeps weak references to tasks, so the writes in
+        # flight are held here until they are done
+        self._writes: Set[asyncio.Task] = set()
+
+    async def submit(
+        self,
+        user_id: str,
+        entry_id: str,
+        expected_updated_at: int,
+        fields: Dict[str, str],
+        editor: str = None,
+    ) -> Optional[Dict]:
+        key = (user_id, entry_id)
+        pending = self._pending.get(key)
+        if pending is not None and pending.expected != expected_updated_at:
+            self._flush_now(key)
+            pending = None
+
+        if pending is not None and (editor is None or editor != pending.editor):
+            return None
+
+        if pending is None:
+            pending = self._pending[key] = _PendingPatch(expected_updated_at, editor)
+
+        future = asyncio.get_running_loop().create_future()
+        pending.fields.update(fields)
+        pending.futures.append(future)
+
+        if self.window_ms <= 0:
+            self._flush_now(key)
+        else:
+            self._schedule(key, pending)
+
+        return await future
+
+    def _schedule(self, key: Tuple[str, str], pending: _PendingPatch):
+        if pending.handle is not None:
+            pending.handle.cancel()
+
+        waited_ms = (time.monotonic() - pending.first_at) * 1000
+        delay_ms = max(0, min(self.window_ms, self.max_delay_ms - waited_ms))
+        pending.handle = asyncio.get_running_loop().call_later(
+            delay_ms / 1000, self._flush_now, key
+        )
+
+    def _flush_now(self, key: Tuple[str, str]):
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+
+        if pending.handle is not None:
+            pending.handle.cancel()
+        task = asyncio.ensure_future(self._write(key, pending))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _write(self, key: Tuple[str, str], pending: _PendingPatch):
+        user_id, entry_id = key
+        updated_at = max(int(time.time()), pending.expected + 1)
+        update = {f"content.{field}": value for field, value in pending.fields.items()}
+        update["updated_at"] = updated_at
+
+        try:
+            entry = await self.collection.find_one_and_update(
+                {"user_id": user_id, "_id": entry_id, "updated_at": pending.expected},
+                {"$set": update},
+                return_document=ReturnDocument.AFTER,
+            )
+        except Exception as e:
+            for future in pending.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            get_read_cache(self.collection).invalidate(key)
+
+        for future in pending.futures:
+            if not future.done():
+                future.set_result(entry)
+
+
+_DEBOUNCERS: Dict[str, PatchDebouncer] = {}
+
+
+def get_patch_debouncer(collection) -> PatchDebouncer:
+    """Returns the debouncer shared by every repository writing to `collection`."""
+    debouncer = _DEBOUNCERS.get(collection.full_name)
+    if debouncer is None:
+        debouncer = _DEBOUNCERS[collection.full_name] = PatchDebouncer(collection)
+
+    debouncer.collection = collection
+    return debouncer
@@ -0,0 +1,185 @@
+import asyncio
+import functools
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+from app.helpers import prometheus
+
+READ_CACHE_MAX_SIZE: int = int(os.environ.get("READ_CACHE_MAX_SIZE", 10000))
+READ_CACHE_TTL_SECONDS: float = float(os.environ.get("READ_CACHE_TTL_SECONDS", 30))
+
+
+class ReadThroughCache:
+    """Bounded LRU cache of documents by key, each kept for at most `ttl`
+    seconds.
+
+    Concurrent misses on one key share a single load: the first caller starts
+    it and the rest await the same task. The load runs as its own task so a
+    caller going away does not cancel it for the others. A key invalidated
+    while its load is in flight is not cached when the load completes, so a
+    write is never hidden by a read that started before it. Documents that
+    were not found are not cached.
+
+    The cache lives in each worker, so a write only invalidates the worker it
+    went through; the others see it within `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int = READ_CACHE_MAX_SIZE,
+        ttl: float = READ_CACHE_TTL_SECONDS,
+    ):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self.coalesced: int = 0
+        self.evictions: int = 0
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._loading: Dict[Any, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _cached(self, key) -> Tuple[bool, Any]:
+        cached = self._entries.get(key)
+        if cached is not None:
+            expires_at, value = cached
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+        return False, None
+
+    async def get(self, key, load: Callable[[], Awaitable[Any]]):
+        found, value = self._cached(key)
+        if found:
+            return value
+
+        task = self._loading.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = self._loading[key] = asyncio.ensure_future(self._load(key, load))
+
+        return await asyncio.shield(task)
+
+    async def get_many(
+        self, keys: Iterable, load_many: Callable[[List], Awaitable[Dict]]
+    ) -> Dict:
+        """Like `get` for several keys at once. The keys that are neither
+        cached nor already loading are loaded with one `load_many` call, which
+        returns the documents it found by key.
+        """
+        found: Dict = {}
+        tasks: Dict[Any, asyncio.Task] = {}
+        missing = []
+
+        for key in dict.fromkeys(keys):
+            hit, value = self._cached(key)
+            if hit:
+                found[key] = value
+            elif key in self._loading:
+                self.coalesced += 1
+                tasks[key] = self._loading[key]
+            else:
+                self.misses += 1
+                missing.append(key)
+
+        if missing:
+            batch = asyncio.ensure_future(load_many(missing))
+
+            async def pick(key):
+                return (await asyncio.shield(batch)).get(key)
+
+            for key in missing:
+                tasks[key] = self._loading[key] = asyncio.ensure_future(
+                    self._load(key, functools.partial(pick, key))
+                )
+
+        values = await asyncio.shield(asyncio.gather(*tasks.values()))
+        for key, value in zip(tasks, values):
+            if value is not None:
+                found[key] = value
+
+        return found
+
+    async def _load(self, key, load: Callable[[], Awaitable[Any]]):
+        task = asyncio.current_task()
+        try:
+            value = await load()
+        finally:
+            invalidated = self._loading.get(key) is not task
+            if not invalidated:
+                del self._loading[key]
+
+        if value is not None and not invalidated and self.max_size > 0:
+            self.put(key, value)
+
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+        self._loading.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._loading.clear()
+
+
+_CACHES: Dict[str, ReadThroughCache] = {}
+
+
+def get_read_cache(collection) -> ReadThroughCache:
+    """Returns the cache shared by every repository reading from `collection`."""
+    cache = _CACHES.get(collection.full_name)
+    if cache is None:
+        cache = _CACHES[collection.full_name] = ReadThroughCache(collection.name)
+    return cache
+
+
+def render() -> List[str]:
+    metrics = (
+        ("read_cache_hits_total", "counter", "hits", "Reads served from the cache."),
+        (
+            "read_cache_misses_total",
+            "counter",
+            "misses",
+            "Reads that loaded from the database.",
+        ),
+        (
+            "read_cache_coalesced_total",
+            "counter",
+            "coalesced",
+            "Misses that shared a load already in flight.",
+        ),
+        (
+            "read_cache_evictions_total",
+            "counter",
+            "evictions",
+            "Documents evicted to stay within the size bound.",
+        ),
+        ("read_cache_size", "gauge", None, "Documents in the cache."),
+    )
+
+    lines = []
+    for name, metric_type, attribute, help_text in metrics:
+        lines.extend(prometheus.header(name, metric_type, help_text))
+        for cache in sorted(_CACHES.values(), key=lambda c: c.name):
+            value = getattr(cache, attribute) if attribute else len(cache)
+            lines.append(prometheus.sample(name, value, {"cache": cache.name}))
+
+    return lines
@@ -0,0 +1,199 @@
+"""Maps journal entries between the shape the API exposes and the shape they
+are stored in.
+
+Entries used to embed the whole theme, including its theme data, and repeat
+the quote and nudges in their content. They are now stored as
+
+    {
+        "theme": {"theme": <theme key>, "data_id": <theme data _id or None>},
+        "content": {"idea": ..., "thought": ...},
+        ...
+    }
+
+and the theme and theme data are filled back in on read from the static
+catalog in `app.constants.theme` and the theme data pool. The quote and nudges
+are only kept in the content when they differ from the referenced theme data
+or when it could not be resolved. Entries still in the embedded layout, i.e.
+with `theme.name`, are passed through as they are.
+
+New entries must be written against an existing theme data document: one
+that is neither in the pool nor in the database is rejected with
+`UnknownThemeData` rather than stored without its theme data.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+
+from app.connections.database import get_database
+from app.constants import collection
+from app.constants.error import UnknownThemeData
+from app.constants.theme import THEMES_BY_KEY
+from app.repository.journal_theme_data import JournalThemeDataRepo
+from app.repository.theme_data_pool import THEME_DATA_POOL, content_key
+
+THEME_DATA_FIELDS = ("quote", "idea_nudge", "thought_nudge")
+DATA_CACHE_SIZE: int = 10000
+
+
+def is_embedded(entry: Dict) -> bool:
+    return isinstance(entry.get("theme"), dict) and "name" in entry["theme"]
+
+
+def _data_id(entry: Dict):
+    theme = entry.get("theme")
+    if not isinstance(theme, dict) or "name" in theme:
+        return None
+    return theme.get("data_id")
+
+
+def normalize(entry: Dict, data_id, data: Dict = None) -> Dict:
+    """Returns `entry`, given in the embedded layout, in the stored layout.
+    `data` is the theme data document `data_id` refers to.
+    """
+    content = entry.get("content") or {}
+    data = data or {}
+    stored_content = {
+        "idea": content.get("idea", ""),
+        "thought": content.get("thought", ""),
+    }
+
+    for field in THEME_DATA_FIELDS:
+        if data_id is None or content.get(field) != data.get(field):
+            stored_content[field] = content.get(field, "")
+
+    return {
+        **entry,
+        "theme": {"theme": entry["theme"]["theme"], "data_id": data_id},
+        "content": stored_content,
+    }
+
+
+def hydrate_one(entry: Dict, data: Dict = None) -> Dict:
+    if not isinstance(entry.get("theme"), dict) or is_embedded(entry):
+        return entry
+
+    key = entry["theme"]["theme"]
+    static = THEMES_BY_KEY.get(key, {})
+    data = data or {"theme": key, "quote": "", "idea_nudge": "", "thought_nudge": ""}
+    content = entry.get("content") or {}
+
+    return {
+        **entry,
+        "theme": {**static, "theme": key, "data": data},
+        "content": {
+            "quote": content.get("quote", data.get("quote", "")),
+            "idea_nudge": content.get("idea_nudge", data.get("idea_nudge", "")),
+            "idea": content.get("idea", ""),
+            "thought_nudge": content.get(
+                "thought_nudge", data.get("thought_nudge", "")
+            ),
+            "thought": content.get("thought", ""),
+        },
+    }
+
+
+class ThemeCatalog:
+    def __init__(self, pool=THEME_DATA_POOL, cache_size: int = DATA_CACHE_SIZE):
+        self.pool = pool
+        self.cache_size = cache_size
+        # theme data documents that were referenced but not in the pool
+        self._data: "OrderedDict[object, Dict]" = OrderedDict()
+        # content key -> _id of theme data looked up because it was not pooled
+        self._ids: "OrderedDict[tuple, object]" = OrderedDict()
+
+    @staticmethod
+    def _repo() -> JournalThemeDataRepo:
+        return JournalThemeDataRepo(
+            get_database()[collection.JOURNAL_THEME_DATA_COLLECTION]
+        )
+
+    def _remember(self, data: Dict):
+        self._data[data["_id"]] = data
+        if len(self._data) > self.cache_size:
+            self._data.popitem(last=False)
+
+    async def _find_by_content(self, key: tuple) -> Dict:
+        """Looks up theme data that is not in the pool, which only holds a
+        sample of each theme.
+        """
+        data_id = self._ids.get(key)
+        data = self._data.get(data_id) if data_id is not None else None
+        if data is not None:
+            return data
+
+        data = await self._repo().find_by_content(*key)
+        if data is None:
+            raise UnknownThemeData()
+
+        self._remember(data)
+        self._ids[key] = data["_id"]
+        if len(self._ids) > self.cache_size:
+            self._ids.popitem(last=False)
+        return data
+
+    async def normalize(self, entry: Dict) -> Dict:
+        if not is_embedded(entry):
+            return entry
+
+        if not self.pool.refreshed_at:
+            await self.pool.refresh()
+
+        theme = entry["theme"]
+        data = theme.get("data") or {}
+        content = entry.get("content") or {}
+        key = content_key(
+            theme["theme"],
+            data.get("quote", content.get("quote")),
+            data.get("idea_nudge", content.get("idea_nudge")),
+            data.get("thought_nudge", content.get("thought_nudge")),
+        )
+
+        data_id = self.pool.find_id(*key)
+        if data_id is not None:
+            return normalize(entry, data_id, self.pool.get(data_id))
+
+        data = await self._find_by_content(key)
+        return normalize(entry, data["_id"], data)
+
+    async def _load(self, ids: Iterable) -> Dict:
+        found: Dict = {}
+        missing = []
+
+        for data_id in ids:
+            data = self.pool.get(data_id) or self._data.get(data_id)
+            if data is not None:
+                found[data_id] = data
+            else:
+                missing.append(data_id)
+
+        if missing:
+            for data in await self._repo().find_many(missing):
+                found[data["_id"]] = data
+                self._remember(data)
+
+        return found
+
+    async def hydrate(self, entries: List[Dict]) -> List[Dict]:
+        """Fills the theme and theme data back into a batch of stored entries.
+        Theme data missing from the pool is fetched with one `$in` query for
+        the whole batch.
+        """
+        ids = {_data_id(entry) for entry in entries} - {None}
+        data = await self._load(ids) if ids else {}
+
+        return [hydrate_one(entry, data.get(_data_id(entry))) for entry in entries]
+
+
+THEME_CATALOG = ThemeCatalog()
+
+
+def content_key_for(entry: Dict):
+    """The content key of the theme data embedded in a legacy entry."""
+    theme = entry["theme"]
+    data = theme.get("data") or {}
+    return content_key(
+        theme["theme"],
+        data.get("quote"),
+        data.get("idea_nudge"),
+        data.get("thought_nudge"),
+    )
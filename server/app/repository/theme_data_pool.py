@@ -0,0 +1,133 @@
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Optional, Tuple
+
+from app.connections.database import get_database
+from app.constants import collection
+from app.helpers import logs
+from app.models.base import JournalThemeType
+from app.repository.journal_theme_data import JournalThemeDataRepo
+
+POOL_TTL_SECONDS: int = int(os.environ.get("THEME_DATA_POOL_TTL_SECONDS", 300))
+POOL_SIZE_CAP: int = int(os.environ.get("THEME_DATA_POOL_SIZE_CAP", 500))
+
+logger = logs.queue_logger(__name__)
+
+# theme data documents are held as tuples in this field order rather than as
+# dicts to keep the per-document overhead of the pool low
+_FIELDS = (
+    "_id",
+    "created_at",
+    "updated_at",
+    "theme",
+    "quote",
+    "idea_nudge",
+    "thought_nudge",
+)
+
+
+def content_key(theme: str, quote: str, idea_nudge: str, thought_nudge: str) -> Tuple:
+    return (theme, quote, idea_nudge, thought_nudge)
+
+
+class ThemeDataPool:
+    """Per-theme in-memory sample of theme data documents.
+
+    Picks are made locally with `random.choice`, so serving a random theme
+    data document costs no database round trip. The pool is refilled in the
+    background every `ttl` seconds with at most `size_cap` documents per theme.
+    """
+
+    def __init__(self, ttl: int = POOL_TTL_SECONDS, size_cap: int = POOL_SIZE_CAP):
+        self.ttl = ttl
+        self.size_cap = size_cap
+        self.refreshed_at: float = 0
+        # bumped on every refresh, so anything derived from the pool can be
+        # cached against it
+        self.version: int = 0
+        self._pools: Dict[str, Tuple[Tuple, ...]] = {}
+        self._all: Tuple[Tuple, ...] = ()
+        self._by_id: Dict = {}
+        self._by_content: Dict[Tuple, object] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        async with self._lock:
+            repo = JournalThemeDataRepo(
+                get_database()[collection.JOURNAL_THEME_DATA_COLLECTION]
+            )
+            themes = [t.value for t in JournalThemeType if t != JournalThemeType.none]
+            results = await asyncio.gather(
+                *[repo.get_n_random(theme=t, sample_size=self.size_cap) for t in themes]
+            )
+
+            pools = dict(self._pools)
+            for theme, docs in zip(themes, results):
+                # keep serving the previous sample if the refill came back empty
+                if docs:
+                    pools[theme] = tuple(
+                        tuple(doc.get(f) for f in _FIELDS) for doc in docs
+                    )
+
+            self._pools = pools
+            self._all = tuple(row for rows in pools.values() for row in rows)
+            self._by_id = {row[0]: row for row in self._all}
+            self._by_content = {content_key(*row[3:]): row[0] for row in self._all}
+            self.refreshed_at = time.monotonic()
+            self.version += 1
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(self.ttl)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(
+                    "an error occurred when refreshing the theme data pool: %s", e
+                )
+
+    async def start(self):
+        await self.refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def sample(self, theme: str = None) -> Optional[Dict]:
+        """Returns a random theme data document for `theme`, or across all
+        themes when `theme` is empty. Loads the pool on first use if `start`
+        was never called.
+        """
+        if not self.refreshed_at:
+            await self.refresh()
+
+        rows = self._pools.get(theme, ()) if theme else self._all
+        if not rows:
+            return None
+
+        return dict(zip(_FIELDS, random.choice(rows)))
+
+    def get(self, data_id) -> Optional[Dict]:
+        row = self._by_id.get(data_id)
+        return dict(zip(_FIELDS, row)) if row is not None else None
+
+    def find_id(self, theme: str, quote: str, idea_nudge: str, thought_nudge: str):
+        """Returns the _id of the pooled theme data document with exactly this
+        content, if there is one.
+        """
+        return self._by_content.get(
+            content_key(theme, quote, idea_nudge, thought_nudge)
+        )
+
+
+THEME_DATA_POOL = ThemeDataPool()
+
+
+def get_theme_data_pool():
+    return THEME_DATA_POOL
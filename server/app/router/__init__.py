@@ -1,3 +1,6 @@
 from app.router.journal_entry import JOURNAL_ENTRY_ROUTER
 from app.router.journal_theme import JOURNAL_THEME_ROUTER
-from app.router.journal_theme_data import JOURNAL_THEME_DATA_ROUTER
\ No newline at end of file
+from app.router.journal_theme_data import JOURNAL_THEME_DATA_ROUTER
+from app.router.health import HEALTH_ROUTER
+from app.router.metrics import METRICS_ROUTER
+from app.router.stats import STATS_ROUTER
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from app.api import health
+from app.helpers.serializer import FastJSONResponse
+
+HEALTH_ROUTER = APIRouter(prefix="/health", default_response_class=FastJSONResponse)
+
+
+@HEALTH_ROUTER.get("/ready")
+async def ready():
+    return await health.ready()
@@ -1,21 +1,28 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Request
 
 from app.api import journal_entry
 from schema import (
     ListJournalEntryInput,
+    SearchJournalEntryInput,
     CreateJournalEntryInput,
+    PatchJournalEntryInput,
     JournalOut,
     ListJournalsOut,
 )
-from app.repository import get_journal_entry_repo
+from app.repository import get_journal_entry_repo, get_journal_stats_repo
 from app.helpers import get_journal_entry_helper
 from app.models.base import JournalThemeType
-
+from app.constants.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.constants.search import MAX_QUERY_LENGTH
+from app.constants.fields import VIEW_FULL, VIEW_SUMMARY
+from app.helpers.serializer import FastJSONResponse
 
 ROUTER_BASE_URL: str = "/v1/journals"
-JOURNAL_ENTRY_ROUTER = APIRouter(prefix=ROUTER_BASE_URL)
+JOURNAL_ENTRY_ROUTER = APIRouter(
+    prefix=ROUTER_BASE_URL, default_response_class=FastJSONResponse
+)
 
 
 @JOURNAL_ENTRY_ROUTER.get("")
@@ -23,10 +30,68 @@ async def list_journals(
     created_after: Optional[int] = 0,
     created_before: Optional[int] = 0,
     theme: Optional[JournalThemeType] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    view: str = Query(VIEW_FULL, regex=f"^({VIEW_FULL}|{VIEW_SUMMARY})$"),
     db=Depends(get_journal_entry_repo),
     helper=Depends(get_journal_entry_helper),
 ):
-    return await journal_entry.list_journals(None, db)
+    input = ListJournalEntryInput(
+        created_after=created_after,
+        created_before=created_before,
+        theme=theme,
+        cursor=cursor,
+        limit=limit,
+        fields=fields,
+        view=view,
+    )
+    return await journal_entry.list_journals(input, db)
+
+
+@JOURNAL_ENTRY_ROUTER.get("/search")
+async def search_journals(
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH),
+    created_after: Optional[int] = 0,
+    created_before: Optional[int] = 0,
+    theme: Optional[JournalThemeType] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db=Depends(get_journal_entry_repo),
+):
+    input = SearchJournalEntryInput(
+        q=q,
+        created_after=created_after,
+        created_before=created_before,
+        theme=theme,
+        cursor=cursor,
+        limit=limit,
+    )
+    return await journal_entry.search(input, db)
+
+
+@JOURNAL_ENTRY_ROUTER.get("/export")
+async def export_journals(
+    created_after: Optional[int] = 0,
+    created_before: Optional[int] = 0,
+    theme: Optional[JournalThemeType] = None,
+    gzip: bool = False,
+    db=Depends(get_journal_entry_repo),
+):
+    input = ListJournalEntryInput(
+        created_after=created_after,
+        created_before=created_before,
+        theme=theme,
+    )
+    return await journal_entry.export(input, gzip, db)
+
+
+@JOURNAL_ENTRY_ROUTER.get("/batch")
+async def batch_get_journal_entries(
+    ids: List[str] = Query(..., min_items=1),
+    journal_entry_repo=Depends(get_journal_entry_repo),
+):
+    return await journal_entry.batch_get(ids, journal_entry_repo)
 
 
 @JOURNAL_ENTRY_ROUTER.get(
@@ -35,10 +100,32 @@ async def list_journals(
 )
 async def get_journal_entry(
     uuid: str,
+    if_none_match: Optional[str] = Header(None),
+    journal_entry_repo=Depends(get_journal_entry_repo),
+    helper=Depends(get_journal_entry_helper),
+):
+    return await journal_entry.get(uuid, journal_entry_repo, if_none_match)
+
+
+@JOURNAL_ENTRY_ROUTER.patch("/{uuid}", response_model=JournalOut)
+async def patch_journal_entry(
+    uuid: str,
+    input: PatchJournalEntryInput,
+    journal_entry_repo=Depends(get_journal_entry_repo),
+):
+    return await journal_entry.patch(uuid, input, journal_entry_repo)
+
+
+@JOURNAL_ENTRY_ROUTER.post("/import")
+async def import_journals(
+    request: Request,
     journal_entry_repo=Depends(get_journal_entry_repo),
     helper=Depends(get_journal_entry_helper),
+    journal_stats_repo=Depends(get_journal_stats_repo),
 ):
-    return await journal_entry.get(uuid, journal_entry_repo)
+    return await journal_entry.bulk_import(
+        request, journal_entry_repo, helper, journal_stats_repo
+    )
 
 
 @JOURNAL_ENTRY_ROUTER.post("/", response_model=JournalOut)
@@ -46,5 +133,8 @@ async def create(
     input: CreateJournalEntryInput,
     journal_entry_repo=Depends(get_journal_entry_repo),
     helper=Depends(get_journal_entry_helper),
+    journal_stats_repo=Depends(get_journal_stats_repo),
 ):
-    return await journal_entry.create()
+    return await journal_entry.create(
+        input, journal_entry_repo, helper, journal_stats_repo
+    )
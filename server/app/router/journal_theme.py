@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header
 
 from app.api import theme
-from app.repository import get_journal_theme_data_repo
+from app.repository import get_theme_data_pool
+from app.helpers.serializer import FastJSONResponse
 
-JOURNAL_THEME_ROUTER = APIRouter(prefix="/v1/themes")
+JOURNAL_THEME_ROUTER = APIRouter(
+    prefix="/v1/themes", default_response_class=FastJSONResponse
+)
 
 
 @JOURNAL_THEME_ROUTER.get("")
 async def list_journal_themes(
-    journal_theme_data_repo=Depends(get_journal_theme_data_repo),
+    if_none_match: Optional[str] = Header(None),
+    theme_data_pool=Depends(get_theme_data_pool),
 ):
-    return await theme.list_themes(journal_theme_data_repo)
+    return await theme.list_themes(theme_data_pool, if_none_match)
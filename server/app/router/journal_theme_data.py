@@ -3,8 +3,12 @@ from fastapi import Depends, APIRouter
 from app.api import journal_theme_data
 from app.models import journal_theme_data as journal_theme_data_models
 from app.repository.journal_theme_data import get_journal_theme_data_repo
+from app.repository.theme_data_pool import get_theme_data_pool
+from app.helpers.serializer import FastJSONResponse
 
-JOURNAL_THEME_DATA_ROUTER = APIRouter(prefix="/v1/theme_data")
+JOURNAL_THEME_DATA_ROUTER = APIRouter(
+    prefix="/v1/theme_data", default_response_class=FastJSONResponse
+)
 
 
 @JOURNAL_THEME_DATA_ROUTER.post(
@@ -13,5 +17,6 @@ JOURNAL_THEME_DATA_ROUTER = APIRouter(prefix="/v1/theme_data")
 async def get_journal_theme_data(
     input: journal_theme_data_models.GetJournalThemeDataInput,
     journal_theme_data_repo=Depends(get_journal_theme_data_repo),
+    theme_data_pool=Depends(get_theme_data_pool),
 ):
-    return await journal_theme_data.get()
+    return await journal_theme_data.get(input, journal_theme_data_repo, theme_data_pool)
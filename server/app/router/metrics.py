@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+
+from app.api import metrics
+
+METRICS_ROUTER = APIRouter(prefix="/metrics")
+
+
+@METRICS_ROUTER.get("")
+async def render_metrics():
+    return await metrics.render()
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+
+from app.api import stats
+from app.repository import get_journal_stats_repo
+from app.helpers.serializer import FastJSONResponse
+
+STATS_ROUTER = APIRouter(prefix="/v1/stats", default_response_class=FastJSONResponse)
+
+
+@STATS_ROUTER.get("")
+async def get_stats(
+    journal_stats_repo=Depends(get_journal_stats_repo),
+):
+    return await stats.get(journal_stats_repo)
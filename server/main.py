@@ -1,26 +1,81 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.router import JOURNAL_ENTRY_ROUTER, JOURNAL_THEME_ROUTER, JOURNAL_THEME_DATA_ROUTER
+from app.router import (
+    JOURNAL_ENTRY_ROUTER,
+    JOURNAL_THEME_ROUTER,
+    JOURNAL_THEME_DATA_ROUTER,
+    HEALTH_ROUTER,
+    METRICS_ROUTER,
+    STATS_ROUTER,
+)
 
+from app.connections import database
+from app.constants.error import MissingUserID
+from app.constants.pagination import NEXT_CURSOR_HEADER
 from app.helpers.journal_entry import JournalEntryHelper
+from app.helpers import loop_monitor
+from app.helpers.serializer import FastJSONResponse
+from app.middleware import AdmissionControlMiddleware, TracingMiddleware
+from app.repository.theme_data_pool import THEME_DATA_POOL
 
 app = FastAPI()
 
 origins = ["*"]
 
+# added before CORS so that shed requests still get the CORS headers
+app.add_middleware(AdmissionControlMiddleware)
+
+# outside admission control so that time spent queued is part of the trace
+app.add_middleware(TracingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Server-Timing"],
 )
 
 journal_entry_helper = JournalEntryHelper()
 
+
+@app.exception_handler(MissingUserID)
+async def missing_user_id(request: Request, e: MissingUserID):
+    return FastJSONResponse(
+        status_code=status.HTTP_401_UNAUTHORIZED, content={"error": str(e)}
+    )
+
+
+@app.on_event("startup")
+async def startup():
+    if loop_monitor.LOOP_MONITOR_ENABLED or loop_monitor.LOOP_STALL_BUDGET_MS:
+        await loop_monitor.LOOP_MONITOR.start()
+
+    await database.connect()
+
+    if database.ENSURE_INDEXES_ON_STARTUP:
+        await database.ensure_indexes()
+
+    await THEME_DATA_POOL.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await THEME_DATA_POOL.stop()
+    await database.close()
+    await loop_monitor.LOOP_MONITOR.stop()
+
+
 app.include_router(JOURNAL_ENTRY_ROUTER)
 
 app.include_router(JOURNAL_THEME_ROUTER)
 
 app.include_router(JOURNAL_THEME_DATA_ROUTER)
+
+app.include_router(HEALTH_ROUTER)
+
+app.include_router(METRICS_ROUTER)
+
+app.include_router(STATS_ROUTER)
@@ -3,11 +3,17 @@
 
 from typing import Union
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
+from app.constants.fields import MAX_EDITOR_LENGTH, VIEW_FULL
+from app.constants.pagination import DEFAULT_PAGE_SIZE
 from app.models.journal_theme import JournalTheme
 from app.models.base import JournalThemeType
-from app.models.journal_entry import JournalEntry, JournalEntryContent
+from app.models.journal_entry import (
+    JournalEntry,
+    JournalEntryContent,
+    JournalEntryContentPatch,
+)
 
 
 class CreateJournalEntryInput(BaseModel):
@@ -15,6 +21,20 @@ class CreateJournalEntryInput(BaseModel):
     content: JournalEntryContent
 
 
+class ImportJournalEntryInput(CreateJournalEntryInput):
+    created_at: Union[int, None] = None
+    updated_at: Union[int, None] = None
+
+
+class PatchJournalEntryInput(BaseModel):
+    # the updated_at of the entry the patch was made against
+    updated_at: int
+    content: JournalEntryContentPatch
+    # picked by the client once per editing session; only the patches of one
+    # editor are written together, any other writer gets a conflict
+    editor: Union[str, None] = Field(None, max_length=MAX_EDITOR_LENGTH)
+
+
 class GetJournalEntryInput(JournalEntry):
     pass
 
@@ -23,6 +43,19 @@ class ListJournalEntryInput(BaseModel):
     created_after: int = 0
     created_before: int = 0
     theme: Union[JournalThemeType, None]
+    cursor: Union[str, None] = None
+    limit: int = DEFAULT_PAGE_SIZE
+    fields: Union[str, None] = None
+    view: str = VIEW_FULL
+
+
+class SearchJournalEntryInput(BaseModel):
+    q: str
+    created_after: int = 0
+    created_before: int = 0
+    theme: Union[JournalThemeType, None]
+    cursor: Union[str, None] = None
+    limit: int = DEFAULT_PAGE_SIZE
 
 
 class JournalOut(BaseModel):
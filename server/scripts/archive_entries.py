@@ -0,0 +1,109 @@
+"""Moves entries that were created and last updated more than
+`--older-than-days` days ago to the archive collection, with their content
+compressed. See `app.helpers.archive`.
+
+    python scripts/archive_entries.py [--older-than-days 90] [--batch-size 500] [--dry-run]
+
+Each batch is first written to the archive and then deleted from the entries,
+but only where the entry was not updated in between; the archived copy of an
+entry that was is dropped again. Writing to the archive replaces any copy an
+interrupted run left behind, so the script can be re-run at any time.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from pymongo import DeleteOne, ReplaceOne
+
+from app.connections import database
+from app.constants import collection
+from app.constants.archive import (
+    ARCHIVE_AFTER_DAYS,
+    ARCHIVE_BATCH_SIZE,
+    ARCHIVE_BLOB_FIELD,
+)
+from app.helpers.archive import archivable, compress
+from app.helpers.serializer import dumps
+
+
+async def archive_entries(
+    older_than_days: int, batch_size: int, pause_ms: int, dry_run: bool
+) -> int:
+    db = database.get_database()
+    entries = db[collection.JOURNAL_ENTRIES_COLLECTION]
+    archive = db[collection.JOURNAL_ENTRIES_ARCHIVE_COLLECTION]
+
+    cutoff = int(time.time()) - older_than_days * 86400
+
+    archived = skipped = raw_bytes = compressed_bytes = 0
+    last_key = None
+
+    try:
+        while True:
+            batch = await archivable(entries, cutoff, last_key, batch_size)
+            if not batch:
+                break
+            last_key = (batch[-1]["created_at"], batch[-1]["_id"])
+
+            compressed = [compress(entry) for entry in batch]
+            raw_bytes += sum(len(dumps(entry.get("content"))) for entry in batch)
+            compressed_bytes += sum(len(doc[ARCHIVE_BLOB_FIELD]) for doc in compressed)
+
+            if dry_run:
+                archived += len(batch)
+                continue
+
+            await archive.bulk_write(
+                [
+                    ReplaceOne({"_id": doc["_id"]}, doc, upsert=True)
+                    for doc in compressed
+                ],
+                ordered=False,
+            )
+            result = await entries.bulk_write(
+                [
+                    DeleteOne({"_id": entry["_id"], "updated_at": entry["updated_at"]})
+                    for entry in batch
+                ],
+                ordered=False,
+            )
+            archived += result.deleted_count
+
+            if result.deleted_count < len(batch):
+                ids = [entry["_id"] for entry in batch]
+                updated = await entries.distinct("_id", {"_id": {"$in": ids}})
+                await archive.delete_many({"_id": {"$in": updated}})
+                skipped += len(updated)
+
+            print(f"{archived} entries archived", file=sys.stderr)
+            await asyncio.sleep(pause_ms / 1000)
+    finally:
+        await database.close()
+
+    ratio = compressed_bytes / raw_bytes if raw_bytes else 0
+    print(
+        f"{'would archive' if dry_run else 'archived'} {archived} entries, "
+        f"skipped {skipped} updated while archiving, "
+        f"content {raw_bytes} -> {compressed_bytes} bytes ({ratio:.0%})"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--pause-ms", type=int, default=50)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    sys.exit(
+        loop.run_until_complete(
+            archive_entries(
+                args.older_than_days, args.batch_size, args.pause_ms, args.dry_run
+            )
+        )
+    )
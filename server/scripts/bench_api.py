@@ -0,0 +1,295 @@
+"""In-process load and latency benchmark for the API.
+
+Boots `main.app` behind an `httpx.AsyncClient`, seeds a database and drives
+each workload with a fixed number of concurrent workers. Results are printed,
+and optionally written, as JSON. With `--compare` the run is checked against a
+stored baseline and the script exits non-zero on a regression.
+
+    python scripts/bench_api.py --output baseline.json
+    python scripts/bench_api.py --compare baseline.json
+
+`--backend mongomock` (the default) needs the mongomock-motor dev dependency;
+`--backend mongod` uses the database configured through the MONGO_* env vars;
+`--backend memory` and `--backend sqlite` use the local backends, the latter
+on a fresh file in a temporary directory.
+
+With `--stall-budget-ms` the event loop monitor runs during the workloads and
+the script exits non-zero if any request blocked the loop for longer than the
+budget, printing where it was blocked.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import httpx
+
+WORKLOADS = ("themes", "list", "get", "create")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--backend",
+        choices=("mongomock", "mongod", "memory", "sqlite"),
+        default="mongomock",
+    )
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=WORKLOADS)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="per workload")
+    parser.add_argument("--entries", type=int, default=1000, help="entries to seed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--compare", help="baseline results to compare against")
+    parser.add_argument(
+        "--stall-budget-ms",
+        type=float,
+        default=0,
+        help="fail if the event loop is blocked for longer than this",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="percentage change treated as a regression",
+    )
+    return parser.parse_args()
+
+
+def _use_backend(backend: str):
+    os.environ.setdefault("MONGO_INITDB_ROOT_USERNAME", "bench")
+    os.environ.setdefault("MONGO_INITDB_ROOT_PASSWORD", "bench")
+    os.environ.setdefault("MONGO_DB_URL", "localhost")
+    # sampled traces would add their own serialization to the measured latency
+    os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+
+    if backend in ("memory", "sqlite"):
+        os.environ["DATABASE_BACKEND"] = backend
+        os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    if backend == "mongomock":
+        from mongomock_motor import AsyncMongoMockClient
+
+        from app.connections import database
+
+        database._client = AsyncMongoMockClient()
+
+
+# theme data documents seeded per theme; entries are written against them
+THEME_DATA_PER_THEME: int = 20
+
+
+def _theme_data(theme: str, i: int) -> Dict:
+    return {
+        "theme": theme,
+        "quote": f"quote {i}",
+        "idea_nudge": f"idea nudge {i}",
+        "thought_nudge": f"thought nudge {i}",
+    }
+
+
+def _theme_payload(rng: random.Random) -> Dict:
+    from app.constants.theme import THEMES
+
+    theme = dict(rng.choice(THEMES))
+    theme["data"] = _theme_data(theme["theme"], rng.randrange(THEME_DATA_PER_THEME))
+    return theme
+
+
+def _entry_payload(rng: random.Random) -> Dict:
+    words = ["stoic", "fate", "morning", "walk", "letter", "habit", "virtue", "calm"]
+    theme = _theme_payload(rng)
+    return {
+        "theme": theme,
+        "content": {
+            "quote": theme["data"]["quote"],
+            "idea_nudge": theme["data"]["idea_nudge"],
+            "idea": " ".join(rng.choices(words, k=rng.randint(5, 80))),
+            "thought_nudge": theme["data"]["thought_nudge"],
+            "thought": " ".join(rng.choices(words, k=rng.randint(5, 200))),
+        },
+    }
+
+
+async def _seed(client: httpx.AsyncClient, entries: int, rng: random.Random):
+    from app.constants.theme import THEMES
+    from app.connections.database import get_database
+    from app.constants import collection
+    from app.repository.theme_data_pool import THEME_DATA_POOL
+
+    theme_data = [
+        _theme_data(t["theme"].value, i)
+        for t in THEMES
+        for i in range(THEME_DATA_PER_THEME)
+    ]
+    await get_database()[collection.JOURNAL_THEME_DATA_COLLECTION].insert_many(
+        theme_data
+    )
+    await THEME_DATA_POOL.refresh()
+
+    now = int(time.time())
+    items = [
+        {**_entry_payload(rng), "created_at": now - rng.randint(0, 365 * 86400)}
+        for _ in range(entries)
+    ]
+    response = await client.post("/v1/journals/import", json=items)
+    return [r["id"] for r in response.json()["results"] if "id" in r]
+
+
+def _request_factory(name: str, ids: List[str], rng: random.Random) -> Callable:
+    if name == "themes":
+        return lambda c: c.get("/v1/themes")
+    if name == "list":
+        return lambda c: c.get("/v1/journals", params={"limit": 20})
+    if name == "get":
+        return lambda c: c.get(f"/v1/journals/{rng.choice(ids)}")
+    return lambda c: c.post("/v1/journals/", json=_entry_payload(rng))
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(
+        len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1)))
+    )
+    return sorted_values[index]
+
+
+async def _drive(client, make_request, total: int, concurrency: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await make_request(client)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Returns a description of every metric that moved the wrong way by more
+    than `threshold` percent relative to `baseline`.
+    """
+    regressions = []
+
+    for name, current in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if previous[metric] and current[metric] > previous[metric] * (
+                1 + threshold / 100
+            ):
+                regressions.append(
+                    f"{name} {metric}: {previous[metric]} -> {current[metric]}"
+                )
+
+        if current["throughput_rps"] < previous["throughput_rps"] * (
+            1 - threshold / 100
+        ):
+            regressions.append(
+                f"{name} throughput_rps: {previous['throughput_rps']} -> {current['throughput_rps']}"
+            )
+
+        if current["errors"] > previous["errors"]:
+            regressions.append(
+                f"{name} errors: {previous['errors']} -> {current['errors']}"
+            )
+
+    return regressions
+
+
+async def run(args) -> Dict:
+    _use_backend(args.backend)
+    if args.stall_budget_ms:
+        os.environ["LOOP_STALL_BUDGET_MS"] = str(args.stall_budget_ms)
+
+    import main
+    from app.helpers.loop_monitor import LOOP_MONITOR, LoopStallError
+
+    rng = random.Random(args.seed)
+    await main.app.router.startup()
+
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            ids = await _seed(client, args.entries, rng)
+            # only the workloads are held to the stall budget
+            LOOP_MONITOR.over_budget.clear()
+            results = {}
+            for name in args.workloads:
+                make_request = _request_factory(name, ids, rng)
+                results[name] = await _drive(
+                    client, make_request, args.requests, args.concurrency
+                )
+                if args.stall_budget_ms:
+                    try:
+                        LOOP_MONITOR.check()
+                        results[name]["loop_stalls"] = 0
+                    except LoopStallError as e:
+                        results[name]["loop_stalls"] = len(e.stalls)
+                        print(f"{name}: {e}", file=sys.stderr)
+    finally:
+        await main.app.router.shutdown()
+
+    return {
+        "config": {
+            "backend": args.backend,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "entries": args.entries,
+            "seed": args.seed,
+            "stall_budget_ms": args.stall_budget_ms,
+        },
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if any(r.get("loop_stalls") for r in results["results"].values()):
+        sys.exit(1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,69 @@
+"""Compares the cost of serializing a 100 entry list payload through the old
+path (validate into `JournalEntry`, `jsonable_encoder`, `JSONResponse`) with
+`FastJSONResponse` writing the documents as read from Mongo.
+"""
+
+import timeit
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.helpers.serializer import FastJSONResponse
+from app.models.journal_entry import JournalEntry
+
+ENTRIES_PER_PAYLOAD: int = 100
+ITERATIONS: int = 200
+
+TEXT: str = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 4
+
+PAYLOAD = [
+    {
+        "_id": str(ObjectId()),
+        "created_at": 1660000000 + i,
+        "updated_at": 1660000000 + i,
+        "theme": {
+            "theme": "AMOR_FATI",
+            "name": "Amor Fati",
+            "short_description": "A Love of Fate",
+            "detailed_description": TEXT,
+            "accent_color": "#008fb3",
+            "data": {
+                "_id": str(ObjectId()),
+                "created_at": None,
+                "updated_at": None,
+                "theme": "AMOR_FATI",
+                "quote": TEXT,
+                "idea_nudge": TEXT,
+                "thought_nudge": TEXT,
+            },
+        },
+        "content": {
+            "quote": TEXT,
+            "idea_nudge": TEXT,
+            "idea": TEXT,
+            "thought_nudge": TEXT,
+            "thought": TEXT,
+        },
+    }
+    for i in range(ENTRIES_PER_PAYLOAD)
+]
+
+
+def current_path() -> bytes:
+    content = [jsonable_encoder(JournalEntry(**doc)) for doc in PAYLOAD]
+    return JSONResponse(content=content).body
+
+
+def fast_path() -> bytes:
+    return FastJSONResponse(content=PAYLOAD).body
+
+
+if __name__ == "__main__":
+    results = {}
+    for name, fn in (("current", current_path), ("fast", fast_path)):
+        seconds = min(timeit.repeat(fn, number=ITERATIONS, repeat=5)) / ITERATIONS
+        results[name] = seconds
+        print(f"{name:>8}: {seconds * 1000:8.3f} ms per {ENTRIES_PER_PAYLOAD} entries")
+
+    print(f" speedup: {results['current'] / results['fast']:8.1f}x")
@@ -0,0 +1,402 @@
+"""Runs the same contract checks against each database backend and exits
+non-zero if any backend fails one.
+
+    python scripts/check_backends.py
+    python scripts/check_backends.py --backends mongo memory sqlite
+
+The checks drive the repositories the way the API does and assert what the
+Mongo backend returns, so a backend that passes them can stand in for Mongo.
+Each backend gets its own database, emptied first; the SQLite one is a
+temporary file. `mongo` uses the database configured through the MONGO_* env
+vars.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import traceback
+
+# write immediately rather than coalescing, so the checks don't wait on timers
+os.environ.setdefault("WRITE_COALESCE_WINDOW_MS", "0")
+os.environ.setdefault("AUTOSAVE_DEBOUNCE_MS", "0")
+
+from pymongo import DESCENDING, UpdateOne  # noqa: E402
+from pymongo.errors import DuplicateKeyError  # noqa: E402
+
+from app.api import journal_entry as journal_entry_api  # noqa: E402
+from app.connections import database  # noqa: E402
+from app.constants import collection  # noqa: E402
+from app.constants.user import DEFAULT_USER_ID  # noqa: E402
+from app.helpers import archive  # noqa: E402
+from app.repository.journal_entry import JournalEntryRepo  # noqa: E402
+from app.repository.journal_stats import JournalStatsRepo  # noqa: E402
+from app.repository.journal_theme_data import JournalThemeDataRepo  # noqa: E402
+from app.repository.patch_debouncer import get_patch_debouncer  # noqa: E402
+from schema import PatchJournalEntryInput  # noqa: E402
+
+AMOR_FATI = "AMOR_FATI"
+PREMEDITATIO_MALORUM = "PREMEDITATIO_MALORUM"
+NOW = 1_700_000_000
+
+CHECKS = []
+
+
+def check(fn):
+    CHECKS.append(fn)
+    return fn
+
+
+def expect(actual, expected, what: str):
+    if actual != expected:
+        raise AssertionError(f"{what}: expected {expected!r}, got {actual!r}")
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=database.BACKENDS,
+        default=["memory", "sqlite"],
+    )
+    return parser.parse_args()
+
+
+def _entry(_id: str, created_at: int, theme: str = AMOR_FATI, idea="", thought=""):
+    """An entry in the stored layout, so the checks don't need theme data."""
+    return {
+        "_id": _id,
+        "user_id": DEFAULT_USER_ID,
+        "created_at": created_at,
+        "updated_at": created_at,
+        "theme": {"theme": theme, "data_id": None},
+        "content": {
+            "quote": "",
+            "idea_nudge": "",
+            "idea": idea,
+            "thought_nudge": "",
+            "thought": thought,
+        },
+    }
+
+
+def _ids(entries):
+    return [entry["_id"] for entry in entries]
+
+
+@check
+async def insert_and_find_one(db):
+    repo = JournalEntryRepo(db[collection.JOURNAL_ENTRIES_COLLECTION])
+    expect(await repo.insert_many([_entry("a", NOW, idea="hello")]), {}, "errors")
+
+    found = await repo.find_one_journal_entry("a")
+    expect(found["content"]["idea"], "hello", "idea")
+    expect(found["theme"]["theme"], AMOR_FATI, "theme")
+    expect(await repo.find_one_journal_entry("missing"), None, "missing entry")
+
+
+@check
+async def duplicate_ids(db):
+    entries = db[collection.JOURNAL_ENTRIES_COLLECTION]
+    repo = JournalEntryRepo(entries)
+
+    errors = await repo.insert_many(
+        [_entry("a", NOW), _entry("b", NOW), _entry("a", NOW)]
+    )
+    expect(sorted(errors), [2], "failed indexes")
+    expect(await entries.count_documents({}), 2, "stored entries")
+
+    try:
+        await entries.insert_one(_entry("b", NOW))
+    except DuplicateKeyError:
+        pass
+    else:
+        raise AssertionError("insert_one of a duplicate _id did not raise")
+
+
+@check
+async def keyset_pagination(db):
+    repo = JournalEntryRepo(db[collection.JOURNAL_ENTRIES_COLLECTION])
+    # two entries per second, so pages break inside a created_at
+    entries = [_entry(f"e{i:02}", NOW + i // 2) for i in range(25)]
+    await repo.insert_many(entries)
+
+    seen, after = [], None
+    while True:
+        page, after = await repo.find(limit=7, after=after)
+        seen.extend(_ids(page))
+        if after is None:
+            break
+
+    newest_first = sorted(entries, key=lambda e: (e["created_at"], e["_id"]))[::-1]
+    expect(seen, _ids(newest_first), "pages")
+
+
+@check
+async def filters(db):
+    repo = JournalEntryRepo(db[collection.JOURNAL_ENTRIES_COLLECTION])
+    await repo.insert_many(
+        [
+            _entry("a", NOW, AMOR_FATI),
+            _entry("b", NOW + 10, PREMEDITATIO_MALORUM),
+            _entry("c", NOW + 20, AMOR_FATI),
+            _entry("d", NOW + 30, AMOR_FATI),
+        ]
+    )
+
+    page, _ = await repo.find(theme=AMOR_FATI)
+    expect(_ids(page), ["d", "c", "a"], "theme filter")
+    page, _ = await repo.find(created_after=NOW, created_before=NOW + 30)
+    expect(_ids(page), ["c", "b"], "date range")
+    page, _ = await repo.find(theme=AMOR_FATI, created_after=NOW + 5)
+    expect(_ids(page), ["d", "c"], "theme and date range")
+
+
+@check
+async def projections(db):
+    repo = JournalEntryRepo(db[collection.JOURNAL_ENTRIES_COLLECTION])
+    await repo.insert_many(
+        [
+            _entry("a", NOW, idea="x" * 200, thought="thought"),
+            _entry("b", NOW + 1, idea="", thought="only a thought"),
+        ]
+    )
+
+    stored = db[collection.JOURNAL_ENTRIES_COLLECTION]
+    projected = await stored.find_one({"_id": "a"}, repo.fields_projection(["theme"]))
+    expect(sorted(projected), ["_id", "created_at", "theme"], "projected fields")
+    expect(projected["theme"], {"theme": AMOR_FATI, "data_id": None}, "theme")
+
+    summaries = {
+        s["_id"]: s async for s in stored.find({}, repo.summary_projection(length=10))
+    }
+    expect(summaries["a"]["snippet"], "x" * 11, "snippet of the idea")
+    expect(summaries["b"]["snippet"], "only a thou", "snippet of the thought")
+    expect(summaries["a"]["theme"], {"theme": AMOR_FATI}, "dotted projection")
+
+
+@check
+async def text_search(db):
+    repo = JournalEntryRepo(db[collection.JOURNAL_ENTRIES_COLLECTION])
+    await repo.insert_many(
+        [
+            _entry("idea", NOW, idea="a morning walk by the river"),
+            _entry("thought", NOW + 1, thought="walking helps me think"),
+            _entry("both", NOW + 2, idea="walk", thought="walked again"),
+            _entry("neither", NOW + 3, idea="coffee", thought="letters"),
+            _entry("other", NOW + 4, PREMEDITATIO_MALORUM, idea="long walks"),
+        ]
+    )
+
+    results, more = await repo.search("walk", theme=AMOR_FATI)
+    expect(set(_ids(results)), {"idea", "thought", "both"}, "matches")
+    expect(more, False, "more")
+    expect(_ids(results)[-1], "thought", "matches in the idea weigh more")
+    expect(all(r["score"] > 0 for r in results), True, "scores")
+    expect(sorted(results[0]["content"]), ["idea", "thought"], "content fields")
+
+    results, _ = await repo.search("walk -river", theme=AMOR_FATI)
+    expect(set(_ids(results)), {"thought", "both"}, "negated term")
+    results, _ = await repo.search('"morning walk"')
+    expect(_ids(results), ["idea"], "phrase")
+    results, more = await repo.search("walk", limit=1)
+    expect((len(results), more), (1, True), "page of matches")
+
+
+@check
+async def content_patches(db):
+    repo = JournalEntryRepo(db[collection.JOURNAL_ENTRIES_COLLECTION])
+    await repo.insert_many([_entry("a", NOW, idea="before", thought="kept")])
+
+    updated = await repo.update_content("a", NOW, {"idea": "after"})
+    expect(updated["content"]["idea"], "after", "patched field")
+    expect(updated["content"]["thought"], "kept", "untouched field")
+    expect(updated["updated_at"] > NOW, True, "updated_at moves forward")
+
+    expect(await repo.update_content("a", NOW - 1, {"idea": "x"}), None, "conflict")
+    expect(await repo.update_content("missing", NOW, {"idea": "x"}), None, "missing")
+
+
+@check
+async def concurrent_editors(db):
+    entries = db[collection.JOURNAL_ENTRIES_COLLECTION]
+    repo = JournalEntryRepo(entries)
+    await repo.insert_many([_entry("a", NOW, idea="before")])
+
+    def patch(editor: str, **content):
+        input = PatchJournalEntryInput(updated_at=NOW, content=content, editor=editor)
+        return journal_entry_api.patch("a", input, repo)
+
+    # patches only meet in the debouncer when they arrive within its window
+    debouncer = get_patch_debouncer(entries)
+    window_ms, debouncer.window_ms = debouncer.window_ms, 50
+    try:
+        first, again, other = await asyncio.gather(
+            patch("A", idea="editor A"),
+            patch("A", thought="editor A"),
+            patch("B", idea="editor B"),
+        )
+    finally:
+        debouncer.window_ms = window_ms
+
+    expect((first.status_code, again.status_code), (200, 200), "same editor")
+    expect(other.status_code, 409, "other editor")
+    stored = await repo.find_one_journal_entry("a")
+    expect(stored["content"]["idea"], "editor A", "first editor's idea kept")
+    expect(stored["content"]["thought"], "editor A", "same editor's patches merged")
+
+
+@check
+async def archive_tier(db):
+    entries = db[collection.JOURNAL_ENTRIES_COLLECTION]
+    archived = db[collection.JOURNAL_ENTRIES_ARCHIVE_COLLECTION]
+    repo = JournalEntryRepo(entries)
+
+    await repo.insert_many([_entry("hot", NOW + 10, idea="hot")])
+    await archived.insert_one(archive.compress(_entry("cold", NOW, idea="cold")))
+
+    found = await repo.find_one_journal_entry("cold")
+    expect(found["content"]["idea"], "cold", "archived entry read back")
+    page, _ = await repo.find()
+    expect(_ids(page), ["hot", "cold"], "tiers merged newest first")
+    exported = [entry["_id"] async for entry in repo.iter_entries(batch_size=1)]
+    expect(exported, ["cold", "hot"], "tiers merged oldest first")
+
+    updated = await repo.update_content("cold", NOW, {"thought": "restored"})
+    expect(updated["content"]["idea"], "cold", "restored entry")
+    expect(await archived.count_documents({}), 0, "archive after restoring")
+
+
+@check
+async def user_partitions(db):
+    entries = db[collection.JOURNAL_ENTRIES_COLLECTION]
+    mine = JournalEntryRepo(entries, user_id="me")
+    theirs = JournalEntryRepo(entries, user_id="them")
+
+    await mine.insert_many([_entry("a", NOW, idea="walk"), _entry("b", NOW + 1)])
+    await theirs.insert_many([_entry("c", NOW + 2, idea="walk")])
+    expect(await entries.distinct("user_id"), ["me", "them"], "stored owners")
+
+    page, _ = await mine.find()
+    expect(_ids(page), ["b", "a"], "own entries listed")
+    results, _ = await theirs.search("walk")
+    expect(_ids(results), ["c"], "own entries searched")
+    expect(await theirs.find_one_journal_entry("a"), None, "other user's entry")
+    expect(sorted(await mine.find_many_by_id(["a", "c"])), ["a"], "batch get")
+    expect(await theirs.update_content("a", NOW, {"idea": "x"}), None, "patch")
+    expect(
+        (await mine.find_one_journal_entry("a"))["content"]["idea"], "walk", "patched"
+    )
+
+    stats = db[collection.JOURNAL_STATS_COLLECTION]
+    await JournalStatsRepo(stats, "me").increment(NOW, AMOR_FATI)
+    await JournalStatsRepo(stats, "them").replace_all({})
+    expect(len(await JournalStatsRepo(stats, "me").find_all()), 1, "own rollups")
+
+
+@check
+async def stats_rollups(db):
+    stats = db[collection.JOURNAL_STATS_COLLECTION]
+    repo = JournalStatsRepo(stats)
+
+    await repo.increment_many([(NOW, AMOR_FATI), (NOW, AMOR_FATI), (NOW, "X")])
+    await repo.increment(NOW, AMOR_FATI, by=-1)
+    counts = {(r["day"], r["theme"]): r["count"] for r in await repo.find_all()}
+    expect(counts, {("2023-11-14", AMOR_FATI): 1, ("2023-11-14", "X"): 1}, "counts")
+
+    await repo.replace_all({("2023-11-15", AMOR_FATI): 5})
+    counts = {(r["day"], r["theme"]): r["count"] for r in await repo.find_all()}
+    expect(counts, {("2023-11-15", AMOR_FATI): 5}, "replaced counts")
+
+
+@check
+async def theme_data_sampling(db):
+    repo = JournalThemeDataRepo(db[collection.JOURNAL_THEME_DATA_COLLECTION])
+    data = [
+        {"_id": f"{theme}-{i}", "theme": theme, "quote": f"quote {i}"}
+        for theme in (AMOR_FATI, PREMEDITATIO_MALORUM)
+        for i in range(5)
+    ]
+    expect(await repo.insert_many(data), {}, "errors")
+
+    sample = await repo.get_n_random(theme=AMOR_FATI, sample_size=3)
+    expect(len({d["_id"] for d in sample}), 3, "distinct sampled documents")
+    expect({d["theme"] for d in sample}, {AMOR_FATI}, "sampled theme")
+    expect(len(await repo.get_n_random(theme="", sample_size=20)), 10, "sample size")
+
+    found = await repo.find_many([f"{AMOR_FATI}-1", "missing"])
+    expect(_ids(found), [f"{AMOR_FATI}-1"], "find_many")
+    expect((await repo.find_one(f"{AMOR_FATI}-2"))["quote"], "quote 2", "find_one")
+
+
+@check
+async def collection_operations(db):
+    entries = db[collection.JOURNAL_ENTRIES_COLLECTION]
+    await entries.insert_many([_entry(i, NOW + n) for n, i in enumerate("abcd")])
+
+    result = await entries.bulk_write(
+        [
+            UpdateOne({"_id": "a"}, {"$set": {"flag": True}}),
+            UpdateOne({"_id": "z"}, {"$set": {"flag": True}}, upsert=True),
+        ],
+        ordered=False,
+    )
+    expect((result.modified_count, result.upserted_count), (1, 1), "bulk_write")
+    expect(
+        sorted(await entries.distinct("_id", {"flag": True})), ["a", "z"], "distinct"
+    )
+
+    result = await entries.delete_many({"_id": {"$nin": ["a", "b"]}})
+    expect(result.deleted_count, 3, "deleted")
+    remaining = await entries.find({}).sort("created_at", DESCENDING).to_list(None)
+    expect(_ids(remaining), ["b", "a"], "remaining")
+    expect(await entries.find_one({"missing": {"$exists": True}}), None, "$exists")
+
+
+async def run_backend(backend: str, directory: str) -> int:
+    client = database.create_client(
+        backend, sqlite_path=os.path.join(directory, "contract.db")
+    )
+    db = client[f"{database.DATABASE_NAME}_contract_{backend}"]
+    failed = 0
+
+    try:
+        await database.ensure_indexes(db)
+        for check_fn in CHECKS:
+            for name in database.INDEXES.keys() | {collection.JOURNAL_STATS_COLLECTION}:
+                await db[name].delete_many({})
+
+            started = time.perf_counter()
+            try:
+                await check_fn(db)
+            except Exception:
+                failed += 1
+                print(f"FAIL {backend} {check_fn.__name__}")
+                traceback.print_exc()
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"ok   {backend} {check_fn.__name__} ({elapsed_ms:.1f}ms)")
+    finally:
+        client.close()
+
+    return failed
+
+
+async def main(args) -> int:
+    failed = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in args.backends:
+            failed += await run_backend(backend, directory)
+
+    total = len(CHECKS) * len(args.backends)
+    print(f"{total - failed}/{total} checks passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+    loop = asyncio.get_event_loop()
+    sys.exit(loop.run_until_complete(main(args)))
@@ -0,0 +1,81 @@
+"""Exercises every query the repositories issue against the configured
+database and exits non-zero if any of them is planned as a collection scan.
+"""
+
+import asyncio
+import sys
+
+from pymongo import monitoring
+
+from app.helpers.query_plan import (
+    QueryRecorder,
+    assert_no_collscan,
+    CollectionScanError,
+)
+
+recorder = QueryRecorder()
+monitoring.register(recorder)
+
+from app.connections import database  # noqa: E402
+from app.constants.user import DEFAULT_USER_ID  # noqa: E402
+from app.helpers.archive import archivable  # noqa: E402
+from app.helpers.stats import day_key, rollup_id  # noqa: E402
+from app.models.base import JournalThemeType  # noqa: E402
+from app.repository.journal_entry import JournalEntryRepo  # noqa: E402
+from app.repository.journal_stats import JournalStatsRepo  # noqa: E402
+from app.repository.journal_theme_data import JournalThemeDataRepo  # noqa: E402
+from app.constants import collection  # noqa: E402
+
+
+async def exercise_repositories():
+    db = database.get_database()
+    entries_repo = JournalEntryRepo(db[collection.JOURNAL_ENTRIES_COLLECTION])
+    theme_data_repo = JournalThemeDataRepo(db[collection.JOURNAL_THEME_DATA_COLLECTION])
+    stats_repo = JournalStatsRepo(db[collection.JOURNAL_STATS_COLLECTION])
+
+    await entries_repo.find()
+    await entries_repo.find(created_after=1, created_before=2)
+    await entries_repo.find(theme=JournalThemeType.amor_fati)
+    await entries_repo.find(theme=JournalThemeType.amor_fati, after=(1, "a"))
+    await entries_repo.find(projection=entries_repo.summary_projection())
+    await entries_repo.find_one_journal_entry("a")
+    await entries_repo.find_many_by_id(["b", "c"])
+    await entries_repo.search("fate", theme=JournalThemeType.amor_fati)
+    async for _ in entries_repo.iter_entries(created_after=1):
+        pass
+    await entries_repo.update_content("a", 1, {"idea": "fate"})
+    # an upsert, so the rollup it creates is removed again
+    theme = JournalThemeType.amor_fati.value
+    await stats_repo.increment(1, theme)
+    await stats_repo.db.delete_one(
+        {"_id": rollup_id(DEFAULT_USER_ID, day_key(1), theme)}
+    )
+    await stats_repo.find_all()
+    await archivable(entries_repo.db, cutoff=1, after=(0, "a"), limit=1)
+
+    await theme_data_repo.get_n_random(theme=JournalThemeType.amor_fati)
+    await theme_data_repo.find_one("a")
+    await theme_data_repo.find_by_content(JournalThemeType.amor_fati, "q", "i", "t")
+
+
+async def check_query_plans():
+    await database.ensure_indexes()
+    recorder.clear()
+
+    await exercise_repositories()
+
+    try:
+        await assert_no_collscan(database._get_client(), recorder.commands)
+    except CollectionScanError as e:
+        print(e)
+        return 1
+    finally:
+        await database.close()
+
+    print(f"{len(recorder.commands)} queries checked, none planned a COLLSCAN")
+    return 0
+
+
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+    sys.exit(loop.run_until_complete(check_query_plans()))
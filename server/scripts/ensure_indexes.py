@@ -0,0 +1,17 @@
+import asyncio
+
+from app.connections import database
+
+
+async def ensure_indexes():
+    created = await database.ensure_indexes()
+
+    for collection_name, index_names in created.items():
+        print(f"{collection_name}: {', '.join(index_names)}")
+
+    await database.close()
+
+
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(ensure_indexes())
@@ -0,0 +1,108 @@
+"""Moves journal entries from the embedded theme layout to the normalized one
+described in `app.repository.theme_catalog`.
+
+    python scripts/migrate_theme_storage.py [--batch-size 500] [--pause-ms 50] [--dry-run]
+
+The migration runs online. Entries are walked in `_id` order in batches, and
+each update only applies if the entry is still in the embedded layout, so the
+script can be interrupted and re-run, and entries written while it runs are
+left alone. `--pause-ms` throttles it between batches.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from pymongo import UpdateOne
+
+from app.connections import database
+from app.constants import collection
+from app.repository.theme_catalog import content_key_for, normalize
+from app.repository.theme_data_pool import content_key
+
+EMBEDDED = {"theme.name": {"$exists": True}}
+
+
+async def load_theme_data(db):
+    """Maps the content of every theme data document to the document."""
+    by_content = {}
+    cursor = db[collection.JOURNAL_THEME_DATA_COLLECTION].find({})
+    async for data in cursor:
+        key = content_key(
+            data.get("theme"),
+            data.get("quote"),
+            data.get("idea_nudge"),
+            data.get("thought_nudge"),
+        )
+        by_content.setdefault(key, data)
+    return by_content
+
+
+async def migrate(batch_size: int, pause_ms: int, dry_run: bool) -> int:
+    db = database.get_database()
+    entries = db[collection.JOURNAL_ENTRIES_COLLECTION]
+    theme_data = await load_theme_data(db)
+
+    migrated = unresolved = 0
+    last_id = None
+
+    try:
+        while True:
+            query = dict(EMBEDDED)
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+
+            batch = await entries.find(query).sort("_id", 1).to_list(length=batch_size)
+            if not batch:
+                break
+            last_id = batch[-1]["_id"]
+
+            requests = []
+            for entry in batch:
+                data = theme_data.get(content_key_for(entry))
+                data_id = data["_id"] if data is not None else None
+                if data_id is None:
+                    unresolved += 1
+
+                stored = normalize(entry, data_id, data)
+                requests.append(
+                    UpdateOne(
+                        {"_id": entry["_id"], **EMBEDDED},
+                        {
+                            "$set": {
+                                "theme": stored["theme"],
+                                "content": stored["content"],
+                            }
+                        },
+                    )
+                )
+
+            if not dry_run:
+                result = await entries.bulk_write(requests, ordered=False)
+                migrated += result.modified_count
+            else:
+                migrated += len(requests)
+
+            print(f"{migrated} entries migrated, last _id {last_id}", file=sys.stderr)
+            await asyncio.sleep(pause_ms / 1000)
+    finally:
+        await database.close()
+
+    print(
+        f"{'would migrate' if dry_run else 'migrated'} {migrated} entries, "
+        f"{unresolved} without a matching theme data document"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause-ms", type=int, default=50)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    sys.exit(
+        loop.run_until_complete(migrate(args.batch_size, args.pause_ms, args.dry_run))
+    )
@@ -0,0 +1,187 @@
+"""Gives every journal entry written before entries had an owner to one user,
+and moves the indexes over to the ones leading with `user_id`.
+
+    python scripts/migrate_user_partition.py [--user-id default] [--batch-size 500] [--pause-ms 50] [--dry-run]
+
+The migration runs online. Entries and archived entries without a `user_id`
+are walked in `_id` order in batches, and each update only applies if the
+entry still has no owner, so the script can be interrupted and re-run.
+`--pause-ms` throttles it between batches. The stats rollups without an
+owner are then merged into the user's, and last the superseded indexes are
+dropped and the new ones created. Search needs the new text index, which
+Mongo only creates once the old one is gone, so it fails for the moment in
+between.
+
+Entries without a `user_id` are not returned to anyone, so this has to run
+as part of deploying the version that added owners; start_backend.sh runs
+it on every boot. Once it is done, a run costs one query per collection and
+one failed drop per superseded index, and it leaves creating the indexes
+to the app. A fresh database, where the collections do not exist yet, is
+treated the same way.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import OperationFailure
+
+from app.connections import database
+from app.constants import collection
+from app.constants.index import SUPERSEDED_INDEXES
+from app.constants.user import DEFAULT_USER_ID
+from app.helpers.stats import rollup_id
+
+UNOWNED = {"user_id": {"$exists": False}}
+# dropping an index of a collection that does not exist, or that it lacks
+NAMESPACE_NOT_FOUND_ERROR_CODE: int = 26
+INDEX_NOT_FOUND_ERROR_CODE: int = 27
+
+
+async def backfill(documents, user_id: str, batch_size: int, pause_ms: int, dry_run):
+    backfilled = 0
+    last_id = None
+
+    while True:
+        query = dict(UNOWNED)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        batch = (
+            await documents.find(query, {"_id": 1})
+            .sort("_id", 1)
+            .to_list(length=batch_size)
+        )
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        if not dry_run:
+            result = await documents.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": doc["_id"], **UNOWNED}, {"$set": {"user_id": user_id}}
+                    )
+                    for doc in batch
+                ],
+                ordered=False,
+            )
+            backfilled += result.modified_count
+        else:
+            backfilled += len(batch)
+
+        print(
+            f"{documents.name}: {backfilled} backfilled, last _id {last_id}",
+            file=sys.stderr,
+        )
+        await asyncio.sleep(pause_ms / 1000)
+
+    return backfilled
+
+
+async def merge_rollups(stats, user_id: str, dry_run: bool) -> int:
+    """Adds every rollup without an owner to the user's rollup for the same
+    day and theme, and removes it. Each pair of writes is ordered, so an
+    interrupted run can at worst count one rollup twice, which
+    `scripts/rebuild_stats.py --check` reports.
+    """
+    rollups = await stats.find(UNOWNED).to_list(length=None)
+    if dry_run or not rollups:
+        return len(rollups)
+
+    requests = []
+    for rollup in rollups:
+        requests.append(
+            UpdateOne(
+                {
+                    "user_id": user_id,
+                    "_id": rollup_id(user_id, rollup["day"], rollup["theme"]),
+                },
+                {
+                    "$inc": {"count": rollup["count"]},
+                    "$setOnInsert": {"day": rollup["day"], "theme": rollup["theme"]},
+                },
+                upsert=True,
+            )
+        )
+        requests.append(DeleteOne({"_id": rollup["_id"], **UNOWNED}))
+
+    await stats.bulk_write(requests, ordered=True)
+    return len(rollups)
+
+
+async def drop_superseded_indexes(db) -> int:
+    dropped = 0
+    for collection_name, names in SUPERSEDED_INDEXES.items():
+        for name in names:
+            try:
+                await db[collection_name].drop_index(name)
+            except OperationFailure as e:
+                if e.code not in (
+                    NAMESPACE_NOT_FOUND_ERROR_CODE,
+                    INDEX_NOT_FOUND_ERROR_CODE,
+                ):
+                    raise
+                continue
+            print(f"{collection_name}: dropped {name}")
+            dropped += 1
+
+    return dropped
+
+
+async def migrate(user_id: str, batch_size: int, pause_ms: int, dry_run: bool) -> int:
+    db = database.get_database()
+
+    try:
+        changed = 0
+        for name in (
+            collection.JOURNAL_ENTRIES_COLLECTION,
+            collection.JOURNAL_ENTRIES_ARCHIVE_COLLECTION,
+        ):
+            backfilled = await backfill(
+                db[name], user_id, batch_size, pause_ms, dry_run
+            )
+            print(
+                f"{name}: {'would give' if dry_run else 'gave'} {backfilled} "
+                f"documents to {user_id}"
+            )
+            changed += backfilled
+
+        merged = await merge_rollups(
+            db[collection.JOURNAL_STATS_COLLECTION], user_id, dry_run
+        )
+        print(f"{'would merge' if dry_run else 'merged'} {merged} rollups")
+        changed += merged
+
+        if dry_run:
+            return 0
+
+        changed += await drop_superseded_indexes(db)
+        if not changed:
+            print("nothing to migrate")
+            return 0
+
+        created = await database.ensure_indexes(db)
+        for collection_name, index_names in created.items():
+            print(f"{collection_name}: {', '.join(index_names)}")
+    finally:
+        await database.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--user-id", default=DEFAULT_USER_ID)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause-ms", type=int, default=50)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    sys.exit(
+        loop.run_until_complete(
+            migrate(args.user_id, args.batch_size, args.pause_ms, args.dry_run)
+        )
+    )
@@ -0,0 +1,112 @@
+"""Recomputes the per user, day and theme rollups from `journal_entries`.
+
+    python scripts/rebuild_stats.py            # rewrite the rollups
+    python scripts/rebuild_stats.py --check    # only report differences
+
+Users are rebuilt one at a time, each from their own entries, read in
+batches with only the fields the rollups need. Entries without a `user_id`
+are not counted, so run scripts/migrate_user_partition.py first. Entries
+written while the rebuild runs may be counted twice or not at all, so run
+it again with --check once writes have settled.
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import Dict, List, Tuple
+
+from app.connections import database
+from app.constants import collection
+from app.constants.export import EXPORT_BATCH_SIZE
+from app.helpers.stats import day_key
+from app.repository.journal_entry import JournalEntryRepo
+from app.repository.journal_stats import JournalStatsRepo
+
+
+async def compute_counts(entries_repo, batch_size: int) -> Dict[Tuple[str, str], int]:
+    counts: Dict[Tuple[str, str], int] = {}
+    seen = 0
+
+    entries = entries_repo.iter_entries(
+        batch_size=batch_size, projection={"created_at": 1, "theme.theme": 1}
+    )
+    async for entry in entries:
+        key = (day_key(entry["created_at"]), entry["theme"]["theme"])
+        counts[key] = counts.get(key, 0) + 1
+
+        seen += 1
+        if seen % batch_size == 0:
+            print(f"{seen} entries counted", file=sys.stderr)
+
+    return counts
+
+
+async def find_users(db) -> List[str]:
+    users = set()
+    for name in (
+        collection.JOURNAL_ENTRIES_COLLECTION,
+        collection.JOURNAL_ENTRIES_ARCHIVE_COLLECTION,
+        collection.JOURNAL_STATS_COLLECTION,
+    ):
+        users.update(await db[name].distinct("user_id"))
+    return sorted(users)
+
+
+async def rebuild_user(db, user_id: str, check: bool, batch_size: int) -> int:
+    """Rebuilds, or with `check` compares, the rollups of one user. Returns
+    the number of rollups that differ.
+    """
+    entries_repo = JournalEntryRepo(
+        db[collection.JOURNAL_ENTRIES_COLLECTION], user_id=user_id
+    )
+    stats_repo = JournalStatsRepo(db[collection.JOURNAL_STATS_COLLECTION], user_id)
+    counts = await compute_counts(entries_repo, batch_size)
+
+    if not check:
+        await stats_repo.replace_all(counts)
+        print(f"{user_id}: rebuilt {len(counts)} rollups")
+        return 0
+
+    stored = {
+        (rollup["day"], rollup["theme"]): rollup["count"]
+        for rollup in await stats_repo.find_all()
+        if rollup["count"]
+    }
+    mismatches = 0
+    for key in sorted(set(counts) | set(stored)):
+        if counts.get(key, 0) != stored.get(key, 0):
+            mismatches += 1
+            print(
+                f"{user_id} {key[0]} {key[1]}: "
+                f"stored {stored.get(key, 0)}, actual {counts.get(key, 0)}"
+            )
+    return mismatches
+
+
+async def rebuild_stats(check: bool, batch_size: int) -> int:
+    db = database.get_database()
+
+    try:
+        mismatches = 0
+        users = await find_users(db)
+        for user_id in users:
+            mismatches += await rebuild_user(db, user_id, check, batch_size)
+
+        if not check:
+            print(f"rebuilt the rollups of {len(users)} users")
+            return 0
+
+        print(f"{mismatches} rollups differ across {len(users)} users")
+        return 1 if mismatches else 0
+    finally:
+        await database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    sys.exit(loop.run_until_complete(rebuild_stats(args.check, args.batch_size)))
@@ -1,86 +1,290 @@
-import uuid
-import asyncio
-from datetime import datetime, timezone
+"""Generates a synthetic dataset of theme data and journal entries.
+
+    python scripts/seed_db.py --entries 1000000 --seed 7 --writers 8 --users 1000
+
+Only theme data is written unless `--entries` asks for journal entries, so
+the script can run on every boot: theme data that is already there is left
+as it is.
 
-from fastapi.encoders import jsonable_encoder
+The same arguments always produce the same documents, ids included: every
+batch is generated from its own generator seeded with `--seed` and the batch
+number, so the dataset does not depend on how the writers interleave.
+
+Entries are written through `JournalEntryRepo.insert_many`, so they are
+stored normalized exactly as the API would store them, and the stats rollups
+are incremented along the way. Entries are spread evenly over `--users`
+users, the first of which is the default user the API acts for when a
+request names none. Progress and throughput are reported on
+stderr.
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import sys
+import time
+from typing import Dict, List
 
-from app.api.theme import THEMES
-from app.models.base import PyObjectId
-from app.models.journal_entry import JournalEntry, JournalEntryContent
-from app.models.journal_theme import JournalTheme
-from app.models.journal_theme_data import JournalThemeData
-from app.connections.database import _get_client
+from app.connections import database
 from app.constants import collection
-from app.repository import get_journal_entry_repo
-from app.repository import get_journal_theme_data_repo
-
-client = _get_client()
-entries_collection = client.journal_entries[collection.JOURNAL_ENTRIES_COLLECTION]
-theme_data_collection = client.journal_entries[collection.JOURNAL_THEME_DATA_COLLECTION]
-
-TEST_THOUGHT: str = "Lorem ipsum dolor set amet"
-TEST_QUOTE: str = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. Nullam id laoreet lacus. Duis quis mattis. "
-TEST_IDEA: str = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. Nullam id laoreet lacus. Duis quis mattis. "
-TEST_IDEA_NUDGE: str = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. Nullam id laoreet lacus. Duis quis mattis. "
-TEST_THOUGHT_NUDGE: str = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. Nullam id laoreet lacus. Duis quis mattis. "
-NOW = datetime.utcnow()
-
-THEME_WITH_DATA = []
-ENTRIES = []
-
-for idx, t in enumerate(THEMES):
-    theme_data = JournalThemeData(
-        theme=t["theme"],
-        quote=f"{TEST_QUOTE} {idx+1}",
-        idea_nudge=f"{TEST_IDEA_NUDGE} {idx+1}",
-        thought_nudge=f"{TEST_THOUGHT_NUDGE} {idx + 1}",
+from app.constants.theme import THEMES
+from app.constants.user import DEFAULT_USER_ID
+from app.repository.journal_entry import JournalEntryRepo
+from app.repository.journal_stats import JournalStatsRepo
+from app.repository.journal_theme_data import JournalThemeDataRepo
+from app.repository.theme_data_pool import THEME_DATA_POOL
+
+TIME_DISTRIBUTIONS = ("uniform", "recent", "diurnal")
+
+WORDS = (
+    "fate morning walk letter habit virtue calm anger fear loss work friend "
+    "family death time control choice judgement reason nature duty patience "
+    "courage justice wisdom temperance pain pleasure fortune exile wealth body "
+    "mind breath city river road evening rest sleep tomorrow yesterday today "
+    "plan failure success obstacle path practice discipline gratitude grief "
+    "memory silence noise crowd solitude book teacher student train coffee "
+    "rain winter summer garden kitchen meeting deadline email argument apology "
+    "promise doubt hope worry choice kindness health illness child parent"
+).split()
+
+QUOTES = (
+    "The impediment to action advances action. What stands in the way becomes the way.",
+    "We suffer more often in imagination than in reality.",
+    "It is not that we have a short time to live, but that we waste a lot of it.",
+    "You have power over your mind, not outside events.",
+    "No man is free who is not master of himself.",
+    "Wealth consists not in having great possessions, but in having few wants.",
+    "He who fears death will never do anything worthy of a man who is alive.",
+    "First say to yourself what you would be; and then do what you have to do.",
+)
+
+IDEA_NUDGES = (
+    "What happened today that you would not have chosen?",
+    "What could go wrong tomorrow, and how would you meet it?",
+    "Which of today's worries was within your control?",
+    "What did you lose this week, and what remains?",
+)
+
+THOUGHT_NUDGES = (
+    "How can you embrace it rather than resist it?",
+    "What would a wise person do in your place?",
+    "What would it look like to accept this fully?",
+    "What is the next right action?",
+)
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--entries", type=int, default=0)
+    parser.add_argument(
+        "--theme-data", type=int, default=50, help="theme data documents per theme"
+    )
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--theme-weights",
+        default="",
+        help="relative weight per theme, e.g. AMOR_FATI=3,PREMEDITATIO_MALORUM=1",
+    )
+    parser.add_argument("--days", type=int, default=365, help="span of created_at")
+    parser.add_argument(
+        "--time-distribution", choices=TIME_DISTRIBUTIONS, default="recent"
+    )
+    parser.add_argument(
+        "--idea-words", type=int, default=40, help="median words in an idea"
     )
-    _id = str(uuid.uuid1())[:12].encode()
-    theme = JournalTheme(
-        id=PyObjectId(_id),
-        theme=t["theme"],
-        name=t["name"],
-        short_description=t["short_description"],
-        detailed_description=t["detailed_description"],
-        accent_color=t["accent_color"],
-        data=theme_data,
+    parser.add_argument(
+        "--thought-words", type=int, default=90, help="median words in a thought"
     )
+    parser.add_argument("--users", type=int, default=1, help="owners of the entries")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument(
+        "--drop", action="store_true", help="empty the collections first"
+    )
+    return parser.parse_args()
 
-    THEME_WITH_DATA.append(theme)
 
+def _theme_weights(spec: str) -> Dict[str, float]:
+    weights = {t["theme"].value: 1.0 for t in THEMES}
+    for pair in filter(None, spec.split(",")):
+        theme, _, weight = pair.partition("=")
+        if theme not in weights:
+            raise SystemExit(f"unknown theme {theme}")
+        weights[theme] = float(weight)
+    return weights
 
-for i in range(len(THEMES)):
-    content = JournalEntryContent(
-        quote=f"{TEST_QUOTE} {i}",
-        idea_nudge=f"{TEST_IDEA_NUDGE} {i}",
-        idea=f"{TEST_IDEA} {i}",
-        thought_nudge=f"{TEST_THOUGHT_NUDGE} {i}",
-        thought=f"{TEST_THOUGHT} {i}",
-    )
 
-    entry = JournalEntry(
-        theme=THEME_WITH_DATA[i],
-        created_at=int(NOW.timestamp()),
-        updated_at=int(NOW.timestamp()),
-        content=content,
-    )
+def _object_id(rng: random.Random) -> str:
+    return f"{rng.getrandbits(96):024x}"
+
+
+def _user_id(rng: random.Random, users: int) -> str:
+    user = rng.randrange(users) if users > 1 else 0
+    return DEFAULT_USER_ID if user == 0 else f"user-{user}"
 
-    ENTRIES.append(entry)
 
+def _text(rng: random.Random, median_words: int) -> str:
+    # word counts are log-normal: mostly short, with a long tail
+    count = max(1, int(rng.lognormvariate(math.log(median_words), 0.6)))
+    words = rng.choices(WORDS, k=count)
 
-async def insert_data():
-    theme_data_repo = await get_journal_theme_data_repo(theme_data_collection)
-    entries_repo = await get_journal_entry_repo(entries_collection)
+    sentences, start = [], 0
+    while start < count:
+        end = start + rng.randint(6, 18)
+        sentence = " ".join(words[start:end])
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+        start = end
+    return " ".join(sentences)
 
-    for entry in ENTRIES:
-        journal = await entries_repo.insert_one(jsonable_encoder(entry))
-        print(f"{journal['_id']}")
 
-    for theme in THEME_WITH_DATA:
-        theme_data = await theme_data_repo.insert_one(jsonable_encoder(theme.data))
-        print(f"{theme_data['_id']}")
+def _created_at(rng: random.Random, distribution: str, now: int, days: int) -> int:
+    span = days * 86400
+    if distribution == "uniform":
+        return now - int(rng.random() * span)
+    if distribution == "recent":
+        # density falls off with age, as it does for an active journal
+        return now - int(rng.random() ** 2 * span)
+
+    # diurnal: a uniform day, at a time clustered around the morning or evening
+    day_start = now - now % 86400 - rng.randrange(days) * 86400
+    hour = rng.gauss(7.5, 1.0) if rng.random() < 0.6 else rng.gauss(21.5, 1.2)
+    return min(now, day_start + int(hour % 24 * 3600))
+
+
+def generate_theme_data(seed: int, per_theme: int, now: int) -> List[Dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "_id": _object_id(rng),
+            "created_at": now,
+            "updated_at": now,
+            "theme": t["theme"].value,
+            "quote": f"{rng.choice(QUOTES)} ({i + 1})",
+            "idea_nudge": rng.choice(IDEA_NUDGES),
+            "thought_nudge": rng.choice(THOUGHT_NUDGES),
+        }
+        for t in THEMES
+        for i in range(per_theme)
+    ]
+
+
+def generate_batch(
+    args, batch: int, size: int, theme_data: Dict[str, List[Dict]], now: int
+) -> List[Dict]:
+    rng = random.Random(args.seed * 1_000_003 + batch)
+    themes = {t["theme"].value: t for t in THEMES}
+    weights = _theme_weights(args.theme_weights)
+    keys = list(weights)
+
+    entries = []
+    for key in rng.choices(keys, weights=[weights[k] for k in keys], k=size):
+        data = rng.choice(theme_data[key])
+        created_at = _created_at(rng, args.time_distribution, now, args.days)
+        edited = rng.random() < 0.3
+        entries.append(
+            {
+                "_id": _object_id(rng),
+                "user_id": _user_id(rng, args.users),
+                "created_at": created_at,
+                "updated_at": min(
+                    now, created_at + (rng.randint(1, 86400) if edited else 0)
+                ),
+                "theme": {**themes[key], "theme": key, "data": data},
+                "content": {
+                    "quote": data["quote"],
+                    "idea_nudge": data["idea_nudge"],
+                    "idea": _text(rng, args.idea_words),
+                    "thought_nudge": data["thought_nudge"],
+                    "thought": _text(rng, args.thought_words),
+                },
+            }
+        )
+
+    return entries
+
+
+async def seed(args) -> int:
+    db = database.get_database()
+    entries_collection = db[collection.JOURNAL_ENTRIES_COLLECTION]
+    theme_data_collection = db[collection.JOURNAL_THEME_DATA_COLLECTION]
+    stats_collection = db[collection.JOURNAL_STATS_COLLECTION]
+
+    theme_data_repo = JournalThemeDataRepo(theme_data_collection)
+
+    now = int(time.time())
+    inserted = failed = 0
+    started = time.perf_counter()
+
+    try:
+        if args.drop:
+            for c in (entries_collection, theme_data_collection, stats_collection):
+                await c.delete_many({})
+
+        theme_data = generate_theme_data(args.seed, args.theme_data, now)
+        errors = await theme_data_repo.insert_many(theme_data)
+        print(f"{len(theme_data) - len(errors)} theme data documents inserted")
+
+        # entries are normalized against the pool, so it has to hold them all
+        THEME_DATA_POOL.size_cap = max(THEME_DATA_POOL.size_cap, args.theme_data)
+        await THEME_DATA_POOL.refresh()
+        by_theme: Dict[str, List[Dict]] = {}
+        for data in theme_data:
+            by_theme.setdefault(data["theme"], []).append(data)
+
+        batches: asyncio.Queue = asyncio.Queue()
+        for batch in range(math.ceil(args.entries / args.batch_size)):
+            size = min(args.batch_size, args.entries - batch * args.batch_size)
+            batches.put_nowait((batch, size))
+
+        async def writer():
+            nonlocal inserted, failed
+            while not batches.empty():
+                batch, size = batches.get_nowait()
+                by_user: Dict[str, List[Dict]] = {}
+                for entry in generate_batch(args, batch, size, by_theme, now):
+                    by_user.setdefault(entry["user_id"], []).append(entry)
+
+                for user_id, entries in by_user.items():
+                    entries_repo = JournalEntryRepo(entries_collection, user_id=user_id)
+                    errors = await entries_repo.insert_many(entries)
+                    await JournalStatsRepo(stats_collection, user_id).increment_many(
+                        [
+                            (entry["created_at"], entry["theme"]["theme"])
+                            for i, entry in enumerate(entries)
+                            if i not in errors
+                        ]
+                    )
+                    inserted += len(entries) - len(errors)
+                    failed += len(errors)
+
+        async def report():
+            while True:
+                await asyncio.sleep(5)
+                elapsed = time.perf_counter() - started
+                print(
+                    f"{inserted}/{args.entries} entries, "
+                    f"{inserted / elapsed:.0f} entries/s",
+                    file=sys.stderr,
+                )
+
+        reporter = asyncio.ensure_future(report())
+        try:
+            await asyncio.gather(*[writer() for _ in range(args.writers)])
+        finally:
+            reporter.cancel()
+    finally:
+        await database.close()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"{inserted} entries inserted, {failed} failed, in {elapsed:.1f}s "
+        f"({inserted / elapsed:.0f} entries/s)"
+    )
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
+    args = _parse_args()
     loop = asyncio.get_event_loop()
-    loop.run_until_complete(insert_data())
+    sys.exit(loop.run_until_complete(seed(args)))
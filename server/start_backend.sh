@@ -6,6 +6,11 @@ pipenv shell
 
 export PYTHONPATH=$PYTHONPATH:$(pwd)
 
+# gives entries written before entries had an owner to DEFAULT_USER_ID; they
+# are not visible to anyone until it has run, and it is a no-op afterwards
+pipenv run migrate_user_partition
+
+# theme data only; pass --entries for a dataset to develop against
 pipenv run seed_db
 
 pipenv run uvicorn main:app --host 0.0.0.0 --port 80 --reload